@@ -0,0 +1,295 @@
+"""Local stand-in for the sprite host, with configurable latency, bandwidth and errors.
+
+Sprites are the real PNGs committed under `concurrent-downloads/out_asyn`, served
+by file name (`/sprites/bw/<name>.png`). Names without a local copy (the gen2-gen6
+sprites were never downloaded) get a real gen1 sprite picked deterministically
+from the name, so every CSV can be benchmarked offline.
+
+All randomness is derived from `seed`, the sprite name and how many times that
+sprite was requested, so a run is reproducible whatever the request order.
+
+`SpriteServer` speaks HTTP/1.1. `Http2SpriteServer` serves the same responses over
+cleartext HTTP/2 (prior knowledge, as `http2.py` clients speak it), every request
+a stream multiplexed on the client's connections; it needs the `h2` package.
+Both count the connections they accept, to compare how many each client opens,
+and can make every new connection pay a `handshake` delay, as TCP + TLS setup
+to the real host does.
+
+Run `python benchmarks/mock_server.py --help` to serve it by hand.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import pathlib
+import posixpath
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+from urllib.parse import urlparse
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+except ImportError:  # only needed by `Http2SpriteServer`
+    h2 = None
+
+REPO = pathlib.Path(__file__).resolve().parent.parent
+SPRITES_DIR = REPO / "concurrent-downloads" / "out_asyn"
+CHUNK_SIZE = 4096
+
+
+def load_sprites(root: pathlib.Path = SPRITES_DIR) -> dict[str, bytes]:
+    """Map `<name>.png` to its bytes for every sprite under `root`."""
+    return {path.name: path.read_bytes() for path in sorted(root.glob("*/*.png"))}
+
+
+class SpriteHost:
+    """The sprites and the network conditions, whatever the protocol serving them."""
+
+    def __init__(
+        self,
+        sprites: dict[str, bytes] | None = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        bandwidth: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        handshake: float = 0.0,
+    ):
+        self.sprites = load_sprites() if sprites is None else sprites
+        self._names = sorted(self.sprites)
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.seed = seed
+        # Seconds a new connection waits before its first request is read, like TCP + TLS setup.
+        self.handshake = handshake
+        self._lock = threading.Lock()
+        self._attempts: dict[str, int] = {}
+        self.requests = 0
+        self.connections = 0
+        self.server_address: tuple[Any, ...] = ()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def sprite(self, name: str) -> bytes:
+        if name in self.sprites:
+            return self.sprites[name]
+        return self.sprites[self._names[zlib.crc32(name.encode()) % len(self._names)]]
+
+    def rng(self, name: str) -> random.Random:
+        """Random source for one request, independent of the order of requests."""
+        with self._lock:
+            attempt = self._attempts.get(name, 0)
+            self._attempts[name] = attempt + 1
+            self.requests += 1
+        return random.Random(f"{self.seed}:{name}:{attempt}")
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def respond(self, path: str, if_none_match: str | None) -> tuple[float, int, dict[str, str], bytes]:
+        """Delay before answering, status, headers and body of the response to `GET path`."""
+        name = posixpath.basename(urlparse(path).path)
+        rng = self.rng(name)
+        delay = max(self.latency + rng.uniform(-self.jitter, self.jitter), 0.0)
+        if rng.random() < self.error_rate:
+            return delay, 503, {}, b""
+        body = self.sprite(name)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if if_none_match == etag:
+            return delay, 304, {"ETag": etag, "Content-Length": "0"}, b""
+        return delay, 200, {"Content-Type": "image/png", "Content-Length": str(len(body)), "ETag": etag}, body
+
+    def chunks(self, body: bytes) -> Iterator[bytes]:
+        for start in range(0, len(body), CHUNK_SIZE):
+            yield body[start:start + CHUNK_SIZE]
+
+
+class SpriteServer(SpriteHost, ThreadingHTTPServer):
+    """Threaded HTTP/1.1 server answering sprite requests like the real host."""
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int] = ("127.0.0.1", 0), **options):
+        SpriteHost.__init__(self, **options)
+        ThreadingHTTPServer.__init__(self, address, _Handler)
+
+    def process_request(self, request, client_address) -> None:
+        self.connected()
+        super().process_request(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; with Nagle on, keep-alive clients
+    # would wait for a delayed ACK on every response.
+    disable_nagle_algorithm = True
+    server: SpriteServer
+
+    def setup(self) -> None:
+        super().setup()
+        time.sleep(self.server.handshake)
+
+    def do_GET(self) -> None:
+        server = self.server
+        delay, status, headers, body = server.respond(self.path, self.headers.get("If-None-Match"))
+        time.sleep(delay)
+        if status >= 400:
+            self.send_error(status)
+            return
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        for chunk in server.chunks(body):
+            self.wfile.write(chunk)
+            if server.bandwidth:
+                time.sleep(len(chunk) / server.bandwidth)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class Http2SpriteServer(SpriteHost):
+    """Cleartext HTTP/2 server with the same sprites and conditions, on an event loop of its own.
+
+    Has the `serve_forever` / `shutdown` / `server_close` methods of `SpriteServer`.
+    """
+
+    def __init__(self, address: tuple[str, int] = ("127.0.0.1", 0), **options):
+        if h2 is None:
+            raise ImportError("Http2SpriteServer needs the h2 package: pip install h2")
+        super().__init__(**options)
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._serve_connection, *address))
+        self.server_address = self._server.sockets[0].getsockname()
+        self._stopped = threading.Event()
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    def serve_forever(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._stopped.set()
+
+    def shutdown(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._stopped.wait()
+
+    def server_close(self) -> None:
+        self._server.close()
+        for writer in self._writers:
+            writer.close()
+        connections = asyncio.all_tasks(self._loop)
+        if connections:
+            self._loop.run_until_complete(asyncio.gather(*connections, return_exceptions=True))
+        self._loop.close()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connected()
+        self._writers.add(writer)
+        await asyncio.sleep(self.handshake)
+        connection = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        connection.initiate_connection()
+        writer.write(connection.data_to_send())
+        # Set whenever the client grants more flow-control window to the streams waiting for it.
+        window = asyncio.Event()
+        streams: set[asyncio.Task] = set()
+        try:
+            while data := await reader.read(65536):
+                for event in connection.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        headers = dict(event.headers)
+                        stream = asyncio.create_task(self._serve_stream(connection, writer, window, event.stream_id, headers))
+                        streams.add(stream)
+                        stream.add_done_callback(streams.discard)
+                    elif isinstance(event, h2.events.WindowUpdated):
+                        window.set()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+                writer.write(connection.data_to_send())
+        except (ConnectionError, h2.exceptions.ProtocolError):
+            pass
+        finally:
+            for stream in streams:
+                stream.cancel()
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _serve_stream(self, connection: Any, writer: asyncio.StreamWriter, window: asyncio.Event, stream_id: int, headers: dict[str, str]) -> None:
+        delay, status, response_headers, body = self.respond(headers[":path"], headers.get("if-none-match"))
+        await asyncio.sleep(delay)
+        response_headers = {":status": str(status), **{name.lower(): value for name, value in response_headers.items()}}
+        try:
+            connection.send_headers(stream_id, list(response_headers.items()), end_stream=not body)
+            writer.write(connection.data_to_send())
+            for chunk in self.chunks(body):
+                pause = len(chunk) / self.bandwidth if self.bandwidth else 0.0
+                while chunk:
+                    while (size := min(connection.local_flow_control_window(stream_id), connection.max_outbound_frame_size)) <= 0:
+                        window.clear()
+                        await window.wait()
+                    connection.send_data(stream_id, chunk[:size])
+                    writer.write(connection.data_to_send())
+                    chunk = chunk[size:]
+                if pause:
+                    await asyncio.sleep(pause)
+            if body:
+                connection.end_stream(stream_id)
+                writer.write(connection.data_to_send())
+        except h2.exceptions.StreamClosedError:
+            pass  # reset by the client, e.g. a hedged request that lost
+
+
+@contextlib.contextmanager
+def serve(http2: bool = False, **options) -> Iterator[SpriteHost]:
+    """Run a `SpriteServer` (`Http2SpriteServer` with `http2`) on a free local port for the duration of the block."""
+    server = (Http2SpriteServer if http2 else SpriteServer)(**options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def add_network_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.02, help="uniform +/- seconds added to the latency")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="bytes per second per response (0: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--handshake", type=float, default=0.0, help="seconds to set up every new connection, as TLS would")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--http2", action="store_true", help="serve cleartext HTTP/2 instead of HTTP/1.1")
+    add_network_arguments(parser)
+    args = parser.parse_args()
+    server = (Http2SpriteServer if args.http2 else SpriteServer)(
+        ("127.0.0.1", args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        handshake=args.handshake,
+    )
+    print(f"Serving {len(server.sprites)} sprites on {server.base_url}/sprites/bw/<name>.png", flush=True)
+    server.serve_forever()
@@ -0,0 +1,233 @@
+"""Reproducible benchmark of the downloaders and the loader backends.
+
+Every target runs `--repeats` times in a fresh subprocess against a local
+`mock_server.SpriteServer`, with the gen CSVs rewritten to point at it. Each run
+gets an empty sprite cache unless `--warm` is given. The report has the median
+and p95 wall time and the median time to first row (loaders only), both counted
+from before the target is imported, the median peak RSS and the throughput,
+printed as a table and optionally written as JSON.
+
+    python benchmarks/run.py --repeats 5 --latency 0.05 --json results.json
+    python benchmarks/run.py --targets asyncio_ load:asyncio load:hybrid --generations 1 2 3
+
+Decode-bound comparison of the free-threaded backend with the process backend,
+on a free-threaded interpreter (`--python`) and a warm cache:
+
+    python benchmarks/run.py --python python3.13t --warm --targets load:freethreaded load:process load:thread
+
+HTTP/1.1 against HTTP/2 (`--http2` of the downloaders, `http2=True` of the
+loaders), each against a mock server speaking that protocol, with every new
+connection paying a TLS-like setup delay. The `conns` column is the number of
+connections the server accepted per run:
+
+    python benchmarks/run.py --protocols http1 http2 --handshake 0.1
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import pathlib
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import mock_server
+
+REPO = pathlib.Path(__file__).resolve().parent.parent
+DOWNLOADERS_DIR = REPO / "concurrent-downloads"
+LOADER_DIR = REPO / "computer-vision-data-loader" / "src"
+DATA_DIR = REPO / "computer-vision-data-loader" / "data"
+
+DOWNLOADERS = ["sequential", "threading_", "multiprocessing_", "asyncio_"]
+LOADERS = ["sequential", "thread", "freethreaded", "process", "asyncio", "hybrid"]
+TARGETS = DOWNLOADERS + [f"load:{backend}" for backend in LOADERS]
+PROTOCOLS = ["http1", "http2"]
+
+
+def rewrite_csv(source: pathlib.Path, destination: pathlib.Path, base_url: str) -> pathlib.Path:
+    """Copy a gen CSV, pointing every Sprite URL at `base_url`."""
+    with open(source, newline="") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row["Sprite"] = base_url + urlparse(row["Sprite"]).path
+    with open(destination, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return destination
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def _peak_rss_mb() -> float:
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak / 1024  # kilobytes on Linux
+
+
+def run_child(target: str, inputs: list[str], workdir: str, options: dict) -> dict:
+    """Run one target in this (child) process and measure it."""
+    sys.path[:0] = [str(DOWNLOADERS_DIR), str(LOADER_DIR)]
+    first_row = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Timed from before the import: a short-lived process pays for it too.
+        t0 = time.perf_counter()
+        if target.startswith("load:"):
+            import loader
+
+            rows = loader.load(inputs, backend=target.removeprefix("load:"), ordered=False, **options)
+            items = 0
+            for _ in rows:
+                items += 1
+                if first_row is None:
+                    first_row = time.perf_counter() - t0
+            elapsed = time.perf_counter() - t0
+        else:
+            import asyncio
+            import importlib
+
+            module = importlib.import_module(target)
+            output_dir = os.path.join(workdir, "out")
+            if asyncio.iscoroutinefunction(module.main):
+                asyncio.run(module.main(output_dir, inputs, **options))
+            else:
+                module.main(output_dir, inputs, **options)
+            elapsed = time.perf_counter() - t0
+            items = sum(name.endswith(".png") for _, _, files in os.walk(output_dir) for name in files)
+    return {
+        "seconds": elapsed,
+        "first_row": first_row,
+        "items": items,
+        "peak_rss_mb": _peak_rss_mb(),
+        "gil_enabled": getattr(sys, "_is_gil_enabled", lambda: True)(),
+    }
+
+
+def run_target(
+    target: str,
+    inputs: list[str],
+    repeats: int,
+    warm: bool,
+    options: dict,
+    python: str = sys.executable,
+    server: mock_server.SpriteHost | None = None,
+) -> dict:
+    """Run `target` `repeats` times in fresh `python` subprocesses and summarise the runs.
+
+    With the `server` the inputs point at, every run also records how many
+    connections it opened.
+    """
+    runs = []
+    with tempfile.TemporaryDirectory() as shared_cache:
+        for attempt in range(repeats + int(warm)):
+            connections = server.connections if server is not None else 0
+            with tempfile.TemporaryDirectory() as workdir:
+                env = dict(os.environ, SPRITE_CACHE_DIR=shared_cache if warm else os.path.join(workdir, "cache"))
+                result_path = os.path.join(workdir, "result.json")
+                subprocess.run(
+                    [python, __file__, "--child", target, result_path, workdir, json.dumps(options), *inputs],
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    check=True,
+                )
+                with open(result_path) as f:
+                    result = json.load(f)
+            result["connections"] = server.connections - connections if server is not None else None
+            if warm and attempt == 0:
+                continue  # populates the cache, not measured
+            runs.append(result)
+    seconds = [run["seconds"] for run in runs]
+    first_rows = [run["first_row"] for run in runs if run["first_row"] is not None]
+    median = statistics.median(seconds)
+    items = runs[-1]["items"]
+    connections = [run["connections"] for run in runs if run["connections"] is not None]
+    return {
+        "target": target,
+        "protocol": "http2" if options.get("http2") else "http1",
+        "runs": runs,
+        "median_seconds": median,
+        "p95_seconds": percentile(seconds, 95),
+        "median_first_row_seconds": statistics.median(first_rows) if first_rows else None,
+        "median_peak_rss_mb": statistics.median(run["peak_rss_mb"] for run in runs),
+        "items": items,
+        "items_per_second": items / median if median else None,
+        "gil_enabled": runs[-1]["gil_enabled"],
+        "median_connections": statistics.median(connections) if connections else None,
+    }
+
+
+def format_table(results: list[dict]) -> str:
+    header = (
+        f"{'target':<18} {'HTTP':>5} {'median s':>9} {'p95 s':>8} {'1st row ms':>10} {'RSS MB':>8} "
+        f"{'items/s':>9} {'conns':>6} {'GIL':>4}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in results:
+        first_row = "-" if r["median_first_row_seconds"] is None else f"{1000 * r['median_first_row_seconds']:.1f}"
+        connections = "-" if r["median_connections"] is None else f"{r['median_connections']:g}"
+        lines.append(
+            f"{r['target']:<18} {r['protocol']:>5} {r['median_seconds']:>9.3f} {r['p95_seconds']:>8.3f} {first_row:>10} "
+            f"{r['median_peak_rss_mb']:>8.1f} {r['items_per_second'] or 0:>9.1f} {connections:>6} "
+            f"{'on' if r['gil_enabled'] else 'off':>4}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> list[dict]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=TARGETS, choices=TARGETS)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--generations", nargs="+", type=int, default=[1])
+    parser.add_argument("--warm", action="store_true", help="measure with a populated sprite cache")
+    parser.add_argument("--json", type=pathlib.Path, help="write the full results to this file")
+    parser.add_argument("--python", default=sys.executable, help="interpreter running the targets, e.g. python3.13t")
+    parser.add_argument(
+        "--protocols", nargs="+", default=["http1"], choices=PROTOCOLS,
+        help="run every target over each protocol; http2 needs h2",
+    )
+    mock_server.add_network_arguments(parser)
+    args = parser.parse_args(argv)
+
+    network = dict(
+        latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth, error_rate=args.error_rate, seed=args.seed,
+        handshake=args.handshake,
+    )
+    results = []
+    for protocol in args.protocols:
+        http2 = protocol == "http2"
+        with mock_server.serve(http2=http2, **network) as server, tempfile.TemporaryDirectory() as data_dir:
+            inputs = [
+                str(rewrite_csv(DATA_DIR / f"pokemon-gen{gen}-data.csv", pathlib.Path(data_dir) / f"gen{gen}.csv", server.base_url))
+                for gen in args.generations
+            ]
+            options = {"http2": True} if http2 else {}
+            for target in args.targets:
+                results.append(run_target(target, inputs, args.repeats, args.warm, options, args.python, server))
+                print(f"{target} ({protocol}): median {results[-1]['median_seconds']:.3f}s", file=sys.stderr, flush=True)
+
+    print(format_table(results))
+    if args.json:
+        args.json.write_text(json.dumps({"network": network, "warm": args.warm, "python": args.python, "results": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        target, result_path, workdir, options, *inputs = sys.argv[2:]
+        result = run_child(target, inputs, workdir, json.loads(options))
+        with open(result_path, "w") as f:
+            json.dump(result, f)
+    else:
+        main()
@@ -0,0 +1,26 @@
+"""Sprite grid shown by the `loader_*.py` scripts once they have loaded the CSV.
+
+`matplotlib` is only imported when a script plots, so importing the loaders, or
+starting the worker processes of `loader_multi`, does not pay for it.
+"""
+from typing import Sequence
+
+from loader import Row
+
+
+def plot_grid(pokemon_batch: Sequence[Row], rows: int = 13, cols: int = 12) -> None:
+    """Show the sprites on a `rows` x `cols` grid, titled with their position and name."""
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(rows, cols, figsize=(15, 15))
+    axes = axes.flatten()
+
+    for i, (ax, pokemon_row) in enumerate(zip(axes, pokemon_batch)):
+        ax.imshow(pokemon_row.image)
+        ax.set_title(f"#{i+1}: {pokemon_row.name}", fontsize=8)
+
+    for ax in axes:
+        ax.axis('off')
+
+    plt.tight_layout()
+    plt.show()
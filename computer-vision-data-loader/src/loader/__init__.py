@@ -0,0 +1,30 @@
+"""Pokémon sprite dataloader with interchangeable execution backends."""
+from .adaptive import AdaptiveLimiter
+from .archive import SpriteArchive
+from .collate import Batch, batched
+from .core import Downloader, Record, Row, download, read_records
+from .engine import BACKENDS, load, load_async
+from .imagecache import ImageCache
+from .retry import FetchError, RetryPolicy
+from .sampler import Sampler
+from .stream import time_to_first_row
+
+__all__ = [
+    "AdaptiveLimiter",
+    "BACKENDS",
+    "Batch",
+    "batched",
+    "Downloader",
+    "ImageCache",
+    "Record",
+    "Row",
+    "download",
+    "FetchError",
+    "load",
+    "load_async",
+    "read_records",
+    "RetryPolicy",
+    "Sampler",
+    "SpriteArchive",
+    "time_to_first_row",
+]
@@ -0,0 +1,36 @@
+"""Command line tools: `python -m loader pack OUTPUT_DIR ARCHIVE CSV...`."""
+import argparse
+
+from . import archive, collate
+
+
+def pack(args: argparse.Namespace) -> None:
+    count = archive.pack(
+        archive.read_downloads(args.output_dir, args.inputs),
+        args.path,
+        image_shape=tuple(args.image_shape),
+        channels=args.channels,
+        fit=args.fit,
+    )
+    print(f"Packed {count} sprites into {args.path}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m loader")
+    commands = parser.add_subparsers(required=True)
+
+    pack_parser = commands.add_parser("pack", help="pack downloaded sprites into a memory-mappable archive")
+    pack_parser.add_argument("output_dir", help="directory written by one of the concurrent-downloads scripts")
+    pack_parser.add_argument("path", help="archive file to create")
+    pack_parser.add_argument("inputs", nargs="+", help="CSV files with the metadata, in archive order")
+    pack_parser.add_argument("--image-shape", type=int, nargs=2, default=collate.DEFAULT_IMAGE_SHAPE, metavar=("H", "W"))
+    pack_parser.add_argument("--channels", type=int, default=3, choices=(1, 2, 3, 4))
+    pack_parser.add_argument("--fit", default="pad", choices=("pad", "resize"))
+    pack_parser.set_defaults(run=pack)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Adaptive (AIMD) concurrency limit for sprite downloads.
+
+The limit grows additively, one request per round of `limit` completions, as
+long as every round brings more throughput than the one before. It is cut
+multiplicatively as soon as the server pushes back: a latency spike (smoothed
+latency above `latency_tolerance` times the best seen so far), a 429/503
+response or a timeout. The same limiter can be shared by threads and asyncio
+tasks, and `stats()` reports the concurrency it settled on.
+"""
+import asyncio
+import collections
+import contextlib
+import functools
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# HTTP statuses that mean "slow down".
+BACKOFF_STATUSES = frozenset({429, 503})
+
+
+def is_backoff_error(error: BaseException) -> bool:
+    """Whether a failed request is a signal of overload rather than a plain error.
+
+    Recognises timeouts (`TimeoutError`, `requests`' `Timeout` family) and HTTP errors
+    carrying a 429/503 status (`aiohttp.ClientResponseError`, `requests.HTTPError`).
+    """
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return True
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in BACKOFF_STATUSES
+
+
+class AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease limit on requests in flight."""
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._cond = threading.Condition()
+        self._async_waiters: collections.deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = collections.deque()
+        self._in_flight = 0
+        self._latency: float | None = None
+        self._best_latency = float("inf")
+        self._round_start = time.perf_counter()
+        self._round_done = 0
+        self._last_throughput = 0.0
+        self._max_in_flight = 0
+        self._completed = 0
+        self._released = 0
+        self._last_backoff: int | None = None
+        self._backoffs = 0
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return int(self._limit)
+
+    def stats(self) -> dict[str, float]:
+        """Current limit, smoothed latency and counters, e.g. to report where the limit settled."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "max_in_flight": self._max_in_flight,
+                "completed": self._completed,
+                "backoffs": self._backoffs,
+                "latency": self._latency or 0.0,
+            }
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight >= self.limit:
+            return False
+        self._in_flight += 1
+        self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        return True
+
+    def acquire(self) -> None:
+        """Block until a request may start."""
+        with self._cond:
+            self._cond.wait_for(self._try_acquire)
+
+    async def acquire_async(self) -> None:
+        """Wait, without blocking the event loop, until a request may start."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, latency: float | None = None, backoff: bool = False) -> None:
+        """Finish a request, feeding its latency (or a back-off signal) into the limit."""
+        with self._cond:
+            self._in_flight -= 1
+            self._released += 1
+            if backoff:
+                self._back_off()
+            elif latency is not None:
+                self._on_success(latency)
+            self._cond.notify_all()
+            while self._async_waiters:
+                loop, waiter = self._async_waiters.popleft()
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    def _on_success(self, latency: float) -> None:
+        self._completed += 1
+        self._round_done += 1
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += self.smoothing * (latency - self._latency)
+        self._best_latency = min(self._best_latency, self._latency)
+        if self._latency > self.latency_tolerance * self._best_latency:
+            self._back_off()
+        elif self._round_done >= self.limit:
+            now = time.perf_counter()
+            throughput = self._round_done / max(now - self._round_start, 1e-9)
+            if throughput > self._last_throughput:
+                self._limit = min(self._limit + self.increase, self.maximum)
+            self._last_throughput = throughput
+            self._start_round()
+
+    def _back_off(self) -> None:
+        # At most one cut per round of `limit` requests: the requests that were
+        # already in flight report the same congestion.
+        if self._last_backoff is not None and self._released - self._last_backoff < self.limit:
+            return
+        self._last_backoff = self._released
+        self._backoffs += 1
+        self._limit = max(self._limit * self.decrease, self.minimum)
+        self._latency = self._best_latency if self._best_latency != float("inf") else None
+        self._last_throughput = 0.0
+        self._start_round()
+
+    def _start_round(self) -> None:
+        self._round_start = time.perf_counter()
+        self._round_done = 0
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """Run the body as one request: acquire, time it and release."""
+        self.acquire()
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.release(backoff=is_backoff_error(e))
+            raise
+        self.release(time.perf_counter() - t0)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self) -> AsyncIterator[None]:
+        """Async version of `slot`."""
+        await self.acquire_async()
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.release(backoff=is_backoff_error(e))
+            raise
+        self.release(time.perf_counter() - t0)
+
+    def wrap(self, fn: Callable[[str], T]) -> Callable[[str], T]:
+        """Limit every call of a blocking download function."""
+        @functools.wraps(fn)
+        def limited(source: str) -> T:
+            with self.slot():
+                return fn(source)
+        return limited
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,225 @@
+"""Packed sprite archive: decoded images at a fixed stride, read through `np.memmap`.
+
+An archive is two files::
+
+    <path>             raw `uint8` images of shape `(H, W, C)`, one after the other
+    <path>.index.npz   `entries` (name, type, number, offset, shape) and `image_shape`
+
+Every image is fitted to the archive's `(H, W, C)` when packed (see
+`collate.fit_image`), so image `i` starts at byte `i * H * W * C` and any slice
+of the archive is a single zero-copy `(n, H, W, C)` view. `shape` records the
+decoded size of the sprite before it was fitted. Opening an archive maps the
+file and reads the small index, so repeated epochs neither walk the download
+directories nor decode a PNG.
+
+Pack the output of a `concurrent-downloads` run with::
+
+    python -m loader pack ../concurrent-downloads/out_asyn sprites.bin data/pokemon-gen1-data.csv
+"""
+import functools
+import os
+import pathlib
+import tempfile
+from typing import Annotated, Iterable, Iterator
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import collate, core, stream
+from .collate import Fit
+from .core import Decoder, Downloader, Record, Row
+
+INDEX_DTYPE = np.dtype([
+    ("name", "U32"),
+    ("type", "U16"),
+    ("number", "i4"),
+    ("offset", "i8"),
+    ("shape", "i4", (3,)),
+])
+
+Entry = tuple[str, str, int, NDArray[np.uint8]]
+
+
+def index_path(path: str | os.PathLike) -> pathlib.Path:
+    """Location of the index belonging to the archive at `path`."""
+    path = pathlib.Path(path)
+    return path.with_name(path.name + ".index.npz")
+
+
+def pack(
+    entries: Iterable[Entry],
+    path: str | os.PathLike,
+    *,
+    image_shape: tuple[int, int] = collate.DEFAULT_IMAGE_SHAPE,
+    channels: int = 3,
+    fit: Fit = "pad",
+    background: int = 255,
+) -> int:
+    """
+    Write `(name, type, number, image)` entries to a new archive at `path`.
+
+    Images are streamed to disk one at a time, so packing needs memory for a
+    single image whatever the size of the catalog. Both files are written under
+    temporary names and moved into place, so readers never see a partial archive.
+
+    Args:
+        entries: Decoded sprites with their metadata, in archive order.
+        path: Destination of the image data; the index goes next to it.
+        image_shape: `(H, W)` every image is fitted to.
+        channels: Channel count of the stored images, see `collate.batched`.
+        fit: `"pad"` or `"resize"` images that do not match `image_shape`.
+        background: Padding value, also used to flatten transparency.
+
+    Returns:
+        The number of images written.
+    """
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    slot = np.empty((*image_shape, channels), dtype=np.uint8)
+    index = []
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for name, type_, number, image in entries:
+                image = np.asarray(image, dtype=np.uint8)
+                shape = image.shape + (1,) * (3 - image.ndim)
+                collate.fit_image(image, slot, fit=fit, background=background)
+                index.append((name, type_, number, f.tell(), shape))
+                f.write(slot.tobytes())
+        _write_index(index_path(path), np.array(index, dtype=INDEX_DTYPE), slot.shape)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(index)
+
+
+def _write_index(path: pathlib.Path, entries: NDArray, image_shape: tuple[int, ...]) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, entries=entries, image_shape=np.array(image_shape))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_downloads(
+    output_dir: str | os.PathLike,
+    sources: Iterable[Annotated[pathlib.Path, "CSV File"]],
+) -> Iterator[Entry]:
+    """
+    Decode the sprites a `concurrent-downloads` run left under `output_dir`.
+
+    The downloaders save `<output_dir>/<type1>/<pokemon>.png` in lowercase. The
+    CSVs give the order and the metadata; Pokémon whose sprite is missing (the
+    download failed) are skipped.
+    """
+    import imageio.v2 as imageio
+
+    output_dir = pathlib.Path(output_dir)
+    for filepath in sources:
+        for name, number, type_ in core.read_columns(filepath, ("Pokemon", "Number", "Type1")):
+            sprite = output_dir / type_.lower() / f"{name.lower()}.png"
+            if sprite.exists():
+                yield name, type_, int(number), imageio.imread(sprite)
+
+
+class SpriteArchive:
+    """Read-only, memory-mapped view of a packed archive.
+
+    `archive[i]` is an `(H, W, C)` view and `archive[i:j]` an `(n, H, W, C)` view
+    of the mapped file; neither copies. Metadata is available as the `names`,
+    `types`, `numbers` and `shapes` arrays.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = pathlib.Path(path)
+        with np.load(index_path(self.path)) as index:
+            self.entries = index["entries"]
+            image_shape = tuple(int(n) for n in index["image_shape"])
+        if len(self.entries):
+            self.images = np.memmap(self.path, dtype=np.uint8, mode="r", shape=(len(self.entries), *image_shape))
+        else:
+            self.images = np.empty((0, *image_shape), dtype=np.uint8)
+
+    @property
+    def names(self) -> NDArray[np.str_]:
+        return self.entries["name"]
+
+    @property
+    def types(self) -> NDArray[np.str_]:
+        return self.entries["type"]
+
+    @property
+    def numbers(self) -> NDArray[np.int32]:
+        return self.entries["number"]
+
+    @property
+    def shapes(self) -> NDArray[np.int32]:
+        return self.entries["shape"]
+
+    @functools.cached_property
+    def _positions(self) -> dict[str, int]:
+        return {str(name): i for i, name in enumerate(self.names)}
+
+    def position(self, name: str) -> int | None:
+        """Index of the sprite named `name`, or `None` if it was not packed."""
+        return self._positions.get(name)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, key: int | slice) -> NDArray[np.uint8]:
+        return self.images[key]
+
+    def row(self, i: int) -> Row:
+        return Row(image=self.images[i], name=str(self.names[i]))
+
+    def __iter__(self) -> Iterator[Row]:
+        return map(self.row, range(len(self)))
+
+
+@functools.lru_cache(maxsize=8)
+def open_archive(path: str | os.PathLike) -> SpriteArchive:
+    """Open `path` once per process; later calls reuse the same mapping."""
+    return SpriteArchive(path)
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader = core.download,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    archive: str | os.PathLike | SpriteArchive | None = None,
+    decoder: Decoder = core.decode,
+) -> Iterator[Row]:
+    """
+    Serve records from a packed archive, falling back to `downloader` for the rest.
+
+    Rows found in the archive are zero-copy views of the mapped file, so they are
+    read-only. Records missing from it (or every record when no archive is given)
+    are downloaded and decoded in the calling thread.
+
+    Args:
+        records: `(pokemon_name, sprite_url)` pairs to load.
+        downloader: The function used for records that are not in the archive.
+        ordered: Accepted to keep the backend signature uniform; rows are always in record order.
+        ordering: Accepted to keep the backend signature uniform.
+        max_workers: Accepted to keep the backend signature uniform.
+        prefetch: Accepted to keep the backend signature uniform.
+        archive: A `SpriteArchive` or the path of one, see `pack`.
+        decoder: Turns downloaded bytes into a `Row` for records not in the archive.
+
+    Yields:
+        A `Row` object for each Pokémon.
+    """
+    if archive is not None and not isinstance(archive, SpriteArchive):
+        archive = open_archive(os.fspath(archive))
+    for record in records:
+        i = archive.position(record[0]) if archive is not None else None
+        yield core.load_row(record, downloader, decoder) if i is None else archive.row(i)
@@ -0,0 +1,204 @@
+"""Asyncio backend: many concurrent downloads on a single event loop."""
+import asyncio
+import collections
+import contextlib
+import itertools
+import time
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Iterator
+
+from . import bridge, cache, core, metrics, sessions, stream
+from .adaptive import AdaptiveLimiter
+from .core import Decoder, Downloader, Record, Row
+from .retry import RetryPolicy
+
+if TYPE_CHECKING:
+    import aiohttp
+
+    from . import http2 as http2_
+
+DEFAULT_MAX_WORKERS = 20
+
+
+async def download(
+    session: "aiohttp.ClientSession | http2_.AsyncSession",
+    source: str,
+    limiter: AdaptiveLimiter | None = None,
+) -> bytes:
+    """Downloads content from a URL with the given session and returns it as bytes."""
+    return await cache.default_cache().fetch_async(session, source, limiter)
+
+
+async def _load_single_row_tuple(
+    session: "aiohttp.ClientSession | http2_.AsyncSession | None",
+    record: Record,
+    downloader: Downloader | None,
+    decode_executor: Executor | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    decoder: Decoder = core.decode,
+    retry: RetryPolicy | None = None,
+) -> Row:
+    """Download a record and decode it, on the loop or on `decode_executor` if given."""
+    pokemon_name, sprite_url = record
+
+    async def fetch() -> bytes:
+        if downloader is None:
+            return await download(session, sprite_url, limiter)
+        async with contextlib.nullcontext() if limiter is None else limiter.slot_async():
+            return await asyncio.to_thread(downloader, sprite_url)
+
+    try:
+        image_bytes = await (fetch() if retry is None else retry.call_async(fetch, sprite_url))
+        if decode_executor is None or decoder is core.encoded:
+            return decoder(pokemon_name, image_bytes)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(decode_executor, decoder, pokemon_name, image_bytes)
+    except Exception as e:
+        return core.error_row(pokemon_name, e)
+
+
+async def load_async(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader | None = None,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    decoder: Decoder = core.decode,
+    retry: RetryPolicy | None = None,
+    http2: bool = False,
+) -> AsyncIterator[Row]:
+    """
+    Load records concurrently on the running event loop.
+
+    Tasks are created lazily: at most `prefetch` rows are in flight or waiting for
+    the consumer, and a new record is only read when a row is handed out.
+
+    Args:
+        records: `(pokemon_name, sprite_url)` pairs to load.
+        downloader: Optional blocking download function, run with `asyncio.to_thread`.
+            By default sprites are fetched with a shared `aiohttp.ClientSession`.
+        ordered: Yield rows in record order instead of completion order.
+        ordering: What ordered loading does with a straggler, see `stream.Ordering`.
+        max_workers: Maximum number of concurrent downloads, `limiter.maximum`
+            when a limiter is given.
+        prefetch: Maximum number of rows loaded ahead of the consumer,
+            twice `max_workers` by default.
+        limiter: Optional `AdaptiveLimiter` tuning the downloads in flight to the server.
+        decoder: Turns the downloaded bytes into a `Row`, `core.decode` by default.
+        retry: Optional `RetryPolicy`; attempts past its timeout are cancelled and
+            hedged requests run as extra tasks on the loop.
+        http2: Fetch over HTTP/2 (see `http2.py`) instead of `aiohttp`'s HTTP/1.1
+            connections, all downloads multiplexed over a couple of connections.
+
+    Yields:
+        A `Row` object for each Pokémon.
+    """
+    if limiter is not None:
+        max_workers = max_workers or limiter.maximum
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    window = prefetch or 2 * max_workers
+    semaphore = asyncio.Semaphore(max_workers)
+    records = iter(records)
+    pending: collections.deque[tuple[Record, asyncio.Task[Row], float]] | set[asyncio.Task[Row]] = collections.deque()
+    # Given up on (skipped stragglers, slower copies of rescheduled ones); awaited on exit.
+    dropped: set[asyncio.Task[Row]] = set()
+    async with sessions.client_session(limit=max_workers, http2=http2) as session:
+
+        async def limited(record: Record) -> Row:
+            with metrics.span("queue"):
+                await semaphore.acquire()
+            try:
+                return await _load_single_row_tuple(
+                    session, record, downloader, limiter=limiter, decoder=decoder, retry=retry
+                )
+            finally:
+                semaphore.release()
+
+        def schedule(n: int) -> Iterator[tuple[Record, asyncio.Task[Row], float]]:
+            return (
+                (record, asyncio.ensure_future(limited(record)), time.monotonic())
+                for record in itertools.islice(records, n)
+            )
+
+        async def straggling(head: asyncio.Task[Row], since: float) -> bool:
+            """Wait until `head` is done or is a straggler of the full window; true for the latter."""
+            if not len(pending) == window > 1:
+                return False
+            running = {task for _, task, _ in itertools.islice(pending, 1, None) if not task.done()}
+            while running and not head.done():
+                _, running = await asyncio.wait(running | {head}, return_when=asyncio.FIRST_COMPLETED)
+                running.discard(head)
+            if not head.done():
+                await asyncio.wait({head}, timeout=stream.straggler_grace(since))
+            return not head.done()
+
+        try:
+            if ordered:
+                pending = collections.deque(schedule(window))
+                while pending:
+                    record, task, since = pending[0]
+                    if ordering != "wait" and not task.done() and await straggling(task, since):
+                        copies = {task}
+                        if ordering == "reschedule":
+                            metrics.count("stragglers_rescheduled")
+                            copies.add(asyncio.ensure_future(limited(record)))
+                            done, _ = await asyncio.wait(copies, return_when=asyncio.FIRST_COMPLETED)
+                            task = done.pop()
+                        else:
+                            metrics.count("stragglers_skipped")
+                            task = None
+                        for copy in copies - {task}:
+                            copy.cancel()
+                            dropped.add(copy)
+                            copy.add_done_callback(dropped.discard)
+                    pending.popleft()
+                    row = core.straggler_row(record) if task is None else await task
+                    pending.extend(schedule(1))
+                    yield row
+            else:
+                pending = {task for _, task, _ in schedule(window)}
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        pending.update(task for _, task, _ in schedule(1))
+                        yield task.result()
+        finally:
+            tasks = [entry[1] if ordered else entry for entry in pending] + list(dropped)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader | None = None,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    decoder: Decoder = core.decode,
+    retry: RetryPolicy | None = None,
+    http2: bool = False,
+) -> Iterator[Row]:
+    """Synchronous view over `load_async`, run on a background event-loop thread.
+
+    Downloads carry on while the consumer works on the rows it already has; see
+    `bridge.iterate`.
+    """
+    return bridge.iterate(lambda: load_async(
+        records,
+        downloader=downloader,
+        ordered=ordered,
+        ordering=ordering,
+        max_workers=max_workers,
+        prefetch=prefetch,
+        limiter=limiter,
+        decoder=decoder,
+        retry=retry,
+        http2=http2,
+    ))
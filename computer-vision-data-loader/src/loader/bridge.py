@@ -0,0 +1,114 @@
+"""Adapters between async iterators and synchronous code.
+
+`iterate` runs an async iterator on an event loop of its own, in a background
+thread, and hands its items to the calling thread through a queue. The loop
+keeps downloading while the consumer is busy with the previous rows, which a
+loop driven step by step from the consumer (`run_until_complete` per row)
+cannot do.
+
+`aiterate` goes the other way: it steps a blocking iterator on a worker thread
+so that a coroutine can `async for` over it without blocking its loop.
+"""
+import asyncio
+import contextlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Raised:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iterate(start: Callable[[], AsyncIterator[T]], *, ahead: int = 1) -> Iterator[T]:
+    """
+    Iterate synchronously over the async iterator returned by `start()`.
+
+    `start` is called on the background loop, so the iterator and everything it
+    creates (sessions, tasks, semaphores) belong to that loop. The iterator is
+    advanced at most `ahead` items beyond what the consumer asked for, so its
+    own read-ahead bounds still hold; the tasks it has started keep running in
+    between. Errors are raised in the consumer, and closing the returned
+    generator early cancels the async side and stops the thread.
+    """
+    loop = asyncio.new_event_loop()
+    handoff: queue.SimpleQueue = queue.SimpleQueue()
+    credits = asyncio.Semaphore(ahead - 1)
+
+    async def pump() -> None:
+        try:
+            items = start()
+            try:
+                while True:
+                    await credits.acquire()
+                    try:
+                        item = await anext(items)
+                    except StopAsyncIteration:
+                        break
+                    handoff.put(item)
+            finally:
+                if hasattr(items, "aclose"):
+                    await items.aclose()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            handoff.put(_Raised(e))
+        else:
+            handoff.put(_DONE)
+
+    async def stop() -> None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        await loop.shutdown_asyncgens()
+        await loop.shutdown_default_executor()
+
+    task = loop.create_task(pump())
+    thread = threading.Thread(target=loop.run_forever, name="loader-loop", daemon=True)
+    thread.start()
+    try:
+        while True:
+            loop.call_soon_threadsafe(credits.release)
+            item = handoff.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        asyncio.run_coroutine_threadsafe(stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def aiterate(items: Iterator[T]) -> AsyncIterator[T]:
+    """
+    Async iterator over the blocking iterator `items`, advanced on a worker thread.
+
+    `items` always runs on the same thread, one step at a time, and is closed when
+    the async iterator is, once any step still running has returned.
+    """
+    items = iter(items)
+    close = getattr(items, "close", lambda: None)
+    executor = ThreadPoolExecutor(1, thread_name_prefix="loader-step")
+    step = None
+    try:
+        while True:
+            step = executor.submit(next, items, _DONE)
+            item = await asyncio.wrap_future(step)
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        if step is None or step.done():
+            close()
+        else:
+            step.add_done_callback(lambda _: close())
+        executor.shutdown(wait=False)
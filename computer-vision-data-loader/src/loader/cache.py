@@ -0,0 +1,238 @@
+"""Persistent, content-addressed cache for sprite downloads.
+
+Layout under the cache root::
+
+    objects/<aa>/<sha256 of content>   raw bytes, shared by every URL with the same content
+    index/<sha256 of url>.json         url, digest, size, etag, last_modified, fetched_at
+
+Every file is written to a temporary name and moved into place with `os.replace`,
+so several processes can share one cache without ever reading a partial file. The
+modification time of an index entry records its last use and drives LRU eviction
+once the objects exceed `max_bytes`.
+
+The downloaders of `concurrent-downloads` use this module too (through their
+`shared.py`), so the downloaders and the loaders can point at the same directory.
+"""
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import time
+from typing import Any
+
+from . import metrics
+
+DEFAULT_ROOT = pathlib.Path(os.environ.get("SPRITE_CACHE_DIR", "~/.cache/pokemon-sprites")).expanduser()
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path: pathlib.Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SpriteCache:
+    """On-disk HTTP cache keyed by URL, with revalidation and LRU eviction.
+
+    Entries younger than `max_age` seconds are served without touching the network.
+    Older entries are revalidated with `If-None-Match` / `If-Modified-Since`, so an
+    unchanged sprite costs a single `304 Not Modified`.
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike = DEFAULT_ROOT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._approx_bytes: int | None = None
+
+    def _index_path(self, url: str) -> pathlib.Path:
+        return self.root / "index" / f"{_sha256(url.encode())}.json"
+
+    def _object_path(self, digest: str) -> pathlib.Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def _entry(self, url: str) -> dict[str, Any] | None:
+        try:
+            return json.loads(self._index_path(url).read_bytes())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _read(self, url: str, entry: dict[str, Any]) -> bytes | None:
+        try:
+            content = self._object_path(entry["digest"]).read_bytes()
+            os.utime(self._index_path(url))
+        except FileNotFoundError:  # evicted by another process
+            return None
+        return content
+
+    def get(self, url: str) -> bytes | None:
+        """Return the cached content if it is still fresh, otherwise `None`."""
+        entry = self._entry(url)
+        if entry is None or time.time() - entry["fetched_at"] > self.max_age:
+            return None
+        return self._read(url, entry)
+
+    def validators(self, url: str) -> dict[str, str]:
+        """Conditional request headers for a stale entry (empty if nothing is cached)."""
+        entry = self._entry(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, content: bytes, headers: Any = None) -> None:
+        """Store a `200 OK` response body together with its validators."""
+        headers = headers or {}
+        digest = _sha256(content)
+        path = self._object_path(digest)
+        if self._approx_bytes is None:
+            self._approx_bytes = self._object_bytes()
+        if not path.exists():
+            _atomic_write(path, content)
+            self._approx_bytes += len(content)
+        entry = {
+            "url": url,
+            "digest": digest,
+            "size": len(content),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        _atomic_write(self._index_path(url), json.dumps(entry).encode())
+        # The running total only covers this process, so a full scan is done when it
+        # crosses the cap rather than on every write.
+        if self._approx_bytes > self.max_bytes:
+            self._approx_bytes = self.evict()
+
+    def revalidated(self, url: str) -> bytes | None:
+        """Mark an entry fresh again after a `304 Not Modified` and return its content."""
+        entry = self._entry(url)
+        if entry is None:
+            return None
+        entry["fetched_at"] = time.time()
+        _atomic_write(self._index_path(url), json.dumps(entry).encode())
+        return self._read(url, entry)
+
+    def _object_bytes(self) -> int:
+        return sum(path.stat().st_size for path in (self.root / "objects").glob("*/*"))
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the objects fit in `max_bytes`.
+
+        Returns the number of bytes left in the cache.
+        """
+        entries = []
+        for index_path in (self.root / "index").glob("*.json"):
+            try:
+                entries.append((index_path.stat().st_mtime, index_path, json.loads(index_path.read_bytes())))
+            except (FileNotFoundError, ValueError):
+                continue
+        sizes = {entry["digest"]: entry["size"] for _, _, entry in entries}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return total
+        entries.sort(key=lambda item: item[0])
+        refs: dict[str, int] = {}
+        for _, _, entry in entries:
+            refs[entry["digest"]] = refs.get(entry["digest"], 0) + 1
+        for _, index_path, entry in entries:
+            if total <= self.max_bytes:
+                break
+            index_path.unlink(missing_ok=True)
+            refs[entry["digest"]] -= 1
+            if refs[entry["digest"]] == 0:
+                self._object_path(entry["digest"]).unlink(missing_ok=True)
+                total -= entry["size"]
+        return total
+
+    def fetch(self, session: Any, url: str, limiter: Any = None, timeout: float | None = None) -> bytes:
+        """Return the content of `url`, using `session.get` (`requests`) only when needed.
+
+        Raises the session's HTTP error for any status other than 200 and 304. Only
+        requests that reach the network go through `limiter` (an `AdaptiveLimiter`),
+        so cache hits do not distort its latency measurements; a `304` for content
+        evicted meanwhile is fetched again in the same slot, so a `RetryPolicy`
+        wrapping the call covers both requests. `timeout` bounds the connection and
+        every read, in seconds.
+        """
+        content = self.get(url)
+        if content is not None:
+            metrics.count("cache_hits")
+            return content
+        slot = contextlib.nullcontext() if limiter is None else limiter.slot()
+        with slot:
+            with metrics.span("transfer", url), session.get(url, headers=self.validators(url), timeout=timeout) as response:
+                if response.status_code == 304:
+                    content = self.revalidated(url)
+                    if content is not None:
+                        metrics.count("cache_revalidated")
+                        return content
+                else:
+                    response.raise_for_status()
+                    self.put(url, response.content, response.headers)
+                    metrics.count("bytes_downloaded", len(response.content))
+                    return response.content
+            # 304 for an entry that was evicted in the meantime: fetch it unconditionally,
+            # still in the limiter's slot.
+            with metrics.span("transfer", url), session.get(url, timeout=timeout) as response:
+                response.raise_for_status()
+                self.put(url, response.content, response.headers)
+                metrics.count("bytes_downloaded", len(response.content))
+                return response.content
+
+    async def fetch_async(self, session: Any, url: str, limiter: Any = None) -> bytes:
+        """Same as `fetch` for an `aiohttp.ClientSession`; time limits are left to the caller."""
+        content = self.get(url)
+        if content is not None:
+            metrics.count("cache_hits")
+            return content
+        slot = contextlib.nullcontext() if limiter is None else limiter.slot_async()
+        async with slot:
+            with metrics.span("transfer", url):
+                async with session.get(url, headers=self.validators(url)) as response:
+                    if response.status == 304:
+                        content = self.revalidated(url)
+                        if content is not None:
+                            metrics.count("cache_revalidated")
+                            return content
+                    else:
+                        response.raise_for_status()
+                        content = await response.read()
+                        self.put(url, content, response.headers)
+                        metrics.count("bytes_downloaded", len(content))
+                        return content
+            with metrics.span("transfer", url):
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    content = await response.read()
+                    self.put(url, content, response.headers)
+                    metrics.count("bytes_downloaded", len(content))
+                    return content
+
+
+@functools.cache
+def default_cache() -> SpriteCache:
+    """Process-wide cache rooted at `$SPRITE_CACHE_DIR` (`~/.cache/pokemon-sprites`)."""
+    return SpriteCache()
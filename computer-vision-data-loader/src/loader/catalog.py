@@ -0,0 +1,112 @@
+"""Columnar metadata index over the gen CSVs, cached on disk.
+
+The CSVs are parsed once into a single `DataFrame` (every CSV column plus a
+`Generation` column) that is pickled under `<sprite cache root>/catalog/`. The
+pickle is keyed by the path, size and modification time of every source, so
+editing or replacing a CSV rebuilds the index on the next run, as does a
+corrupt or truncated pickle.
+
+Filters are `DataFrame.query` expressions evaluated over whole columns, e.g.::
+
+    Type1 in ['FIRE', 'WATER'] and Speed > 100
+    Generation <= 3 and `Sp. Atk` >= 90
+
+Values are compared as they appear in the CSVs (types are uppercase).
+"""
+import hashlib
+import os
+import pathlib
+import pickle
+import re
+import tempfile
+from typing import Annotated, Iterable, Iterator
+
+import pandas as pd
+
+from . import cache
+from .core import Record
+
+GENERATION = re.compile(r"gen(\d+)", re.IGNORECASE)
+CATEGORICAL_COLUMNS = ("Type1", "Type2")
+
+
+def default_dir() -> pathlib.Path:
+    return cache.DEFAULT_ROOT / "catalog"
+
+
+def _fingerprint(sources: list[pathlib.Path]) -> str:
+    digest = hashlib.sha256(pd.__version__.encode())
+    for source in sources:
+        stat = source.stat()
+        digest.update(f"\0{source.resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _generation(source: pathlib.Path, position: int) -> int:
+    match = GENERATION.search(source.name)
+    return int(match[1]) if match else position
+
+
+def build(sources: Iterable[Annotated[pathlib.Path, "CSV File"]]) -> pd.DataFrame:
+    """Parse `sources` into one frame, in order, adding a `Generation` column.
+
+    The generation is read from the file name (`pokemon-gen3-data.csv`), or is the
+    position of the file among `sources` when the name does not carry one.
+    """
+    frames = []
+    for position, source in enumerate(map(pathlib.Path, sources), 1):
+        df = pd.read_csv(source)
+        df["Generation"] = _generation(source, position)
+        frames.append(df)
+    catalog = pd.concat(frames, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in catalog:
+            catalog[column] = catalog[column].astype("category")
+    return catalog
+
+
+def read_catalog(
+    sources: Iterable[Annotated[pathlib.Path, "CSV File"]],
+    cache_dir: str | os.PathLike | None = None,
+) -> pd.DataFrame:
+    """
+    The catalog of `sources`, from the on-disk index when it is still fresh.
+
+    Args:
+        sources: The CSV files, in catalog order.
+        cache_dir: Where indexes are kept, `<sprite cache root>/catalog` by default.
+
+    Returns:
+        One row per Pokémon with every CSV column and `Generation`.
+    """
+    sources = [pathlib.Path(source) for source in sources]
+    path = pathlib.Path(cache_dir or default_dir()) / f"{_fingerprint(sources)}.pkl"
+    try:
+        return pd.read_pickle(path)
+    except FileNotFoundError:
+        pass
+    except (pickle.UnpicklingError, EOFError):  # corrupt or truncated: rebuild it
+        path.unlink(missing_ok=True)
+    catalog = build(sources)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            catalog.to_pickle(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return catalog
+
+
+def select(catalog: pd.DataFrame, where: str | None = None) -> pd.DataFrame:
+    """The rows of `catalog` matching the `where` query, or all of them."""
+    if not where:
+        return catalog
+    return catalog.query(where)
+
+
+def records(catalog: pd.DataFrame) -> Iterator[Record]:
+    """Yield `(pokemon_name, sprite_url)` for every row of `catalog`."""
+    return zip(catalog["Pokemon"], catalog["Sprite"])
@@ -0,0 +1,143 @@
+"""Collate rows into fixed-shape `uint8` batches filled in place."""
+import dataclasses
+from typing import Iterable, Iterator, Literal
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .core import Row
+
+Fit = Literal["pad", "resize"]
+
+DEFAULT_IMAGE_SHAPE = (96, 96)
+
+
+@dataclasses.dataclass
+class Batch:
+    """A batch of images of shape `(B, H, W, C)` and their names of shape `(B,)`."""
+    images: NDArray[np.uint8]
+    names: NDArray[np.object_]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def _split_alpha(image: NDArray[np.uint8]) -> tuple[NDArray[np.uint8], NDArray[np.uint8] | None]:
+    if image.ndim == 2:
+        image = image[..., np.newaxis]
+    if image.shape[-1] in (2, 4):
+        return image[..., :-1], image[..., -1:]
+    return image, None
+
+
+def _write_channels(src: NDArray[np.uint8], dst: NDArray[np.uint8], background: int) -> None:
+    """Copy `src` (gray, gray+alpha, RGB or RGBA) into `dst`, converting the channel count."""
+    color, alpha = _split_alpha(src)
+    dst_colors = 1 if dst.shape[-1] in (1, 2) else 3
+    if color.shape[-1] != dst_colors:
+        if dst_colors == 3:
+            color = np.broadcast_to(color, color.shape[:-1] + (3,))
+        else:
+            color = (color @ np.array([0.299, 0.587, 0.114]))[..., np.newaxis].round().astype(np.uint8)
+    if dst.shape[-1] in (2, 4):
+        dst[..., :-1] = color
+        dst[..., -1:] = 255 if alpha is None else alpha
+    elif alpha is None:
+        dst[...] = color
+    else:
+        # Composite transparent pixels over a flat background, in integer arithmetic.
+        weight = alpha.astype(np.uint16)
+        dst[...] = (color * weight + background * (255 - weight) + 127) // 255
+
+
+def fit_image(
+    image: NDArray[np.uint8],
+    out: NDArray[np.uint8],
+    *,
+    fit: Fit = "pad",
+    background: int = 255,
+) -> None:
+    """
+    Write `image` into the preallocated `(H, W, C)` array `out`.
+
+    Args:
+        image: A decoded sprite, `(h, w)` or `(h, w, 1 | 2 | 3 | 4)`.
+        out: Destination slot, usually one entry of a batch buffer.
+        fit: `"pad"` centers the image, padding with `background` or cropping as needed;
+            `"resize"` scales it to `(H, W)` with nearest-neighbour sampling.
+        background: Value used for padding and to flatten transparency when `out`
+            has no alpha channel.
+    """
+    height, width = out.shape[:2]
+    if fit == "resize":
+        rows = np.arange(height) * image.shape[0] // height
+        cols = np.arange(width) * image.shape[1] // width
+        _write_channels(image[rows[:, np.newaxis], cols], out, background)
+    elif fit == "pad":
+        top = max((image.shape[0] - height) // 2, 0)
+        left = max((image.shape[1] - width) // 2, 0)
+        src = image[top:top + height, left:left + width]
+        if src.shape[:2] != (height, width):
+            out.fill(background)
+        y = (height - src.shape[0]) // 2
+        x = (width - src.shape[1]) // 2
+        _write_channels(src, out[y:y + src.shape[0], x:x + src.shape[1]], background)
+    else:
+        raise ValueError(f"Unknown fit {fit!r}, expected 'pad' or 'resize'")
+
+
+def batched(
+    rows: Iterable[Row],
+    batch_size: int,
+    *,
+    image_shape: tuple[int, int] = DEFAULT_IMAGE_SHAPE,
+    channels: int = 3,
+    fit: Fit = "pad",
+    background: int = 255,
+    num_buffers: int = 2,
+) -> Iterator[Batch]:
+    """
+    Group rows into contiguous `(batch_size, H, W, channels)` batches.
+
+    Batches are filled in place from `num_buffers` preallocated buffers that are
+    used in turn, so no array is allocated per image or per batch. A batch stays
+    valid until `num_buffers` more batches have been requested; copy it if it has
+    to outlive that. The last batch may be shorter than `batch_size`.
+
+    Args:
+        rows: Rows from any backend.
+        batch_size: Number of images per batch.
+        image_shape: `(H, W)` of every image in the batch.
+        channels: 1 (gray), 2 (gray + alpha), 3 (RGB) or 4 (RGBA).
+        fit: How images of another size are brought to `image_shape`, see `fit_image`.
+        background: Padding value, also used to flatten transparency.
+        num_buffers: Number of buffers rotated between batches.
+
+    Yields:
+        A `Batch` for every `batch_size` rows.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    if channels not in (1, 2, 3, 4):
+        raise ValueError(f"channels must be 1, 2, 3 or 4, got {channels}")
+    buffers = [
+        (np.empty((batch_size, *image_shape, channels), dtype=np.uint8), np.empty(batch_size, dtype=object))
+        for _ in range(num_buffers)
+    ]
+    turn = 0
+    images, names = buffers[0]
+    filled = 0
+    for row in rows:
+        fit_image(row.image, images[filled], fit=fit, background=background)
+        # Copied into the batch: a shared-memory slot (`shm.SharedRow`) can be reused.
+        if hasattr(row, "release"):
+            row.release()
+        names[filled] = row.name
+        filled += 1
+        if filled == batch_size:
+            yield Batch(images, names)
+            turn += 1
+            images, names = buffers[turn % num_buffers]
+            filled = 0
+    if filled:
+        yield Batch(images[:filled], names[:filled])
@@ -0,0 +1,184 @@
+"""Types and helpers shared by every loader backend.
+
+Importing the loader stays cheap: CSVs are parsed with the `csv` module, and
+`imageio` and the HTTP clients are only imported once a sprite is decoded or
+downloaded, so short-lived processes and spawned workers start quickly.
+"""
+import contextlib
+import csv
+import dataclasses
+import functools
+import importlib
+import multiprocessing
+import pathlib
+import sys
+from typing import Annotated, Callable, Iterable, Iterator, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import cache, metrics, sessions
+from .adaptive import AdaptiveLimiter
+from .retry import RetryPolicy
+
+Record = tuple[str, str]
+Downloader = Callable[[str], bytes]
+Decoder = Callable[[str, bytes], "Row"]
+
+# Appended to the name of the placeholder rows of failed records.
+ERROR_SUFFIX = " (Error)"
+# Seconds without progress before a request is abandoned, when no `RetryPolicy` sets it.
+DEFAULT_TIMEOUT = 30.0
+
+
+@dataclasses.dataclass
+class Row:
+    """Represents a single row of data with an image and a name."""
+    image: NDArray[np.uint8]
+    name: str
+
+
+class TaggedName(str):
+    """
+    A Pokémon name carrying the `key` of the record it is loaded for.
+
+    Rows built from it keep it, placeholders of failed records included (see
+    `error_row`), so rows of records sharing a name can be told apart.
+    """
+
+    key: int
+
+    def __new__(cls, name: str, key: int) -> "TaggedName":
+        tagged = super().__new__(cls, name)
+        tagged.key = key
+        return tagged
+
+    def __reduce__(self) -> tuple[type, tuple[str, int]]:
+        return TaggedName, (str(self), self.key)
+
+
+def _fetch(source: str, limiter: AdaptiveLimiter | None, timeout: float, http2: bool = False) -> bytes:
+    session = sessions.get_http2_session() if http2 else sessions.get_session()
+    return cache.default_cache().fetch(session, source, limiter, timeout)
+
+
+def download(
+    source: str,
+    limiter: AdaptiveLimiter | None = None,
+    retry: RetryPolicy | None = None,
+    http2: bool = False,
+) -> bytes:
+    """Downloads content from a URL and returns it as bytes.
+
+    Responses go through the on-disk sprite cache, so a warm cache never hits the
+    network, and misses reuse the process's pooled keep-alive session, or its
+    multiplexed HTTP/2 session with `http2`. Requests that do reach the network
+    are gated by `limiter` when one is given, and retried, timed out and hedged
+    according to `retry`.
+    """
+    if retry is None:
+        return _fetch(source, limiter, DEFAULT_TIMEOUT, http2)
+    return retry.call(functools.partial(_fetch, limiter=limiter, http2=http2), source, timed=True)
+
+
+def _is_download(downloader: Downloader) -> bool:
+    return getattr(downloader, "func", downloader) is download
+
+
+def limited(downloader: Downloader, limiter: AdaptiveLimiter) -> Downloader:
+    """Put `downloader` behind `limiter`; for `download` only cache misses are limited."""
+    if _is_download(downloader):
+        return functools.partial(downloader, limiter=limiter)
+    return limiter.wrap(downloader)
+
+
+def retrying(downloader: Downloader, retry: RetryPolicy) -> Downloader:
+    """Run `downloader` under `retry`; for `download` only cache misses are retried."""
+    if _is_download(downloader):
+        return functools.partial(downloader, retry=retry)
+    return retry.wrap(downloader)
+
+
+def preload(downloader: Downloader | None, decoder: Decoder, client: str = "requests") -> None:
+    """Import the HTTP `client` of the built-in download and the codecs of `decode`, when used.
+
+    Called before forking worker processes, which then inherit them instead of
+    each importing them again. Workers started with "spawn" or "forkserver"
+    begin from a fresh interpreter and import only what they use.
+    """
+    if multiprocessing.get_start_method() != "fork":
+        return
+    modules = []
+    if downloader is None or _is_download(downloader):
+        modules.append(client)
+    if decoder is decode:
+        modules.append("imageio.v2")
+    for module in modules:
+        with contextlib.suppress(ImportError):  # reported by the workers, per row
+            importlib.import_module(module)
+
+
+def read_columns(filepath: Annotated[pathlib.Path, "CSV File"], columns: Sequence[str]) -> Iterator[tuple[str, ...]]:
+    """Yield the values of `columns` for every row of a CSV file with a header, in order.
+
+    Rows are read one at a time, so arbitrarily large catalogs are never held in memory.
+    """
+    with open(filepath, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{filepath} has no {', '.join(missing)} column")
+        indices = [header.index(column) for column in columns]
+        for row in reader:
+            if row:
+                yield tuple(row[i] for i in indices)
+
+
+def read_records(sources: Iterable[Annotated[pathlib.Path, "CSV File"]]) -> Iterator[Record]:
+    """Yield `(pokemon_name, sprite_url)` for every row of every CSV file, in order."""
+    for filepath in sources:
+        yield from read_columns(filepath, ("Pokemon", "Sprite"))
+
+
+def decode(pokemon_name: str, image_bytes: bytes) -> Row:
+    """Decode the raw sprite bytes into a `Row`."""
+    import imageio.v2 as imageio
+
+    with metrics.span("decode", pokemon_name):
+        return Row(image=imageio.imread(image_bytes), name=pokemon_name)
+
+
+def encoded(pokemon_name: str, image_bytes: bytes) -> Row:
+    """Keep the sprite encoded: a `Row` whose image is the PNG file as a 1-D `uint8` array.
+
+    Used as the decoder of the backends when decoding is left to a transform stage.
+    """
+    return Row(image=np.frombuffer(image_bytes, dtype=np.uint8), name=pokemon_name)
+
+
+def is_encoded(row: Row) -> bool:
+    return row.image.ndim == 1
+
+
+def error_row(pokemon_name: str, error: Exception) -> Row:
+    """Placeholder row returned when a sprite could not be downloaded or decoded."""
+    print(f"Error loading {pokemon_name}: {error}", file=sys.stderr)
+    name = f"{pokemon_name}{ERROR_SUFFIX}"
+    if isinstance(pokemon_name, TaggedName):
+        name = TaggedName(name, pokemon_name.key)
+    return Row(image=np.zeros((96, 96, 3), dtype=np.uint8), name=name)
+
+
+def straggler_row(record: Record) -> Row:
+    """Placeholder row of a record skipped by the `"skip"` ordering (see `stream.Ordering`)."""
+    return error_row(record[0], TimeoutError("still loading when the rest of the reorder window was ready"))
+
+
+def load_row(record: Record, downloader: Downloader = download, decoder: Decoder = decode) -> Row:
+    """Download and decode a single `(pokemon_name, sprite_url)` record."""
+    pokemon_name, sprite_url = record
+    try:
+        return decoder(pokemon_name, downloader(sprite_url))
+    except Exception as e:
+        return error_row(pokemon_name, e)
@@ -0,0 +1,181 @@
+"""Single `load()` entry point dispatching to the pluggable backends."""
+import functools
+import pathlib
+from typing import Annotated, AsyncIterator, Callable, Iterator, Sequence
+
+from . import archive, asyncio_, bridge, collate, core, freethreaded, hybrid, imagecache, process, sampler, sequential, thread, transforms
+from .collate import Batch, Fit
+from .core import Downloader, Record, Row
+from .imagecache import ImageCache
+from .retry import RetryPolicy
+from .sampler import Sampler
+from .stream import ORDERINGS, Ordering
+from .transforms import Transform
+
+Backend = Callable[..., Iterator[Row]]
+
+BACKENDS: dict[str, Backend] = {
+    "sequential": sequential.load,
+    "thread": thread.load,
+    "freethreaded": freethreaded.load,
+    "process": process.load,
+    "asyncio": asyncio_.load,
+    "hybrid": hybrid.load,
+    "archive": archive.load,
+}
+# Backends that run `retry` and `http2` on their event loops instead of around a blocking downloader.
+ASYNC_BACKENDS = frozenset({"asyncio", "hybrid"})
+
+
+def load(
+    sources: Sequence[Annotated[pathlib.Path, "CSV File"]],
+    *,
+    backend: str = "sequential",
+    where: str | None = None,
+    sampler: Sampler | None = None,
+    ordered: bool = True,
+    ordering: Ordering = "wait",
+    downloader: Downloader | None = None,
+    retry: RetryPolicy | None = None,
+    http2: bool = False,
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    image_cache: ImageCache | None = None,
+    dedup: bool = True,
+    transform: Transform | None = None,
+    transform_workers: int | None = None,
+    batch_size: int | None = None,
+    image_shape: tuple[int, int] = collate.DEFAULT_IMAGE_SHAPE,
+    channels: int = 3,
+    fit: Fit = "pad",
+    batch_transform: Transform | None = None,
+    **options,
+) -> Iterator[Row] | Iterator[Batch]:
+    """
+    Creates a dataloader for the Pokémon dataset.
+
+    Every backend yields the same `Row` objects, so the execution strategy can be
+    switched by configuration without touching the consumer.
+
+    Args:
+        sources: A sequence of file paths to the CSV files.
+        backend: One of `"sequential"`, `"thread"`, `"freethreaded"` (threads that
+            also decode in parallel on a free-threaded Python), `"process"`,
+            `"asyncio"`, `"hybrid"` (an asyncio event loop in each of several
+            processes) or `"archive"` (memory-mapped rows from a packed archive).
+        where: Only load the Pokémon matching this query over the CSV columns and
+            `Generation`, e.g. `"Type1 in ['FIRE', 'WATER'] and Speed > 100"`. It is
+            evaluated on the cached catalog index, so nothing else is downloaded.
+        sampler: Shuffles the records for the sampler's epoch and keeps this rank's
+            shard, before anything is downloaded. Call `sampler.set_epoch()` between epochs.
+        ordered: Yield rows in CSV order. When `False` rows come out as soon as
+            they are ready, which lowers the time to the first row.
+        ordering: What ordered loading does with a straggler, a row still loading
+            once the `prefetch` window is full, every later row of it is ready, and
+            it was given as long again (see `stream.straggler_grace`; a bigger
+            window gives slow rows more slack). `"wait"` for it
+            (head-of-line blocking), `"skip"` it with a placeholder row so the
+            others keep flowing, or `"reschedule"` a second copy of it and keep
+            whichever finishes first. Rows stay in CSV order and memory bounded by
+            the window either way. Stragglers are counted in the `metrics` counters.
+        downloader: The function to use for downloading image content. Defaults to
+            `requests` for the blocking backends and `aiohttp` for `"asyncio"`.
+        retry: Retry, time out and hedge the downloads with this `RetryPolicy`.
+            Without one every download is tried once, and failed records become
+            placeholder rows either way. `"process"` and `"hybrid"` send it to each
+            worker once, so every worker keeps its own latencies and retry budget.
+        http2: Fetch the sprites over HTTP/2, every download of a process
+            multiplexed over a couple of connections instead of one HTTP/1.1
+            connection each. Needs `h2`; see `http2.py`.
+        max_workers: Threads, processes or concurrent downloads, depending on the backend.
+        prefetch: Maximum number of rows downloaded or decoded ahead of the consumer.
+            Records are read lazily, so memory stays flat however large the dataset.
+        image_cache: Serve already decoded sprites from this in-memory cache and add
+            the ones the backend loads. Reuse it across epochs so that only the first
+            one downloads and decodes.
+        dedup: Coalesce records sharing a sprite URL: while a URL is being loaded,
+            its later records wait for that row instead of reaching the backend,
+            and get a copy of its image. With `image_cache`, rows already handed
+            out are reused too. Counted as `coalesced` in the `metrics` counters.
+        transform: Applied to every image, e.g. a `transforms.Compose`. The backend
+            then only downloads, and decoding plus `transform` run on a separate
+            pool of `transform_workers` threads (one per CPU core by default).
+        transform_workers: Threads of the decode and transform stage.
+        batch_size: When set, yield `Batch` objects of `batch_size` images collated
+            into reusable `(B, H, W, C)` `uint8` buffers instead of single rows.
+        image_shape: `(H, W)` of the batched images.
+        channels: Channel count of the batched images (RGBA is flattened onto white for 3).
+        fit: `"pad"` or `"resize"` images that do not match `image_shape`.
+        batch_transform: Applied to the `(B, H, W, C)` images of every batch, for the
+            vectorised transforms (e.g. `transforms.Normalize`). Requires `batch_size`.
+        **options: Backend specific settings, e.g. `transport="shm"` for `"process"`,
+            `limiter=AdaptiveLimiter()` for `"thread"`, `"freethreaded"` and `"asyncio"` or
+            `archive="sprites.bin"` for `"archive"`.
+
+    Yields:
+        A `Row` object for each Pokémon, or a `Batch` when `batch_size` is set.
+    """
+    if batch_transform is not None and batch_size is None:
+        raise ValueError("batch_transform requires batch_size")
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering {ordering!r}, expected one of {list(ORDERINGS)}")
+    try:
+        run = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(BACKENDS)}") from None
+    if http2:
+        if downloader is not None:
+            raise ValueError("http2 only applies to the built-in downloads, not to a custom downloader")
+        from . import http2 as http2_
+
+        if not http2_.available():
+            raise ImportError("HTTP/2 needs the h2 package: pip install h2")
+        if backend in ASYNC_BACKENDS:
+            options["http2"] = True
+        else:
+            downloader = functools.partial(core.download, http2=True)
+    if downloader is not None:
+        options["downloader"] = downloader
+    if retry is not None:
+        if backend in ASYNC_BACKENDS:
+            options["retry"] = retry
+        else:
+            options["downloader"] = core.retrying(downloader or core.download, retry)
+    if transform is not None and image_cache is None:
+        # The backend only downloads; decoding happens in the transform stage. With a
+        # cache the backends keep decoding, as the cache holds decoded images.
+        options["decoder"] = core.encoded
+    if where is None:
+        records = core.read_records(sources)
+    else:
+        from . import catalog  # pandas, only needed to filter
+
+        records = catalog.records(catalog.select(catalog.read_catalog(sources), where))
+    if sampler is not None:
+        records = sampler.sample(records)
+    options.update(ordered=ordered, ordering=ordering, max_workers=max_workers, prefetch=prefetch)
+    if image_cache is None and not dedup:
+        rows = run(records, **options)
+    else:
+        rows = imagecache.load_through(image_cache, run, records, **options)
+    if transform is not None:
+        rows = transforms.apply(rows, transform, max_workers=transform_workers, window=prefetch, ordered=ordered)
+    if batch_size is None:
+        return rows
+    batches = collate.batched(rows, batch_size, image_shape=image_shape, channels=channels, fit=fit)
+    if batch_transform is None:
+        return batches
+    return (Batch(batch_transform(batch.images), batch.names) for batch in batches)
+
+
+def load_async(
+    sources: Sequence[Annotated[pathlib.Path, "CSV File"]], **options
+) -> AsyncIterator[Row] | AsyncIterator[Batch]:
+    """
+    `load` for coroutines: the same rows or batches, as an async iterator.
+
+    Any backend can be awaited this way. The pipeline is advanced on a worker
+    thread, so the caller's event loop is never blocked by downloads, decoding or
+    collation. Takes the same arguments as `load`.
+    """
+    return bridge.aiterate(load(sources, **options))
@@ -0,0 +1,56 @@
+"""Free-threaded backend: download and decode on one pool of threads, without a GIL.
+
+On a free-threaded CPython (`python3.13t` and later, with the GIL disabled at
+runtime) the threads of a pool decode PNGs on every core at once, and rows reach
+the consumer without being pickled as the process backends must. The pool is
+then sized for both the downloads in flight and the cores.
+
+On a regular build, or when an extension module turned the GIL back on, this is
+the thread backend: downloads still overlap, decoding is serialised. Use
+`available()` to tell the two apart, and the `"process"` or `"hybrid"` backends to
+decode in parallel on such interpreters.
+"""
+import os
+import sys
+from typing import Iterable, Iterator
+
+from . import core, stream, thread
+from .adaptive import AdaptiveLimiter
+from .core import Decoder, Downloader, Record, Row
+
+
+def available() -> bool:
+    """Whether Python threads run in parallel in this interpreter (the GIL is disabled)."""
+    return not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader = core.download,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    decoder: Decoder = core.decode,
+) -> Iterator[Row]:
+    """
+    Load records on a pool of threads that also decode in parallel when the GIL is disabled.
+
+    Takes the same arguments as `thread.load`. Without the GIL, `max_workers`
+    defaults to the thread backend's downloads in flight plus one thread per core.
+    """
+    if max_workers is None and available():
+        downloads = limiter.maximum if limiter is not None else thread.DEFAULT_MAX_WORKERS
+        max_workers = downloads + (os.cpu_count() or 1)
+    return thread.load(
+        records,
+        downloader=downloader,
+        ordered=ordered,
+        ordering=ordering,
+        max_workers=max_workers,
+        prefetch=prefetch,
+        limiter=limiter,
+        decoder=decoder,
+    )
@@ -0,0 +1,309 @@
+"""Optional HTTP/2 transport: sprite requests multiplexed over a few connections.
+
+Every sprite comes from the same host, so instead of one HTTP/1.1 connection per
+request in flight, the HTTP/2 sessions send them as concurrent streams of at
+most `max_connections` connections per host; a new connection is only opened
+once the open ones carry as many streams as the server allows (often 100).
+
+Each connection has a single task reading its frames and handing them to the
+streams they belong to, so a response is complete as soon as its last frame
+arrives, whatever the other streams are waiting for.
+
+`Session` and `AsyncSession` offer the part of the `requests` and `aiohttp` APIs
+that `cache.py` uses, so the sprite cache, the retry policy and the adaptive
+limiter work unchanged on top of them. Broken connections raise `OSError`s and
+slow requests `TimeoutError`, which `retry.is_retryable` already retries.
+
+Needs the `h2` package (the `http2` extra) once a session is created. HTTP/1.1
+is never used: `https://` hosts must negotiate HTTP/2 with ALPN and `http://`
+ones (e.g. the local mock server) are spoken to in HTTP/2 directly ("prior
+knowledge"). Redirects are not followed.
+"""
+import asyncio
+import contextlib
+import ssl
+import threading
+from typing import Any, AsyncIterator
+from urllib.parse import urlsplit
+
+from . import metrics
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+except ImportError:  # only needed once a session is created
+    h2 = None
+
+# Connections per host; each one carries up to the server's stream limit.
+DEFAULT_MAX_CONNECTIONS = 2
+# Seconds a request may take, unless `get` sets it.
+DEFAULT_TIMEOUT = 30.0
+_READ_SIZE = 65536
+
+
+def available() -> bool:
+    """Whether the HTTP/2 dependency (`h2`) is installed."""
+    return h2 is not None
+
+
+class HTTPError(Exception):
+    """Raised by `raise_for_status`; `status` is read by `retry.status_of` as for `aiohttp`."""
+
+    def __init__(self, url: str, status: int):
+        super().__init__(f"{status} for {url}")
+        self.url = url
+        self.status = status
+
+
+class Headers(dict):
+    """Response headers, looked up regardless of case (HTTP/2 sends them lowercase)."""
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return super().get(name.lower(), default)
+
+    def __getitem__(self, name: str) -> str:
+        return super().__getitem__(name.lower())
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and super().__contains__(name.lower())
+
+
+class Response:
+    """A response read in full, with the attributes `cache.py` uses of both `requests` and `aiohttp` ones."""
+
+    def __init__(self, url: str, status: int, headers: Headers, content: bytes):
+        self.url = url
+        self.status = self.status_code = status
+        self.headers = headers
+        self.content = content
+
+    def raise_for_status(self) -> None:
+        # Redirects are not followed, so they are errors too.
+        if self.status >= 300 and self.status != 304:
+            raise HTTPError(self.url, self.status)
+
+    async def read(self) -> bytes:
+        return self.content
+
+    def __enter__(self) -> "Response":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+class _Stream:
+    def __init__(self, url: str, future: asyncio.Future):
+        self.url = url
+        self.future = future
+        self.status = 0
+        self.headers = Headers()
+        self.body: list[bytes] = []
+
+
+class _Connection:
+    """One HTTP/2 connection, whose frames are all read by a single task."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._h2 = h2.connection.H2Connection(h2.config.H2Configuration(client_side=True, header_encoding="utf-8"))
+        self._h2.initiate_connection()
+        self._writer.write(self._h2.data_to_send())
+        self._streams: dict[int, _Stream] = {}
+        # Set whenever a stream ends, for the requests waiting for a free one.
+        self._released = asyncio.Event()
+        self.closed = False
+        self._reading = asyncio.ensure_future(self._read_frames())
+
+    @classmethod
+    async def open(cls, scheme: str, host: str, port: int) -> "_Connection":
+        context = None
+        if scheme == "https":
+            context = ssl.create_default_context()
+            context.set_alpn_protocols(["h2"])
+        with metrics.span("connect", host):
+            reader, writer = await asyncio.open_connection(host, port, ssl=context)
+        if context is not None and writer.get_extra_info("ssl_object").selected_alpn_protocol() != "h2":
+            writer.close()
+            raise ConnectionRefusedError(f"{host} does not speak HTTP/2")
+        return cls(reader, writer)
+
+    @property
+    def streams(self) -> int:
+        return len(self._streams)
+
+    @property
+    def full(self) -> bool:
+        return self._h2.open_outbound_streams >= self._h2.remote_settings.max_concurrent_streams
+
+    async def request(self, url: str, headers: list[tuple[str, str]]) -> Response:
+        while self.full and not self.closed:
+            self._released.clear()
+            await self._released.wait()
+        if self.closed:
+            raise ConnectionResetError(f"HTTP/2 connection closed before requesting {url}")
+        stream_id = self._h2.get_next_available_stream_id()
+        self._h2.send_headers(stream_id, headers, end_stream=True)
+        self._writer.write(self._h2.data_to_send())
+        stream = self._streams[stream_id] = _Stream(url, asyncio.get_running_loop().create_future())
+        try:
+            return await stream.future
+        except asyncio.CancelledError:
+            # Abandoned (timed out, or a hedge that lost): the server can stop sending it.
+            if not self.closed:
+                with contextlib.suppress(h2.exceptions.StreamClosedError):
+                    self._h2.reset_stream(stream_id, h2.errors.ErrorCodes.CANCEL)
+                    self._writer.write(self._h2.data_to_send())
+            raise
+        finally:
+            del self._streams[stream_id]
+            self._released.set()
+
+    async def _read_frames(self) -> None:
+        error = ConnectionResetError("HTTP/2 connection closed by the server")
+        try:
+            while data := await self._reader.read(_READ_SIZE):
+                for event in self._h2.receive_data(data):
+                    self._dispatch(event)
+                self._writer.write(self._h2.data_to_send())
+        except (OSError, h2.exceptions.ProtocolError) as e:
+            error = ConnectionResetError(f"HTTP/2 connection failed: {e}")
+        finally:
+            self.closed = True
+            for stream in self._streams.values():
+                if not stream.future.done():
+                    stream.future.set_exception(error)
+            self._released.set()
+            self._writer.close()
+
+    def _dispatch(self, event: Any) -> None:
+        if isinstance(event, h2.events.DataReceived):
+            # Hand the window back even for abandoned streams: the connection shares it.
+            self._h2.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.closed = True  # GOAWAY: no new streams, the open ones may still end
+            return
+        stream = self._streams.get(getattr(event, "stream_id", None))
+        if stream is None or stream.future.done():
+            return
+        if isinstance(event, h2.events.ResponseReceived):
+            stream.headers = Headers(event.headers)
+            stream.status = int(stream.headers.pop(":status"))
+        elif isinstance(event, h2.events.DataReceived):
+            stream.body.append(event.data)
+        elif isinstance(event, h2.events.StreamEnded):
+            stream.future.set_result(Response(stream.url, stream.status, stream.headers, b"".join(stream.body)))
+        elif isinstance(event, h2.events.StreamReset):
+            stream.future.set_exception(ConnectionResetError(f"HTTP/2 stream reset by the server for {stream.url}"))
+
+    async def close(self) -> None:
+        self.closed = True
+        self._writer.close()
+        await asyncio.gather(self._reading, return_exceptions=True)
+
+
+class AsyncSession:
+    """`aiohttp.ClientSession` look-alike over HTTP/2; used on a single event loop, like the one it replaces."""
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float | None = DEFAULT_TIMEOUT,
+        headers: dict[str, str] | None = None,
+    ):
+        if h2 is None:
+            raise ImportError("HTTP/2 needs the h2 package: pip install h2")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.headers = [(name.lower(), value) for name, value in (headers or {}).items()]
+        self._connections: dict[tuple[str, str, int], list[_Connection]] = {}
+        self._connecting = asyncio.Lock()
+
+    async def _connection(self, scheme: str, host: str, port: int) -> _Connection:
+        origin = (scheme, host, port)
+        async with self._connecting:
+            connections = self._connections[origin] = [c for c in self._connections.get(origin, []) if not c.closed]
+            free = [c for c in connections if not c.full]
+            if not free and len(connections) < self.max_connections:
+                connection = await _Connection.open(scheme, host, port)
+                connections.append(connection)
+                return connection
+        # The least busy connection; when they are all full the request waits there for a stream.
+        return min(free or connections, key=lambda c: c.streams)
+
+    async def request(self, url: str, headers: dict[str, str] | None = None, timeout: float | None = None) -> Response:
+        """GET `url` in full within `timeout` seconds (the session's by default)."""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        request_headers = [(":method", "GET"), (":scheme", scheme), (":authority", parts.netloc), (":path", path)]
+        request_headers += self.headers
+        request_headers += [(name.lower(), value) for name, value in (headers or {}).items()]
+
+        async def send() -> Response:
+            connection = await self._connection(scheme, parts.hostname or "", parts.port or (443 if scheme == "https" else 80))
+            return await connection.request(url, request_headers)
+
+        return await asyncio.wait_for(send(), self.timeout if timeout is None else timeout)
+
+    @contextlib.asynccontextmanager
+    async def get(self, url: str, headers: dict[str, str] | None = None) -> AsyncIterator[Response]:
+        """GET `url`, as `async with session.get(url) as response`."""
+        yield await self.request(url, headers)
+
+    async def close(self) -> None:
+        connections = [connection for group in self._connections.values() for connection in group]
+        self._connections.clear()
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+    async def __aenter__(self) -> "AsyncSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class Session:
+    """`requests.Session` look-alike over HTTP/2; threads may share it.
+
+    The requests of every thread are sent by an `AsyncSession` on an event loop
+    of the session's own thread, so they share its connections.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float | None = DEFAULT_TIMEOUT,
+        headers: dict[str, str] | None = None,
+    ):
+        self._session = AsyncSession(max_connections=max_connections, timeout=timeout, headers=headers)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="http2-session", daemon=True)
+        self._thread.start()
+
+    def _run(self, coroutine: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get(self, url: str, headers: dict[str, str] | None = None, timeout: float | None = None) -> Response:
+        """GET `url`; the response has `status_code`, `headers`, `content` and `raise_for_status()`."""
+        return self._run(self._session.request(url, headers, timeout))
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,207 @@
+"""Hybrid backend: one asyncio event loop per worker process.
+
+Records are handed out to `max_workers` processes through a shared task queue.
+Every process runs its own `aiohttp` (or HTTP/2) session with `concurrency`
+downloads in flight and decodes the PNGs on a local thread pool, off the event
+loop, so both network concurrency and decoding scale with the number of cores.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+from . import asyncio_, core, metrics, sessions, stream
+from .core import Decoder, Downloader, Record, Row
+from .retry import RetryPolicy
+
+DEFAULT_CONCURRENCY = 20
+DEFAULT_DECODE_THREADS = 2
+_POLL_SECONDS = 1.0
+
+
+async def _serve(
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    downloader: Downloader | None,
+    concurrency: int,
+    decode_threads: int,
+    decoder: Decoder,
+    retry: RetryPolicy | None,
+    http2: bool,
+) -> None:
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    running: set[asyncio.Task] = set()
+    with ThreadPoolExecutor(decode_threads) as decode_executor:
+        async with sessions.client_session(limit=concurrency, http2=http2) as session:
+
+            async def one(index: int, record: Record) -> None:
+                try:
+                    row = await asyncio_._load_single_row_tuple(
+                        session, record, downloader, decode_executor, decoder=decoder, retry=retry
+                    )
+                    results.put((index, row))
+                finally:
+                    semaphore.release()
+
+            while True:
+                await semaphore.acquire()
+                item = await loop.run_in_executor(None, tasks.get)
+                if item is None:
+                    break
+                task = asyncio.create_task(one(*item))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            await asyncio.gather(*running)
+
+
+def _worker(
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    downloader: Downloader | None,
+    concurrency: int,
+    decode_threads: int,
+    decoder: Decoder,
+    retry: RetryPolicy | None,
+    http2: bool,
+) -> None:
+    asyncio.run(_serve(tasks, results, downloader, concurrency, decode_threads, decoder, retry, http2))
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader | None = None,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    decode_threads: int = DEFAULT_DECODE_THREADS,
+    decoder: Decoder = core.decode,
+    retry: RetryPolicy | None = None,
+    http2: bool = False,
+) -> Iterator[Row]:
+    """
+    Load records on worker processes that each run an asyncio event loop.
+
+    Args:
+        records: `(pokemon_name, sprite_url)` pairs to load.
+        downloader: Optional blocking download function (picklable), run on a thread
+            in the workers. By default every worker uses its own `aiohttp` session.
+        ordered: Yield rows in record order instead of completion order.
+        ordering: What ordered loading does with a straggler, see `stream.Ordering`.
+            A rescheduled record goes back to the shared task queue.
+        max_workers: The number of processes, `cpu_count()` by default.
+        prefetch: Maximum number of rows handed out to the workers and not yet
+            consumed, twice `max_workers * concurrency` by default.
+        concurrency: Concurrent downloads in every worker.
+        decode_threads: Decoding threads in every worker.
+        decoder: Turns the downloaded bytes into a `Row` in the workers (picklable).
+        retry: Optional `RetryPolicy`; every worker gets a copy with its own budget.
+        http2: Every worker fetches over its own HTTP/2 session (see `http2.py`).
+
+    Yields:
+        A `Row` object for each Pokémon.
+    """
+    max_workers = max_workers or multiprocessing.cpu_count()
+    window = prefetch or 2 * max_workers * concurrency
+    tasks: multiprocessing.Queue = multiprocessing.Queue()
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    core.preload(downloader, decoder, client="h2" if http2 else "aiohttp")
+    workers = [
+        multiprocessing.Process(
+            target=_worker, args=(tasks, results, downloader, concurrency, decode_threads, decoder, retry, http2), daemon=True
+        )
+        for _ in range(max_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    indexed = enumerate(records)
+    # Ordered: the records handed out and not yet yielded, and when, for the straggler policy.
+    handed_out: dict[int, tuple[Record, float]] = {}
+
+    def feed(n: int) -> int:
+        sent = 0
+        for index, record in itertools.islice(indexed, n):
+            tasks.put((index, record))
+            if ordered:
+                handed_out[index] = record, time.monotonic()
+            sent += 1
+        return sent
+
+    exhausted = False
+    # Results still to come that will be thrown away: skipped stragglers, slower copies.
+    late = 0
+    try:
+        # Rows handed out to the workers and not yet yielded; this is what bounds memory.
+        outstanding = feed(window)
+        reorder: dict[int, Row] = {}
+        rescheduled: set[int] = set()
+        # The row holding up the window and when it becomes a straggler (see `stream.straggler_grace`).
+        straggler: tuple[int, float] | None = None
+        next_index = 0
+        while outstanding:
+            timeout = _POLL_SECONDS
+            if straggler is not None:
+                timeout = max(0.0, min(timeout, straggler[1] - time.monotonic()))
+            try:
+                index, row = results.get(timeout=timeout)
+            except queue.Empty:
+                if any(worker.exitcode not in (None, 0) for worker in workers):
+                    raise RuntimeError("A hybrid loader worker process died") from None
+                if straggler is None:
+                    continue
+            else:
+                if not ordered:
+                    outstanding += feed(1) - 1
+                    yield row
+                    continue
+                if index < next_index or index in reorder:
+                    late -= 1
+                    continue
+                reorder[index] = row
+            while True:
+                while next_index in reorder:
+                    del handed_out[next_index]
+                    rescheduled.discard(next_index)
+                    outstanding += feed(1) - 1
+                    yield reorder.pop(next_index)
+                    next_index += 1
+                # A straggler: every later row of the full window is back, but not this one.
+                if (
+                    ordering == "wait"
+                    or not outstanding == window > 1
+                    or len(reorder) < outstanding - 1
+                    or next_index in rescheduled
+                ):
+                    straggler = None
+                    break
+                record, since = handed_out[next_index]
+                if straggler is None or straggler[0] != next_index:
+                    straggler = next_index, time.monotonic() + stream.straggler_grace(since)
+                if time.monotonic() < straggler[1]:
+                    break
+                straggler = None
+                late += 1
+                if ordering == "skip":
+                    metrics.count("stragglers_skipped")
+                    reorder[next_index] = core.straggler_row(record)
+                    continue
+                metrics.count("stragglers_rescheduled")
+                rescheduled.add(next_index)
+                tasks.put((next_index, record))
+                break
+        exhausted = True
+    finally:
+        for _ in workers:
+            tasks.put(None)
+        for worker in workers:
+            if not exhausted or late:
+                # Late results may still be on their way; nobody is left to read them.
+                worker.terminate()
+            worker.join()
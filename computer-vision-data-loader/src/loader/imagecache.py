@@ -0,0 +1,226 @@
+"""In-memory LRU cache of decoded sprites, for datasets iterated over many epochs.
+
+The cache lives in the consuming process and sits in front of every backend:
+records whose image is cached never reach the backend, so they are neither
+downloaded nor decoded, and only misses go to the threads, processes or event
+loops. Worker processes never need a copy of the cache, and a warm epoch runs at
+memory speed whatever the backend.
+
+Cached images are read-only and handed out without copying, so every consumer
+shares the same arrays. Images that do not own their memory (e.g. views of a
+shared-memory slot) are copied once when they are stored.
+
+`load_through` also coalesces records whose URL is already on its way through
+the backend, with or without a cache, so catalogs listing the same sprite
+several times (overlapping CSVs, alternate forms) load it once.
+"""
+import collections
+import itertools
+import threading
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import metrics
+from .core import ERROR_SUFFIX, Record, Row, TaggedName
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Rows `load_through` holds ready for the consumer when no `prefetch` is given.
+DEFAULT_READ_AHEAD = 64
+
+
+class ImageCache:
+    """Decoded images keyed by sprite URL, evicting the least recently used past `max_bytes`."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._images: collections.OrderedDict[str, NDArray[np.uint8]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._images
+
+    def get(self, url: str) -> NDArray[np.uint8] | None:
+        with self._lock:
+            image = self._images.get(url)
+            if image is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(url)
+            self.hits += 1
+            return image
+
+    def put(self, url: str, image: NDArray[np.uint8]) -> NDArray[np.uint8]:
+        """Store `image` (read-only from now on) and return the cached array."""
+        if image.base is not None or not image.flags.c_contiguous:
+            image = np.array(image)
+        image.flags.writeable = False
+        if image.nbytes > self.max_bytes:
+            return image
+        with self._lock:
+            old = self._images.pop(url, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._images[url] = image
+            self.nbytes += image.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return image
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict[str, float]:
+        """Entries, bytes held, hits, misses, evictions and the hit rate so far."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._images),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def load_through(
+    cache: ImageCache | None,
+    run: Callable[..., Iterator[Row]],
+    records: Iterable[Record],
+    *,
+    ordered: bool = True,
+    **options,
+) -> Iterator[Row]:
+    """
+    Serve `records` from `cache`, loading only the misses with the backend `run`.
+
+    A URL that is already being loaded is not handed to the backend again: its
+    later records wait for the same row (single-flight), so it is downloaded and
+    decoded once whatever the backend. They share the cached image, or get a copy
+    of it when `cache` is `None` and only duplicates in flight are coalesced.
+
+    Cached rows are handed out as soon as they are read while no miss is loading;
+    the backend is only started at a miss. Backends read records ahead, so once
+    `prefetch` rows are held ready for the consumer the backend gets no further
+    records: it finishes its misses and the next miss starts it again.
+
+    Rows keep the record order when `ordered`, otherwise cached rows go out
+    before the next backend row. Placeholder rows of failed loads are not cached,
+    and the records waiting on them get placeholders too.
+    """
+    records = iter(records)
+    limit = options.get("prefetch") or DEFAULT_READ_AHEAD
+    # Records waiting for a URL the backend is loading, with their cells when ordered.
+    followers: dict[str, list[tuple[str, list[Row | None] | None]]] = {}
+    # Ordered: one cell per record, filled when its row is known, drained from the front.
+    cells: collections.deque[list[Row | None]] = collections.deque()
+    waiting: collections.deque[tuple[Record, list[Row | None]]] = collections.deque()
+    # Unordered: cached rows ready to go, and the misses by the key their names are tagged with.
+    ready: collections.deque[Row] = collections.deque()
+    in_flight: dict[int, Record] = {}
+    keys = itertools.count()
+    # Rows ready for the consumer and not handed out yet.
+    held = 0
+
+    def lookup(record: Record) -> Record | None:
+        """Register `record`; return what the backend has to load for it, if anything."""
+        nonlocal held
+        name, url = record
+        image = None if cache is None else cache.get(url)
+        cell = None
+        if ordered:
+            cell = [None if image is None else Row(image=image, name=name)]
+            cells.append(cell)
+        elif image is not None:
+            ready.append(Row(image=image, name=name))
+        if image is not None:
+            held += 1
+            return None
+        if url in followers:
+            followers[url].append((name, cell))
+            metrics.count("coalesced")
+            return None
+        followers[url] = []
+        if ordered:
+            waiting.append((record, cell))
+            return record
+        key = next(keys)
+        in_flight[key] = record
+        return TaggedName(name, key), url
+
+    def misses(first: Record) -> Iterator[Record]:
+        """The records of one backend run: from the miss `first` until enough rows are held."""
+        yield first
+        for record in records:
+            miss = lookup(record)
+            if miss is not None:
+                yield miss
+            elif held >= limit:
+                return
+
+    def loaded(url: str, name: str, row: Row) -> tuple[Row, list[tuple[Row, list[Row | None] | None]]]:
+        """Cache the row of `url`; return the row to hand out and those of the records waiting on it."""
+        failed = row.name != name
+        shared = cache is not None and not failed
+        if shared:
+            image = cache.put(url, row.image)
+            # The cache holds a copy: a shared-memory slot (`shm.SharedRow`) can be reused.
+            if hasattr(row, "release"):
+                row.release()
+            row = Row(image=image, name=row.name)
+        return row, [
+            (Row(image=row.image if shared else row.image.copy(), name=f"{follower}{ERROR_SUFFIX}" if failed else follower), cell)
+            for follower, cell in followers.pop(url)
+        ]
+
+    def drain() -> Iterator[Row]:
+        nonlocal held
+        if ordered:
+            while cells and cells[0][0] is not None:
+                held -= 1
+                yield cells.popleft()[0]
+        else:
+            while ready:
+                held -= 1
+                yield ready.popleft()
+
+    for record in records:
+        miss = lookup(record)
+        yield from drain()
+        if miss is None:
+            continue
+        for row in run(misses(miss), ordered=ordered, **options):
+            if ordered:
+                (name, url), cell = waiting.popleft()
+                cell[0], waited = loaded(url, name, row)
+                for follower, follower_cell in waited:
+                    follower_cell[0] = follower
+                held += 1 + len(waited)
+            else:
+                yield from drain()
+                key = getattr(row.name, "key", None)
+                if key not in in_flight:
+                    # A decoder that builds its own names: match the oldest record of that name.
+                    key = next((k for k, (name, _) in in_flight.items() if row.name in (name, f"{name}{ERROR_SUFFIX}")), None)
+                waited: list[tuple[Row, list[Row | None] | None]] = []
+                if key is not None:
+                    name, url = in_flight.pop(key)
+                    row, waited = loaded(url, name, row)
+                row.name = str(row.name)
+                yield row
+                yield from (follower for follower, _ in waited)
+            yield from drain()
+    yield from drain()
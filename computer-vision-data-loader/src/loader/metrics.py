@@ -0,0 +1,280 @@
+"""Per-stage timings and counters for the loaders and the downloaders.
+
+Instrumentation is off by default: `span()` then hands back a shared no-op
+context manager and `count()` returns immediately, so the hooks left in the hot
+paths cost a function call. `enable()` installs a `Recorder` that keeps
+
+* one event per span (stage, item, start, duration, process and thread), for a
+  Chrome trace / Perfetto timeline (`write_trace`),
+* a histogram of durations per stage with Prometheus' default buckets,
+* counters (bytes, cache hits, retries, ...) and the number of spans of every
+  stage in flight, with its peak,
+
+exported as a text summary (`summary`), the Prometheus text format
+(`prometheus`, or an HTTP endpoint with `serve`) and JSON (`write_trace`).
+
+Stages used by the code base: `queue` (waiting for a worker), `dns`, `connect`
+(aiohttp only), `transfer` (an HTTP request that reached the network, from
+connecting to the last byte with `requests`), `decode`, `transform` and `write`.
+Spans are recorded in the process that runs them; workers of the process based
+backends run with their own recorder, which is not collected.
+"""
+import bisect
+import collections
+import contextlib
+import json
+import os
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, ContextManager, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# Prometheus' default histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DEFAULT_MAX_EVENTS = 1_000_000
+
+_NOOP = contextlib.nullcontext()
+
+
+class Recorder:
+    """Collects spans and counters from every thread of the process."""
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS):
+        self.max_events = max_events
+        self.events: list[tuple[str, Any, float, float, int, int]] = []
+        self.dropped = 0
+        self.counters: collections.Counter[str] = collections.Counter()
+        self.in_flight: collections.Counter[str] = collections.Counter()
+        self.peak_in_flight: collections.Counter[str] = collections.Counter()
+        self._buckets: dict[str, list[int]] = {}
+        self._sums: collections.Counter[str] = collections.Counter()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, stage: str, item: Any = None) -> Iterator[None]:
+        with self._lock:
+            self.in_flight[stage] += 1
+            self.peak_in_flight[stage] = max(self.peak_in_flight[stage], self.in_flight[stage])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, item, start)
+            with self._lock:
+                self.in_flight[stage] -= 1
+
+    def observe(self, stage: str, seconds: float, item: Any = None, start: float | None = None) -> None:
+        """Record a duration measured by the caller, e.g. a wait that is not a block of code."""
+        if start is None:
+            start = time.perf_counter() - seconds
+        with self._lock:
+            buckets = self._buckets.get(stage)
+            if buckets is None:
+                buckets = self._buckets[stage] = [0] * (len(BUCKETS) + 1)
+            buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self._sums[stage] += seconds
+            if len(self.events) < self.max_events:
+                self.events.append((stage, item, start, seconds, os.getpid(), threading.get_ident()))
+            else:
+                self.dropped += 1
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def histograms(self) -> dict[str, dict[str, Any]]:
+        """Per stage: `count`, `sum` and cumulative `buckets` as `{upper bound: count}`."""
+        with self._lock:
+            result = {}
+            for stage, buckets in self._buckets.items():
+                cumulative, total = {}, 0
+                for bound, n in zip((*BUCKETS, float("inf")), buckets):
+                    total += n
+                    cumulative[bound] = total
+                result[stage] = {"count": total, "sum": self._sums[stage], "buckets": cumulative}
+            return result
+
+    def durations(self, stage: str) -> list[float]:
+        return [seconds for s, _, _, seconds, _, _ in self.events if s == stage]
+
+    def summary(self) -> str:
+        """One line per stage with its count, total, mean, p50, p95 and peak concurrency."""
+        lines = [f"{'stage':<10} {'count':>7} {'total s':>9} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'peak':>5}"]
+        for stage, histogram in self.histograms().items():
+            durations = sorted(self.durations(stage)) or [0.0]
+            p50 = durations[len(durations) // 2]
+            p95 = durations[min(len(durations) - 1, int(0.95 * len(durations)))]
+            lines.append(
+                f"{stage:<10} {histogram['count']:>7} {histogram['sum']:>9.3f} "
+                f"{1000 * histogram['sum'] / histogram['count']:>9.2f} {1000 * p50:>8.2f} {1000 * p95:>8.2f} "
+                f"{self.peak_in_flight[stage]:>5}"
+            )
+        lines.extend(f"{name}: {value:g}" for name, value in sorted(self.counters.items()))
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """The spans in the Chrome trace event format, for `chrome://tracing` or Perfetto."""
+        events = [
+            {
+                "name": stage if item is None else f"{stage} {item}",
+                "cat": stage,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": seconds * 1e6,
+                "pid": pid,
+                "tid": tid,
+            }
+            for stage, item, start, seconds, pid, tid in list(self.events)
+        ]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": dict(self.counters), "dropped_events": self.dropped},
+        }
+
+    def write_trace(self, path: str | os.PathLike) -> None:
+        pathlib.Path(path).write_text(json.dumps(self.chrome_trace()))
+
+    def prometheus(self, prefix: str = "pokemon") -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per item in each stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage, histogram in self.histograms().items():
+            for bound, n in histogram["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {n}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+        lines.append(f"# TYPE {prefix}_in_flight gauge")
+        with self._lock:
+            lines.extend(f'{prefix}_in_flight{{stage="{stage}"}} {n}' for stage, n in self.in_flight.items())
+            counters = sorted(self.counters.items())
+        for name, value in counters:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Expose `prometheus()` at `http://host:port/metrics` from a daemon thread."""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+_recorder: Recorder | None = None
+
+
+def enable(recorder: Recorder | None = None) -> Recorder:
+    """Start recording in this process and return the recorder."""
+    global _recorder
+    _recorder = recorder or Recorder()
+    return _recorder
+
+
+def disable() -> Recorder | None:
+    """Stop recording and return the recorder that was active, if any."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def recorder() -> Recorder | None:
+    return _recorder
+
+
+def span(stage: str, item: Any = None) -> ContextManager[None]:
+    """Time the body as one item of `stage`; a shared no-op when recording is off."""
+    if _recorder is None:
+        return _NOOP
+    return _recorder.span(stage, item)
+
+
+def count(name: str, value: float = 1) -> None:
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+def queued(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap `fn` right before it is queued, so the time until it runs is recorded as `queue`."""
+    if _recorder is None:
+        return fn
+    recorder, submitted = _recorder, time.perf_counter()
+
+    def run(*args, **kwargs) -> T:
+        recorder.observe("queue", time.perf_counter() - submitted, start=submitted)
+        return fn(*args, **kwargs)
+    return run
+
+
+def trace_configs() -> list:
+    """`aiohttp` trace configs recording `dns` and `connect` spans, empty when recording is off."""
+    if _recorder is None:
+        return []
+    import aiohttp
+
+    recorder = _recorder
+    config = aiohttp.TraceConfig()
+
+    def timed(stage: str, key: str):
+        async def on_start(session, context, params) -> None:
+            setattr(context, key, time.perf_counter())
+
+        async def on_end(session, context, params) -> None:
+            start = getattr(context, key)
+            recorder.observe(stage, time.perf_counter() - start, start=start)
+        return on_start, on_end
+
+    on_start, on_end = timed("dns", "dns_start")
+    config.on_dns_resolvehost_start.append(on_start)
+    config.on_dns_resolvehost_end.append(on_end)
+    on_start, on_end = timed("connect", "connect_start")
+    config.on_connection_create_start.append(on_start)
+    config.on_connection_create_end.append(on_end)
+    return [config]
+
+
+@contextlib.contextmanager
+def recording(trace: str | os.PathLike | None = None, port: int | None = None) -> Iterator[Recorder | None]:
+    """Record the body when a trace file or metrics port is given, then report.
+
+    Meant for command line flags: prints the summary at the end, writes the trace
+    to `trace` and serves Prometheus metrics on `port` while the body runs.
+    """
+    if trace is None and port is None:
+        yield None
+        return
+    recorder = enable()
+    server = recorder.serve(port) if port is not None else None
+    try:
+        yield recorder
+    finally:
+        disable()
+        if server is not None:
+            server.shutdown()
+        if trace is not None:
+            recorder.write_trace(trace)
+        print(recorder.summary(), flush=True)
@@ -0,0 +1,85 @@
+"""Process backend: spread download and decode over a pool of worker processes."""
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from . import core, shm, stream
+from .core import Decoder, Downloader, Record, Row
+
+# Set once per worker process, so state the downloader carries (e.g. a `RetryPolicy`'s
+# latencies and budget) lasts across records instead of being pickled with each one.
+_worker_downloader: Downloader = core.download
+_worker_decoder: Decoder = core.decode
+
+
+def _init_worker(downloader: Downloader, decoder: Decoder) -> None:
+    global _worker_downloader, _worker_decoder
+    _worker_downloader, _worker_decoder = downloader, decoder
+
+
+def _load_row(record: Record) -> Row:
+    return core.load_row(record, _worker_downloader, _worker_decoder)
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader = core.download,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    transport: str = "pickle",
+    num_slots: int | None = None,
+    slot_bytes: int = shm.DEFAULT_SLOT_BYTES,
+    decoder: Decoder = core.decode,
+) -> Iterator[Row]:
+    """
+    Load records on a pool of worker processes.
+
+    `downloader` is sent to every worker once, when it starts, so it must be
+    picklable (a module level function); a `RetryPolicy` it carries keeps its
+    latencies and retry budget across the records of that worker. With the default `"pickle"` transport rows are pickled back to the
+    parent process; with `"shm"` images come back through a shared-memory ring as
+    zero-copy `shm.SharedRow` views that the consumer hands back with `release()`.
+
+    Args:
+        records: `(pokemon_name, sprite_url)` pairs to load.
+        downloader: The function to use for downloading image content.
+        ordered: Yield rows in record order instead of completion order.
+        ordering: What ordered loading does with a straggler, see `stream.Ordering`.
+        max_workers: The number of processes, `cpu_count()` by default.
+        prefetch: Maximum number of rows loaded ahead of the consumer,
+            twice the number of processes by default.
+        transport: `"pickle"` or `"shm"`.
+        num_slots: Shared-memory slots for `"shm"`, twice `prefetch` by default.
+        slot_bytes: Capacity of a shared-memory slot; bigger images are pickled.
+        decoder: Turns the downloaded bytes into a `Row` in the workers (picklable).
+
+    Yields:
+        A `Row` object for each Pokémon.
+    """
+    max_workers = max_workers or multiprocessing.cpu_count()
+    window = prefetch or 2 * max_workers
+    core.preload(downloader, decoder)
+    if transport == "shm":
+        yield from shm.load(
+            records,
+            downloader=downloader,
+            ordered=ordered,
+            ordering=ordering,
+            max_workers=max_workers,
+            window=window,
+            num_slots=num_slots,
+            slot_bytes=slot_bytes,
+            decoder=decoder,
+        )
+        return
+    if transport != "pickle":
+        raise ValueError(f"Unknown transport {transport!r}, expected 'pickle' or 'shm'")
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(downloader, decoder)) as executor:
+        submit = functools.partial(executor.submit, _load_row)
+        yield from stream.bounded_map(
+            submit, records, window=window, ordered=ordered, ordering=ordering, skipped=core.straggler_row
+        )
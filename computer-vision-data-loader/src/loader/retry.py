@@ -0,0 +1,306 @@
+"""Retry, deadline and hedging policy for sprite fetches.
+
+A `RetryPolicy` runs a fetch up to `attempts` times:
+
+* every attempt is bounded by `attempt_timeout` and the whole call by `deadline`;
+* failed attempts are retried after an exponential backoff with full jitter, but
+  only for errors worth retrying (connection errors, timeouts, 408/425/429/5xx),
+  never for a 404;
+* retries draw from a budget shared by every call of the policy (`budget_ratio`
+  retries per call, plus a small reserve), so a failing host does not turn into
+  a retry storm;
+* with `hedge`, an attempt that runs past the `hedge_quantile` latency of recent
+  successful attempts gets a duplicate request; the first answer wins.
+
+When a call gives up it raises a `FetchError` listing every attempt, so a
+failure can be logged or inspected as data (`to_dict`) instead of a bare message.
+"""
+import asyncio
+import collections
+import dataclasses
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Exceptions that are not `OSError`s but still mean the connection failed.
+_CONNECTION_ERRORS = {"ClientConnectionError", "ClientPayloadError", "ServerDisconnectedError"}
+_HEDGE_MIN_SAMPLES = 20
+_HEDGE_THREADS = 32
+
+
+def status_of(error: BaseException) -> int | None:
+    """HTTP status carried by an `aiohttp` or `requests` error, if any."""
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether another attempt may succeed: transient statuses, timeouts and connection errors."""
+    status = status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    if isinstance(error, (OSError, TimeoutError)):
+        return True
+    return any(cls.__name__ in _CONNECTION_ERRORS for cls in type(error).__mro__)
+
+
+@dataclasses.dataclass
+class Attempt:
+    """One failed attempt of a call."""
+    number: int
+    error: str
+    kind: str
+    status: int | None
+    seconds: float
+
+
+class FetchError(Exception):
+    """Raised when a call gives up; `attempts` has one entry per failed attempt."""
+
+    def __init__(self, url: str, attempts: list[Attempt], seconds: float):
+        self.url = url
+        self.attempts = attempts
+        self.seconds = seconds
+        last = attempts[-1]
+        super().__init__(f"{url}: {len(attempts)} attempt(s) in {seconds:.2f}s, last: {last.kind}: {last.error}")
+
+    def __reduce__(self):
+        return type(self), (self.url, self.attempts, self.seconds)
+
+    @property
+    def status(self) -> int | None:
+        return self.attempts[-1].status
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "url": self.url,
+            "seconds": self.seconds,
+            "attempts": [dataclasses.asdict(attempt) for attempt in self.attempts],
+        }
+
+
+class RetryBudget:
+    """Token bucket: every call deposits `ratio` tokens, every retry or hedge takes one."""
+
+    def __init__(self, ratio: float = 0.5, reserve: float = 50.0):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.reserve)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """Retries, deadlines and hedged requests around a fetch, for threads and asyncio."""
+
+    def __init__(
+        self,
+        attempts: int = 4,
+        attempt_timeout: float = 10.0,
+        deadline: float = 30.0,
+        backoff: float = 0.1,
+        max_backoff: float = 2.0,
+        budget_ratio: float = 0.5,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        self.attempts = attempts
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.retryable = retryable
+        self.budget = RetryBudget(budget_ratio)
+        self._latencies: collections.deque[float] = collections.deque(maxlen=200)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Sent to worker processes: they start with an empty history and no threads.
+        state = self.__dict__.copy()
+        del state["_executor"], state["_lock"], state["budget"]
+        state["_latencies"] = collections.deque(maxlen=200)
+        state["_budget_ratio"] = self.budget.ratio
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.budget = RetryBudget(state.pop("_budget_ratio"))
+        self.__dict__.update(state)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which an attempt is hedged, once enough latencies were seen."""
+        if not self.hedge or len(self._latencies) < _HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(self.hedge_quantile * len(latencies)))]
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def _give_up(self, error: BaseException, attempt: int, elapsed: float, delay: float) -> bool:
+        return (
+            attempt >= self.attempts
+            or not self.retryable(error)
+            or elapsed + delay >= self.deadline
+            or not self.budget.withdraw()
+        )
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(_HEDGE_THREADS, thread_name_prefix="hedge")
+            return self._executor
+
+    def _attempt(self, fn: Callable[..., T], url: str, timeout: float, timed: bool) -> T:
+        hedge_after = self.hedge_delay()
+        if hedge_after is None and (timed or timeout >= self.attempt_timeout):
+            # Bounded by `fn` itself.
+            return fn(url, timeout=timeout) if timed else fn(url)
+        executor = self._hedge_executor()
+        started = time.perf_counter()
+
+        def run() -> T:
+            return fn(url, timeout=timeout - (time.perf_counter() - started)) if timed else fn(url)
+
+        pending = {executor.submit(run)}
+        done, pending = wait(pending, timeout=timeout if hedge_after is None else min(hedge_after, timeout))
+        if not done and hedge_after is not None and self.budget.withdraw():
+            metrics.count("hedges")
+            pending.add(executor.submit(run))
+        error: BaseException | None = None
+        while pending or done:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                break
+            remaining = timeout - (time.perf_counter() - started)
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"no response within {timeout:.2f}s")
+        raise error
+
+    def call(self, fn: Callable[..., T], url: str, timed: bool = False) -> T:
+        """Run the blocking `fn(url)` under the policy.
+
+        With `timed`, `fn(url, timeout=...)` is given the seconds left for the attempt,
+        `deadline` included, and must bound its requests by them (`core.download`
+        does). Otherwise `fn` should bound its own requests by `attempt_timeout`, and
+        an attempt that the `deadline` cuts shorter runs on a thread pool and is
+        abandoned once it has passed, as are hedged attempts.
+        """
+        self.budget.deposit()
+        start = time.perf_counter()
+        failures: list[Attempt] = []
+        for attempt in range(1, self.attempts + 1):
+            t0 = time.perf_counter()
+            timeout = min(self.attempt_timeout, self.deadline - (t0 - start))
+            try:
+                result = self._attempt(fn, url, timeout, timed)
+            except Exception as e:
+                error = e
+                failures.append(_failure(attempt, e, time.perf_counter() - t0))
+                delay = self._delay(attempt)
+                if self._give_up(e, attempt, time.perf_counter() - start, delay):
+                    break
+                metrics.count("retries")
+                time.sleep(delay)
+                continue
+            self._latencies.append(time.perf_counter() - t0)
+            return result
+        metrics.count("failures")
+        raise FetchError(url, failures, time.perf_counter() - start) from error
+
+    async def _attempt_async(self, fn: Callable[[], Awaitable[T]], timeout: float) -> T:
+        hedge_after = self.hedge_delay()
+        started = time.perf_counter()
+        pending = {asyncio.ensure_future(fn())}
+        try:
+            if hedge_after is not None:
+                done, pending = await asyncio.wait(pending, timeout=min(hedge_after, timeout))
+                if not done and self.budget.withdraw():
+                    metrics.count("hedges")
+                    pending.add(asyncio.ensure_future(fn()))
+                pending |= done
+            error: BaseException | None = None
+            while pending:
+                remaining = timeout - (time.perf_counter() - started)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise TimeoutError(f"no response within {timeout:.2f}s")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], url: str) -> T:
+        """Await `fn()` under the policy; attempts past `attempt_timeout` are cancelled."""
+        self.budget.deposit()
+        start = time.perf_counter()
+        failures: list[Attempt] = []
+        for attempt in range(1, self.attempts + 1):
+            t0 = time.perf_counter()
+            timeout = min(self.attempt_timeout, self.deadline - (t0 - start))
+            try:
+                result = await self._attempt_async(fn, timeout)
+            except Exception as e:
+                error = e
+                failures.append(_failure(attempt, e, time.perf_counter() - t0))
+                delay = self._delay(attempt)
+                if self._give_up(e, attempt, time.perf_counter() - start, delay):
+                    break
+                metrics.count("retries")
+                await asyncio.sleep(delay)
+                continue
+            self._latencies.append(time.perf_counter() - t0)
+            return result
+        metrics.count("failures")
+        raise FetchError(url, failures, time.perf_counter() - start) from error
+
+    def wrap(self, fn: Callable[[str], T]) -> Callable[[str], T]:
+        """`fn` with every call run under the policy; picklable if `fn` is."""
+        return _Retrying(self, fn)
+
+
+class _Retrying:
+    def __init__(self, policy: RetryPolicy, fn: Callable[[str], Any]):
+        self.policy = policy
+        self.fn = fn
+
+    def __call__(self, url: str) -> Any:
+        return self.policy.call(self.fn, url)
+
+
+def _failure(attempt: int, error: BaseException, seconds: float) -> Attempt:
+    return Attempt(attempt, str(error) or repr(error), type(error).__name__, status_of(error), seconds)
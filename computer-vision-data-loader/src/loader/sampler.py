@@ -0,0 +1,110 @@
+"""Epoch-aware shuffling and sharding of the records, applied before any download.
+
+Every trainer process builds the same `Sampler` with its own `rank`, so the
+processes split the catalog between them with no coordinator and no record is
+downloaded twice. The order only depends on `seed` and the epoch (see
+`set_epoch`), so all ranks agree on it and a run can be replayed.
+
+Records are dealt out in groups of `world_size`: rank `r` gets the `r`-th record
+of every group. A last, incomplete group is dropped with `drop_last`, otherwise
+it is padded by repeating its records, so every rank sees the same number of
+records either way. Grouping works on a stream, so sources of unknown length
+can be sharded too; with `buffer_size` they are shuffled through a bounded
+buffer instead of being read entirely into memory.
+
+Records are always shuffled before they are dealt out, with the same seed on
+every rank, so which records a rank gets changes from one epoch to the next,
+not just their order.
+"""
+import itertools
+import os
+import random
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class Sampler:
+    """Deterministic per-epoch shuffle and rank/world-size sharding of records."""
+
+    def __init__(
+        self,
+        *,
+        shuffle: bool = True,
+        seed: int = 0,
+        rank: int = 0,
+        world_size: int = 1,
+        drop_last: bool = False,
+        buffer_size: int | None = None,
+    ):
+        """
+        Args:
+            shuffle: Shuffle the records differently at every epoch.
+            seed: Seed shared by every rank.
+            rank: Index of this process among `world_size`.
+            world_size: Number of processes splitting the records.
+            drop_last: Drop the records that cannot be dealt evenly instead of padding.
+            buffer_size: Shuffle the stream through a buffer of this many records
+                per rank (`buffer_size * world_size` in all, since every rank
+                shuffles the whole stream the same way) instead of reading all
+                records first. Records then move at most a few buffer lengths from
+                their position in the source.
+        """
+        if not 0 <= rank < world_size:
+            raise ValueError(f"rank must be in [0, {world_size}), got {rank}")
+        self.shuffle = shuffle
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.drop_last = drop_last
+        self.buffer_size = buffer_size
+        self.epoch = 0
+
+    @classmethod
+    def from_env(cls, **options) -> "Sampler":
+        """Sampler for this process, with `rank` and `world_size` from `RANK` and `WORLD_SIZE`."""
+        return cls(rank=int(os.environ.get("RANK", 0)), world_size=int(os.environ.get("WORLD_SIZE", 1)), **options)
+
+    def set_epoch(self, epoch: int) -> None:
+        """Use the order of `epoch` for the next `sample`."""
+        self.epoch = epoch
+
+    def _rng(self, *salt: int) -> random.Random:
+        return random.Random(":".join(map(str, (self.seed, self.epoch, *salt))))
+
+    def _shard(self, items: Iterable[T]) -> Iterator[T]:
+        items = iter(items)
+        while group := list(itertools.islice(items, self.world_size)):
+            if len(group) == self.world_size:
+                yield group[self.rank]
+            elif not self.drop_last:
+                yield group[self.rank % len(group)]
+
+    def _buffered_shuffle(self, items: Iterable[T], size: int) -> Iterator[T]:
+        rng = self._rng()
+        buffer: list[T] = []
+        for item in items:
+            if len(buffer) < size:
+                buffer.append(item)
+                continue
+            i = rng.randrange(len(buffer))
+            yield buffer[i]
+            buffer[i] = item
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def sample(self, records: Iterable[T]) -> Iterator[T]:
+        """This rank's records for the current epoch, in the order to load them."""
+        if not self.shuffle:
+            return self._shard(records)
+        if self.buffer_size:
+            return self._shard(self._buffered_shuffle(records, self.buffer_size * self.world_size))
+        records = list(records)
+        self._rng().shuffle(records)
+        return self._shard(records)
+
+    def num_samples(self, total: int) -> int:
+        """Number of records every rank gets out of `total`."""
+        if self.drop_last:
+            return total // self.world_size
+        return -(-total // self.world_size)
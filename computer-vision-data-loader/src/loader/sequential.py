@@ -0,0 +1,26 @@
+"""Sequential backend: download and decode one record at a time."""
+from typing import Iterable, Iterator
+
+from . import core, stream
+from .core import Decoder, Downloader, Record, Row
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader = core.download,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    decoder: Decoder = core.decode,
+) -> Iterator[Row]:
+    """
+    Load records one after the other in the calling thread.
+
+    Rows are always produced in record order and nothing is fetched ahead of the
+    consumer, so `ordered`, `ordering`, `max_workers` and `prefetch` are accepted
+    only to keep the backend signature uniform.
+    """
+    for record in records:
+        yield core.load_row(record, downloader, decoder)
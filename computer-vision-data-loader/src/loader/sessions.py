@@ -0,0 +1,94 @@
+"""Pooled HTTP clients, so every sprite reuses a kept-alive connection to the host.
+
+`requests` sessions are shared by all threads of a process and re-created after a
+fork, so each worker process of the process and hybrid backends gets its own pool.
+The HTTP/2 sessions of `http2.py` follow the same rules, but multiplex all the
+requests of a process over a couple of connections instead of one per thread.
+
+Each client library is imported by the first session that needs it, so a
+process only pays for the ones it uses.
+"""
+import os
+import threading
+from typing import TYPE_CHECKING
+
+from . import metrics
+
+if TYPE_CHECKING:
+    import aiohttp
+    import requests
+
+    from . import http2 as http2_
+
+# Kept-alive connections per host; at least the number of threads sharing the session.
+DEFAULT_POOL_SIZE = 32
+# Seconds an idle aiohttp connection is kept open for reuse.
+KEEPALIVE_TIMEOUT = 30
+# Seconds resolved host names are cached by aiohttp.
+DNS_CACHE_TTL = 300
+
+_lock = threading.Lock()
+_sessions: "dict[int, tuple[requests.Session, int]]" = {}
+_http2_sessions: "dict[int, http2_.Session]" = {}
+
+
+def get_session(pool_size: int = DEFAULT_POOL_SIZE) -> "requests.Session":
+    """
+    Return this process's shared `requests.Session`.
+
+    The session keeps up to `pool_size` connections open per host; asking for a
+    bigger pool than the current one remounts the adapters with the new size.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    pid = os.getpid()
+    with _lock:
+        session, size = _sessions.get(pid, (None, 0))
+        if session is None or size < pool_size:
+            session = session or requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[pid] = session, pool_size
+        return session
+
+
+def connector(limit: int = DEFAULT_POOL_SIZE, limit_per_host: int = 0) -> "aiohttp.TCPConnector":
+    """`TCPConnector` tuned for many requests to a single sprite host.
+
+    Must be called from a running event loop.
+    """
+    import aiohttp
+
+    return aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+
+
+def get_http2_session() -> "http2_.Session":
+    """Return this process's shared HTTP/2 session (needs `h2`)."""
+    from . import http2 as http2_
+
+    pid = os.getpid()
+    with _lock:
+        if pid not in _http2_sessions:
+            _http2_sessions[pid] = http2_.Session()
+        return _http2_sessions[pid]
+
+
+def client_session(limit: int = DEFAULT_POOL_SIZE, http2: bool = False) -> "aiohttp.ClientSession | http2_.AsyncSession":
+    """Session for an event loop: `aiohttp` over `connector(limit)`, or HTTP/2 with `http2`.
+
+    Must be called from a running event loop.
+    """
+    if http2:
+        from . import http2 as http2_
+
+        return http2_.AsyncSession()
+    import aiohttp
+
+    return aiohttp.ClientSession(connector=connector(limit=limit), trace_configs=metrics.trace_configs())
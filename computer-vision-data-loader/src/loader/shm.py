@@ -0,0 +1,167 @@
+"""Shared-memory transport for the process backend.
+
+Workers decode each sprite and copy it into a slot of a `SharedMemory` ring owned
+by the parent, returning only the slot index and the image shape. The parent
+wraps the slot in a read-only NumPy view, so no image is pickled on the way back.
+A slot is reused once the consumer calls `SharedRow.release()`. When every slot
+is held, rows fall back to the regular pickled transport instead of blocking.
+"""
+import collections
+import dataclasses
+import functools
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import core, stream
+from .core import Decoder, Downloader, Record, Row
+
+# Room for a 96x96 RGBA sprite, the size of every sprite in the gen1-gen6 catalog.
+DEFAULT_SLOT_BYTES = 96 * 96 * 4
+
+_worker_shm: SharedMemory | None = None
+_worker_downloader: Downloader = core.download
+_worker_decoder: Decoder = core.decode
+
+
+class SlotRing:
+    """`num_slots` fixed-size image slots in a single shared-memory block."""
+
+    def __init__(self, num_slots: int, slot_bytes: int = DEFAULT_SLOT_BYTES):
+        self.slot_bytes = slot_bytes
+        self.shm = SharedMemory(create=True, size=num_slots * slot_bytes)
+        self._free = collections.deque(range(num_slots))
+        self._live_views = 0
+        self._closed = False
+
+    def acquire(self) -> int | None:
+        """Take a free slot, or `None` if the consumer holds all of them."""
+        try:
+            return self._free.popleft()
+        except IndexError:
+            return None
+
+    def release(self, slot: int) -> None:
+        self._free.append(slot)
+
+    def view(self, slot: int, shape: tuple[int, ...]) -> NDArray[np.uint8]:
+        """Read-only array over the image stored in `slot`."""
+        image = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        image.flags.writeable = False
+        # Unmapping the block under a live view would crash the interpreter, so the
+        # mapping is only closed once the last view handed out is garbage collected.
+        self._live_views += 1
+        weakref.finalize(image, self._view_dropped)
+        return image
+
+    def _view_dropped(self) -> None:
+        self._live_views -= 1
+        if self._closed and not self._live_views:
+            self.shm.close()
+
+    def close(self) -> None:
+        """Unlink the block now and unmap it as soon as no view is alive."""
+        self.shm.unlink()
+        self._closed = True
+        if not self._live_views:
+            self.shm.close()
+
+
+@dataclasses.dataclass
+class SharedRow(Row):
+    """A `Row` whose image may live in a shared-memory slot until `release()` is called."""
+    _ring: SlotRing | None = dataclasses.field(default=None, repr=False)
+    slot: int | None = None
+
+    def release(self) -> None:
+        """Hand the slot back to the loader. `image` must not be used afterwards."""
+        if self._ring is not None and self.slot is not None:
+            self._ring.release(self.slot)
+            self.slot = None
+
+
+def _init_worker(shm_name: str, downloader: Downloader, decoder: Decoder) -> None:
+    global _worker_shm, _worker_downloader, _worker_decoder
+    _worker_shm = SharedMemory(name=shm_name, track=False)
+    _worker_downloader, _worker_decoder = downloader, decoder
+
+
+def _load_into_slot(
+    record: Record, slot: int | None, slot_bytes: int
+) -> tuple[str, tuple[int, ...], NDArray[np.uint8] | None, int | None]:
+    """Load a record in a worker; the image is only returned if it did not go to `slot`."""
+    row = core.load_row(record, _worker_downloader, _worker_decoder)
+    image = np.asarray(row.image, dtype=np.uint8)
+    if slot is None or image.nbytes > slot_bytes:
+        return row.name, image.shape, image, slot
+    np.ndarray(image.shape, dtype=np.uint8, buffer=_worker_shm.buf, offset=slot * slot_bytes)[...] = image
+    return row.name, image.shape, None, slot
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader = core.download,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int,
+    window: int,
+    num_slots: int | None = None,
+    slot_bytes: int = DEFAULT_SLOT_BYTES,
+    decoder: Decoder = core.decode,
+) -> Iterator[SharedRow]:
+    """
+    Load records on worker processes, returning images through shared memory.
+
+    Args:
+        records: `(pokemon_name, sprite_url)` pairs to load.
+        downloader: The function to use for downloading image content (picklable),
+            sent to every worker once.
+        ordered: Yield rows in record order instead of completion order.
+        ordering: What ordered loading does with a straggler, see `stream.Ordering`.
+        max_workers: The number of processes.
+        window: Maximum number of rows loaded ahead of the consumer.
+        num_slots: Size of the ring, twice `window` by default.
+        slot_bytes: Capacity of a slot; larger images are pickled instead.
+        decoder: Turns the downloaded bytes into a `Row` in the workers (picklable).
+
+    Yields:
+        A `SharedRow` for each Pokémon.
+    """
+    ring = SlotRing(num_slots or 2 * window, slot_bytes)
+    try:
+        initargs = (ring.shm.name, downloader, decoder)
+        with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=initargs) as executor:
+            task = functools.partial(_load_into_slot, slot_bytes=slot_bytes)
+
+            def submit(record: Record) -> Future:
+                return executor.submit(task, record, ring.acquire())
+
+            def skipped(record: Record) -> tuple[str, tuple[int, ...], NDArray[np.uint8], None]:
+                row = core.straggler_row(record)
+                return row.name, row.image.shape, row.image, None
+
+            def release_slot(future: Future) -> None:
+                if not future.cancelled() and future.exception() is None and future.result()[3] is not None:
+                    ring.release(future.result()[3])
+
+            def dropped(future: Future) -> None:
+                # Its worker may still be writing to the slot: only free it once done.
+                future.add_done_callback(release_slot)
+
+            results = stream.bounded_map(
+                submit, records, window=window, ordered=ordered, ordering=ordering, skipped=skipped, dropped=dropped
+            )
+            for name, shape, image, slot in results:
+                if image is None:
+                    yield SharedRow(image=ring.view(slot, shape), name=name, _ring=ring, slot=slot)
+                else:
+                    if slot is not None:
+                        ring.release(slot)
+                    yield SharedRow(image=image, name=name)
+    finally:
+        ring.close()
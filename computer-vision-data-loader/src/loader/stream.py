@@ -0,0 +1,130 @@
+"""Bounded-prefetch helpers shared by the pool based backends.
+
+In order, the window of results loaded ahead of the consumer doubles as a
+reorder buffer. A straggler is an item still running when the window is full
+and every later item of it is done: nothing else can start until it is handed
+out, so the `Ordering` policy decides what happens to it. A bigger window gives
+slow items more slack, and `straggler_grace` keeps a busy scheduler from
+turning an item that merely started late into a straggler.
+"""
+import collections
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Iterable, Iterator, Literal, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# "wait" for a straggler (head-of-line blocking), "skip" it with a stand-in result,
+# or "reschedule" a second copy of it and keep whichever finishes first.
+Ordering = Literal["wait", "skip", "reschedule"]
+ORDERINGS: tuple[Ordering, ...] = ("wait", "skip", "reschedule")
+# Seconds an item must have been loading for before it can count as a straggler.
+STRAGGLER_MIN_SECONDS = 0.1
+
+
+def _cancel(future: Future) -> None:
+    future.cancel()
+
+
+def bounded_map(
+    submit: Callable[[T], Future[R]],
+    items: Iterable[T],
+    *,
+    window: int,
+    ordered: bool = True,
+    ordering: Ordering = "wait",
+    skipped: Callable[[T], R] | None = None,
+    dropped: Callable[[Future[R]], None] = _cancel,
+) -> Iterator[R]:
+    """
+    Like `Executor.map`, but never runs more than `window` items ahead of the consumer.
+
+    Items are pulled from `items` lazily, one for every result handed out, so a slow
+    consumer stops both the submission of new work and the reading of the input.
+
+    Args:
+        submit: Schedules one item and returns its future, e.g. `functools.partial(executor.submit, fn)`.
+        items: The (possibly unbounded) input.
+        window: Maximum number of submitted results not yet consumed.
+        ordered: Yield results in input order instead of completion order.
+        ordering: What an ordered map does with a straggler. `"reschedule"` runs at
+            most one extra copy of an item, beyond `window`.
+        skipped: Builds the result handed out instead of a straggler's, for `"skip"`.
+        dropped: Receives every future whose result is given up on (a skipped
+            straggler, the slower copy of a rescheduled one); cancels it by default.
+    """
+    if ordering == "skip" and skipped is None:
+        raise ValueError("ordering='skip' needs a `skipped` result")
+    items = iter(items)
+    pending: collections.deque[tuple[T, Future[R], float]] | set[Future[R]] = collections.deque()
+
+    def schedule(n: int) -> Iterator[tuple[T, Future[R], float]]:
+        return ((item, submit(item), time.monotonic()) for item in itertools.islice(items, n))
+
+    try:
+        if ordered:
+            pending = collections.deque(schedule(window))
+            while pending:
+                item, future, since = pending[0]
+                if ordering != "wait" and not future.done() and _straggling(future, since, pending, window):
+                    if ordering == "skip":
+                        metrics.count("stragglers_skipped")
+                        dropped(future)
+                        future = None
+                    else:
+                        metrics.count("stragglers_rescheduled")
+                        copies = {future, submit(item)}
+                        done, _ = wait(copies, return_when=FIRST_COMPLETED)
+                        future = done.pop()
+                        for copy in copies - {future}:
+                            dropped(copy)
+                pending.popleft()
+                result = skipped(item) if future is None else future.result()
+                pending.extend(schedule(1))
+                yield result
+        else:
+            pending = {submit(item) for item in itertools.islice(items, window)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.update(submit(item) for item in itertools.islice(items, 1))
+                    yield future.result()
+    finally:
+        for entry in pending:
+            (entry[1] if ordered else entry).cancel()
+
+
+def straggler_grace(since: float) -> float:
+    """
+    Seconds to keep waiting for an item submitted at `since` (`time.monotonic()`)
+    once every later item of its window is done, before it counts as a straggler.
+
+    The item gets as long again as it has had, and `STRAGGLER_MIN_SECONDS` in all:
+    an item waiting behind a descheduled worker catches up well within that.
+    """
+    elapsed = time.monotonic() - since
+    return max(elapsed, STRAGGLER_MIN_SECONDS - elapsed)
+
+
+def _straggling(head: Future, since: float, pending: collections.deque, window: int) -> bool:
+    """Wait until `head` is done or is a straggler of the full window `pending`; true for the latter."""
+    if not len(pending) == window > 1:
+        return False
+    running = {future for _, future, _ in itertools.islice(pending, 1, None) if not future.done()}
+    while running and not head.done():
+        _, running = wait(running | {head}, return_when=FIRST_COMPLETED)
+        running.discard(head)
+    if not head.done():
+        wait([head], timeout=straggler_grace(since))
+    return not head.done()
+
+
+def time_to_first_row(iterator: Iterator[T]) -> tuple[float, T]:
+    """Time `next(iterator)` the way the notebook's `produce()` does."""
+    t0 = time.perf_counter()
+    row = next(iterator)
+    return time.perf_counter() - t0, row
@@ -0,0 +1,60 @@
+"""Thread backend: overlap downloads on a `ThreadPoolExecutor`."""
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+from . import core, metrics, sessions, stream
+from .adaptive import AdaptiveLimiter
+from .core import Decoder, Downloader, Record, Row
+
+DEFAULT_MAX_WORKERS = 10
+
+
+def load(
+    records: Iterable[Record],
+    *,
+    downloader: Downloader = core.download,
+    ordered: bool = True,
+    ordering: stream.Ordering = "wait",
+    max_workers: int | None = None,
+    prefetch: int | None = None,
+    limiter: AdaptiveLimiter | None = None,
+    decoder: Decoder = core.decode,
+) -> Iterator[Row]:
+    """
+    Load records on a pool of threads.
+
+    Args:
+        records: `(pokemon_name, sprite_url)` pairs to load.
+        downloader: The function to use for downloading image content.
+        ordered: Yield rows in record order instead of completion order.
+        ordering: What ordered loading does with a straggler, see `stream.Ordering`.
+        max_workers: The number of threads to use, `limiter.maximum` when a limiter is given.
+        prefetch: Maximum number of rows loaded ahead of the consumer,
+            twice the number of threads by default.
+        limiter: Optional `AdaptiveLimiter` tuning the downloads in flight to the server.
+        decoder: Turns the downloaded bytes into a `Row`, `core.decode` by default.
+
+    Yields:
+        A `Row` object for each Pokémon.
+    """
+    if limiter is not None:
+        max_workers = max_workers or limiter.maximum
+        downloader = core.limited(downloader, limiter)
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    # Threads share the process's session; size its pool so none of them opens throwaway connections.
+    sessions.get_session(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        load_row = functools.partial(core.load_row, downloader=downloader, decoder=decoder)
+
+        def submit(record: Record) -> Future[Row]:
+            return executor.submit(metrics.queued(load_row), record)
+
+        yield from stream.bounded_map(
+            submit,
+            records,
+            window=prefetch or 2 * max_workers,
+            ordered=ordered,
+            ordering=ordering,
+            skipped=core.straggler_row,
+        )
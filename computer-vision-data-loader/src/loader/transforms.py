@@ -0,0 +1,161 @@
+"""Decode and transform stage, run on its own pool next to the I/O backends.
+
+With a transform the backends only download: rows come out still encoded (see
+`core.encoded`) and are decoded and transformed here, on a thread pool sized to
+the CPU cores. PNG decoding and NumPy release the GIL, so the stage uses every
+core without pickling images, and a slow transform no longer holds up the
+downloads (or the other way round).
+
+Transforms are callables from array to array that compose with `Compose`. The
+ones below are vectorised: given a `(B, H, W, C)` batch they process it in a
+few NumPy operations, so they can also run once per batch after collation::
+
+    loader.load(
+        sources,
+        backend="asyncio",
+        transform=transforms.Compose([transforms.ToRGB(), transforms.Fit((64, 64))]),
+        batch_size=32,
+        image_shape=(64, 64),
+        batch_transform=transforms.Compose([transforms.RandomFlip(), transforms.Normalize()]),
+    )
+"""
+import concurrent.futures
+import functools
+import os
+import threading
+from typing import Callable, Iterable, Iterator, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+from . import collate, core, metrics, stream
+from .collate import Fit as FitMode
+from .core import Row
+
+Transform = Callable[[NDArray], NDArray]
+
+
+class Compose:
+    """Apply `transforms` one after the other."""
+
+    def __init__(self, transforms: Sequence[Transform]):
+        self.transforms = list(transforms)
+
+    def __call__(self, images: NDArray) -> NDArray:
+        for transform in self.transforms:
+            images = transform(images)
+        return images
+
+
+class ToRGB:
+    """Convert gray, gray + alpha or RGBA to RGB, compositing transparency over `background`."""
+
+    def __init__(self, background: int = 255):
+        self.background = background
+
+    def __call__(self, images: NDArray[np.uint8]) -> NDArray[np.uint8]:
+        if images.ndim > 2 and images.shape[-1] == 3:
+            return images
+        shape = images.shape if images.ndim == 2 else images.shape[:-1]
+        out = np.empty((*shape, 3), dtype=np.uint8)
+        collate._write_channels(images, out, self.background)
+        return out
+
+
+class Fit:
+    """Bring a single image to `(H, W)` by padding/cropping or nearest-neighbour resizing."""
+
+    def __init__(self, image_shape: tuple[int, int], fit: FitMode = "pad", background: int = 255):
+        self.image_shape = image_shape
+        self.fit = fit
+        self.background = background
+
+    def __call__(self, image: NDArray[np.uint8]) -> NDArray[np.uint8]:
+        channels = 1 if image.ndim == 2 else image.shape[-1]
+        out = np.empty((*self.image_shape, channels), dtype=np.uint8)
+        collate.fit_image(image, out, fit=self.fit, background=self.background)
+        return out
+
+
+class Normalize:
+    """`(images - mean) / std` as `float32`, per channel when given sequences."""
+
+    def __init__(self, mean: float | Sequence[float] = 0.0, std: float | Sequence[float] = 255.0):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+
+    def __call__(self, images: NDArray) -> NDArray[np.float32]:
+        out = images.astype(np.float32)
+        out -= self.mean
+        out /= self.std
+        return out
+
+
+class RandomFlip:
+    """Mirror each image left to right with probability `p`.
+
+    A `(B, H, W, C)` batch is flipped with one vectorised `np.where`. The random
+    state is shared by the pool threads under a lock, so runs with a `seed` are
+    reproducible for a given order of rows.
+    """
+
+    def __init__(self, p: float = 0.5, seed: int | None = None):
+        self.p = p
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, images: NDArray) -> NDArray:
+        batched = images.ndim == 4
+        with self._lock:
+            flip = self._rng.random(len(images) if batched else 1) < self.p
+        if not batched:
+            return images[:, ::-1] if flip[0] else images
+        return np.where(flip[:, np.newaxis, np.newaxis, np.newaxis], images[:, :, ::-1], images)
+
+
+def _transform_row(row: Row, transform: Transform | None) -> Row:
+    if core.is_encoded(row):
+        try:
+            decoded = core.decode(row.name, row.image.tobytes())
+        except Exception as e:
+            decoded = core.error_row(row.name, e)
+        finally:
+            # The encoded bytes may sit in a shared-memory slot (`shm.SharedRow`).
+            if hasattr(row, "release"):
+                row.release()
+        row = decoded
+    if transform is not None:
+        with metrics.span("transform", row.name):
+            row = Row(image=transform(row.image), name=row.name)
+    return row
+
+
+def apply(
+    rows: Iterable[Row],
+    transform: Transform | None = None,
+    *,
+    max_workers: int | None = None,
+    window: int | None = None,
+    ordered: bool = True,
+) -> Iterator[Row]:
+    """
+    Decode (when still encoded) and transform rows on a pool of `max_workers` threads.
+
+    Args:
+        rows: Rows from any backend, typically loaded with `decoder=core.encoded`.
+        transform: Applied to every decoded image; `None` only decodes.
+        max_workers: Threads of the stage, `os.cpu_count()` by default.
+        window: Maximum number of rows in the stage, twice `max_workers` by default.
+        ordered: Keep the order of `rows` instead of yielding rows as they are done.
+
+    Yields:
+        The transformed rows.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="transform") as executor:
+        transform_row = functools.partial(_transform_row, transform=transform)
+
+        def submit(row: Row) -> concurrent.futures.Future[Row]:
+            return executor.submit(metrics.queued(transform_row), row)
+
+        yield from stream.bounded_map(submit, rows, window=window or 2 * max_workers, ordered=ordered)
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from src import loader
+from src.loader.adaptive import AdaptiveLimiter, is_backoff_error
+
+from .test_loader import NAMES, fake_download, sources  # noqa: F401
+
+
+def complete(limiter: AdaptiveLimiter, n: int, latency: float) -> None:
+    for _ in range(n):
+        limiter.acquire()
+        limiter.release(latency)
+
+
+def test_limit_grows_while_latency_is_flat():
+    limiter = AdaptiveLimiter(initial=2, maximum=6)
+    for _ in range(20):
+        complete(limiter, limiter.limit, 0.01)
+        time.sleep(0.001)
+    assert limiter.limit > 2
+
+
+def test_latency_spike_halves_the_limit():
+    limiter = AdaptiveLimiter(initial=8, maximum=8)
+    complete(limiter, 8, 0.01)
+    complete(limiter, 3, 0.5)
+    assert limiter.limit == 4
+    # The next cut waits for a full round of 4 requests after the first one.
+    complete(limiter, 2, 0.5)
+    assert limiter.limit == 2
+
+
+def test_backoff_errors_cut_the_limit_once_per_round():
+    limiter = AdaptiveLimiter(initial=8, minimum=2)
+    response = requests.Response()
+    response.status_code = 429
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(backoff=True)
+    assert limiter.limit == 4
+    assert is_backoff_error(requests.HTTPError(response=response))
+    assert is_backoff_error(requests.ReadTimeout())
+    assert not is_backoff_error(ValueError())
+
+
+def test_limit_is_enforced_across_threads_and_tasks():
+    limiter = AdaptiveLimiter(initial=2, maximum=2)
+    in_flight = peak = 0
+    lock = threading.Lock()
+
+    def request():
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+
+    def work():
+        with limiter.slot():
+            request()
+
+    async def work_async():
+        async with limiter.slot_async():
+            await asyncio.to_thread(request)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    async def tasks():
+        await asyncio.gather(*(work_async() for _ in range(4)))
+
+    asyncio.run(tasks())
+    for thread in threads:
+        thread.join()
+    assert peak <= 2
+
+
+@pytest.mark.parametrize("backend", ["thread", "asyncio"])
+def test_load_with_limiter(backend, sources):
+    limiter = AdaptiveLimiter(initial=1, maximum=4)
+    rows = list(loader.load(sources, backend=backend, downloader=fake_download, limiter=limiter))
+    assert [row.name for row in rows] == NAMES
+    assert limiter.stats()["completed"] == len(NAMES)
@@ -0,0 +1,65 @@
+import imageio.v2 as imageio
+import numpy as np
+
+from src import loader
+from src.loader import archive
+
+from .test_loader import NAMES, fake_download, fake_image, sources, sprite_url, write_csv  # noqa: F401
+
+
+def write_downloads(output_dir, names):
+    """Lay sprites out like the `concurrent-downloads` scripts do."""
+    for name in names:
+        sprite = output_dir / "grass" / f"{name.lower()}.png"
+        sprite.parent.mkdir(parents=True, exist_ok=True)
+        imageio.imwrite(sprite, fake_image(sprite_url(name)))
+
+
+def test_pack_downloads_and_map_them(tmp_path):
+    write_downloads(tmp_path / "out", NAMES[:3])
+    source = write_csv(tmp_path / "gen.csv", NAMES[:4])  # the fourth download failed
+    path = tmp_path / "sprites.bin"
+    assert archive.pack(archive.read_downloads(tmp_path / "out", [source]), path, image_shape=(4, 5)) == 3
+
+    sprites = loader.SpriteArchive(path)
+    assert len(sprites) == 3
+    assert list(sprites.names) == NAMES[:3]
+    assert list(sprites.types) == ["GRASS"] * 3
+    assert list(sprites.numbers) == [1, 2, 3]
+    assert list(sprites.entries["offset"]) == [0, 60, 120]
+    assert sprites.shapes.tolist() == [[4, 5, 3]] * 3
+    assert sprites.position("Charmander") is None
+
+    batch = sprites[1:3]
+    assert batch.shape == (2, 4, 5, 3)
+    assert np.shares_memory(batch, sprites.images) and not batch.flags.writeable
+    for name, image in zip(NAMES[1:3], batch):
+        np.testing.assert_array_equal(image, fake_image(sprite_url(name)))
+
+
+def test_pack_fits_images_to_the_archive_shape(tmp_path):
+    entries = [("Big", "FIRE", 1, np.full((6, 6, 4), 7, dtype=np.uint8))]
+    archive.pack(entries, tmp_path / "sprites.bin", image_shape=(4, 4), channels=3)
+    sprites = loader.SpriteArchive(tmp_path / "sprites.bin")
+    assert sprites[0].shape == (4, 4, 3)
+    assert sprites.shapes.tolist() == [[6, 6, 4]]
+
+
+def test_archive_backend_falls_back_to_downloader(tmp_path, sources):
+    path = tmp_path / "sprites.bin"
+    archive.pack(
+        ((name, "GRASS", i, fake_image(sprite_url(name))) for i, name in enumerate(NAMES[:5])),
+        path,
+        image_shape=(4, 5),
+    )
+    downloaded = []
+
+    def download(url):
+        downloaded.append(url)
+        return fake_download(url)
+
+    rows = list(loader.load(sources, backend="archive", archive=path, downloader=download))
+    assert [row.name for row in rows] == NAMES
+    assert downloaded == [sprite_url(name) for name in NAMES[5:]]
+    for row in rows:
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src import loader
+from src.loader import bridge
+
+from .test_loader import NAMES, fake_download, sources  # noqa: F401
+
+
+def test_tasks_keep_running_while_the_consumer_works():
+    finished = []
+
+    async def rows():
+        async def work(i):
+            await asyncio.sleep(0.05)
+            finished.append(i)
+            return i
+
+        tasks = [asyncio.ensure_future(work(i)) for i in range(4)]
+        for task in tasks:
+            yield await task
+
+    items = bridge.iterate(rows)
+    assert next(items) == 0
+    time.sleep(0.3)
+    assert sorted(finished) == [0, 1, 2, 3]
+    assert list(items) == [1, 2, 3]
+
+
+def test_errors_and_early_close_reach_the_other_side():
+    async def failing():
+        yield 1
+        raise ValueError("boom")
+
+    items = bridge.iterate(failing)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="boom"):
+        next(items)
+
+    closed = threading.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield 0
+                await asyncio.sleep(0)
+        finally:
+            closed.set()
+
+    items = bridge.iterate(endless)
+    next(items)
+    items.close()
+    assert closed.is_set()
+    assert not any(thread.name == "loader-loop" for thread in threading.enumerate())
+
+
+@pytest.mark.parametrize("backend", ["sequential", "thread", "asyncio"])
+def test_load_async_does_not_block_the_loop(backend, sources):
+    def slow_download(url):
+        time.sleep(0.01)
+        return fake_download(url)
+
+    async def consume():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticking = asyncio.ensure_future(ticker())
+        names = [row.name async for row in loader.load_async(sources, backend=backend, downloader=slow_download)]
+        ticking.cancel()
+        return names, ticks
+
+    names, ticks = asyncio.run(consume())
+    assert names == NAMES
+    assert ticks > len(NAMES)
@@ -0,0 +1,144 @@
+import os
+
+import pytest
+import requests
+
+from src.loader.adaptive import AdaptiveLimiter
+from src.loader.cache import SpriteCache
+from src.loader.retry import RetryPolicy
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes = b"", headers: dict | None = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+
+class FakeSession:
+    """Serves `pages` and answers 304 when the client already holds the current ETag."""
+
+    def __init__(self, pages: dict[str, bytes]):
+        self.pages = pages
+        self.requests: list[tuple[str, dict]] = []
+
+    def get(self, url: str, headers: dict | None = None, timeout: float | None = None):
+        headers = headers or {}
+        self.requests.append((url, headers))
+        if url not in self.pages:
+            return FakeResponse(404)
+        etag = f'"{hash(self.pages[url])}"'
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.pages[url], {"ETag": etag})
+
+
+class EvictingSession(FakeSession):
+    """Evicts the cached blob behind every conditional request, so its 304 has to be fetched again.
+
+    Records the requests in flight in `limiter` at every request, and fails the first
+    `failures` unconditional ones with `error`.
+    """
+
+    def __init__(self, pages, cache, limiter, failures=0, error=requests.Timeout("read timed out")):
+        super().__init__(pages)
+        self.cache = cache
+        self.limiter = limiter
+        self.failures = failures
+        self.error = error
+        self.in_flight: list[int] = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.in_flight.append(self.limiter._in_flight)
+        if headers:
+            self.cache._object_path(self.cache._entry(url)["digest"]).unlink(missing_ok=True)
+        elif self.failures and len(self.requests) > 1:
+            self.failures -= 1
+            self.requests.append((url, {}))
+            raise self.error
+        return super().get(url, headers, timeout)
+
+
+def test_warm_cache_skips_network(tmp_path):
+    session = FakeSession({"http://x/a.png": b"aaa"})
+    cache = SpriteCache(tmp_path)
+    assert cache.fetch(session, "http://x/a.png") == b"aaa"
+    assert SpriteCache(tmp_path).fetch(session, "http://x/a.png") == b"aaa"
+    assert len(session.requests) == 1
+
+
+def test_stale_entry_is_revalidated(tmp_path):
+    session = FakeSession({"http://x/a.png": b"aaa"})
+    cache = SpriteCache(tmp_path, max_age=0)
+    cache.fetch(session, "http://x/a.png")
+    assert cache.fetch(session, "http://x/a.png") == b"aaa"
+    assert "If-None-Match" in session.requests[1][1]
+
+    session.pages["http://x/a.png"] = b"new"
+    assert cache.fetch(session, "http://x/a.png") == b"new"
+
+
+def test_errors_are_not_cached(tmp_path):
+    session = FakeSession({})
+    cache = SpriteCache(tmp_path)
+    with pytest.raises(requests.HTTPError):
+        cache.fetch(session, "http://x/missing.png")
+    assert cache.get("http://x/missing.png") is None
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    session = FakeSession({"http://x/a.png": b"same", "http://y/a.png": b"same"})
+    cache = SpriteCache(tmp_path)
+    cache.fetch(session, "http://x/a.png")
+    cache.fetch(session, "http://y/a.png")
+    assert len(list((tmp_path / "objects").glob("*/*"))) == 1
+
+
+def test_lru_eviction(tmp_path):
+    pages = {f"http://x/{i}.png": bytes([i]) * 10 for i in range(3)}
+    session = FakeSession(pages)
+    cache = SpriteCache(tmp_path, max_bytes=25)
+    cache.fetch(session, "http://x/0.png")
+    cache.fetch(session, "http://x/1.png")
+    # Make entry 1 the least recently used one.
+    index_1 = cache._index_path("http://x/1.png")
+    os.utime(index_1, (0, 0))
+    cache.fetch(session, "http://x/2.png")
+    assert cache.get("http://x/0.png") == pages["http://x/0.png"]
+    assert cache.get("http://x/1.png") is None
+    assert cache.get("http://x/2.png") == pages["http://x/2.png"]
+
+
+def test_refetch_after_eviction_holds_the_limiter_slot(tmp_path):
+    cache = SpriteCache(tmp_path, max_age=0)
+    limiter = AdaptiveLimiter(initial=4)
+    session = EvictingSession({"http://x/a.png": b"aaa"}, cache, limiter)
+    cache.fetch(session, "http://x/a.png", limiter)
+    assert cache.fetch(session, "http://x/a.png", limiter) == b"aaa"
+    # Conditional request answered 304, then the unconditional one: both in one slot.
+    assert [headers != {} for _, headers in session.requests] == [False, True, False]
+    assert session.in_flight == [1, 1, 1]
+    assert limiter._in_flight == 0
+
+
+def test_failed_refetch_after_eviction_is_limited_and_retried(tmp_path):
+    cache = SpriteCache(tmp_path, max_age=0)
+    limiter = AdaptiveLimiter(initial=4)
+    session = EvictingSession({"http://x/a.png": b"aaa"}, cache, limiter, failures=1)
+    cache.fetch(session, "http://x/a.png", limiter)
+    policy = RetryPolicy(backoff=0)
+    assert policy.call(lambda url: cache.fetch(session, url, limiter), "http://x/a.png") == b"aaa"
+    # The timeout of the re-fetch counts as overload for the limiter, and the policy tries again.
+    assert limiter.stats()["backoffs"] == 1
+    assert len(session.requests) == 5
+    assert cache._object_path(cache._entry("http://x/a.png")["digest"]).read_bytes() == b"aaa"
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from src import loader
+from src.loader import catalog
+
+from .test_loader import NAMES, fake_download, write_csv
+
+
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader.cache, "DEFAULT_ROOT", tmp_path / "cache")
+    return tmp_path / "cache"
+
+
+def test_catalog_is_cached_and_invalidated_by_mtime(tmp_path, cache_root):
+    source = write_csv(tmp_path / "pokemon-gen2-data.csv", NAMES[:3])
+    first = catalog.read_catalog([source])
+    assert list(first["Pokemon"]) == NAMES[:3]
+    assert set(first["Generation"]) == {2}
+    assert len(list((cache_root / "catalog").iterdir())) == 1
+
+    write_csv(source, NAMES[3:5])
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert list(catalog.read_catalog([source])["Pokemon"]) == NAMES[3:5]
+    assert len(list((cache_root / "catalog").iterdir())) == 2
+
+
+@pytest.mark.parametrize("damage", ["truncated", "garbage", "empty"])
+def test_corrupt_catalog_is_rebuilt(tmp_path, cache_root, damage):
+    source = write_csv(tmp_path / "pokemon-gen1-data.csv", NAMES[:3])
+    catalog.read_catalog([source])
+    [path] = (cache_root / "catalog").iterdir()
+    data = path.read_bytes()
+    path.write_bytes({"truncated": data[: len(data) // 2], "garbage": b"not a pickle", "empty": b""}[damage])
+
+    assert list(catalog.read_catalog([source])["Pokemon"]) == NAMES[:3]
+    assert path.read_bytes() == data
+    assert list((cache_root / "catalog").iterdir()) == [path]
+
+
+def test_generation_falls_back_to_source_position(tmp_path):
+    sources = [write_csv(tmp_path / "a.csv", NAMES[:2]), write_csv(tmp_path / "b.csv", NAMES[2:3])]
+    assert list(catalog.read_catalog(sources)["Generation"]) == [1, 1, 2]
+
+
+@pytest.mark.parametrize("backend", ["sequential", "thread"])
+def test_load_only_fetches_the_selected_rows(tmp_path, backend):
+    sources = [write_csv(tmp_path / "pokemon-gen1-data.csv", NAMES[:4]), write_csv(tmp_path / "pokemon-gen2-data.csv", NAMES[4:])]
+    downloaded = []
+
+    def download(url):
+        downloaded.append(url)
+        return fake_download(url)
+
+    rows = loader.load(sources, backend=backend, downloader=download, where="Generation == 2 and Number <= 2")
+    assert [row.name for row in rows] == NAMES[4:6]
+    assert len(downloaded) == 2
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from src import loader
+from src.loader.collate import fit_image
+
+from .test_loader import NAMES, fake_download, fake_image, sprite_url, write_csv
+
+
+def rows(*images):
+    return [loader.Row(image=image, name=f"p{i}") for i, image in enumerate(images)]
+
+
+def test_batches_are_contiguous_and_reuse_buffers():
+    images = [np.full((8, 8, 3), i, dtype=np.uint8) for i in range(5)]
+    batches = loader.batched(rows(*images), 2, image_shape=(8, 8), num_buffers=2)
+    first = next(batches)
+    assert first.images.shape == (2, 8, 8, 3) and first.images.dtype == np.uint8
+    assert first.images.flags.c_contiguous
+    assert list(first.names) == ["p0", "p1"]
+    first_buffer = first.images
+    next(batches)
+    last = next(batches)
+    assert len(last) == 1 and last.images[0, 0, 0, 0] == 4
+    assert np.shares_memory(last.images, first_buffer)
+
+
+def test_rgba_is_composited_onto_background():
+    rgba = np.zeros((2, 2, 4), dtype=np.uint8)
+    rgba[0, 0] = [10, 20, 30, 255]
+    out = np.empty((2, 2, 3), dtype=np.uint8)
+    fit_image(rgba, out, background=255)
+    np.testing.assert_array_equal(out[0, 0], [10, 20, 30])
+    np.testing.assert_array_equal(out[1, 1], [255, 255, 255])
+
+
+def test_gray_and_rgb_channel_conversion():
+    out = np.empty((2, 2, 4), dtype=np.uint8)
+    fit_image(np.full((2, 2), 7, dtype=np.uint8), out)
+    np.testing.assert_array_equal(out[0, 0], [7, 7, 7, 255])
+    gray = np.empty((2, 2, 1), dtype=np.uint8)
+    fit_image(np.full((2, 2, 3), 100, dtype=np.uint8), gray)
+    assert (gray == 100).all()
+
+
+def test_pad_crop_and_resize():
+    image = np.arange(16, dtype=np.uint8).reshape(4, 4)
+    padded = np.empty((6, 6, 1), dtype=np.uint8)
+    fit_image(image, padded, background=0)
+    np.testing.assert_array_equal(padded[1:5, 1:5, 0], image)
+    assert padded[0].sum() == 0
+    cropped = np.empty((2, 2, 1), dtype=np.uint8)
+    fit_image(image, cropped)
+    np.testing.assert_array_equal(cropped[..., 0], image[1:3, 1:3])
+    resized = np.empty((8, 8, 1), dtype=np.uint8)
+    fit_image(image, resized, fit="resize")
+    np.testing.assert_array_equal(resized[::2, ::2, 0], image)
+
+
+def test_load_with_batch_size(tmp_path):
+    source = write_csv(tmp_path / "gen.csv", NAMES)
+    batches = list(
+        loader.load([source], backend="thread", downloader=fake_download, batch_size=3, image_shape=(4, 5))
+    )
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    np.testing.assert_array_equal(batches[-1].images[0], fake_image(sprite_url(NAMES[-1])))
+    assert batches[-1].names[0] == NAMES[-1]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_batches_hand_shared_memory_slots_back(monkeypatch, tmp_path, ordered):
+    from src.loader import shm
+
+    acquired = []
+    acquire = shm.SlotRing.acquire
+    monkeypatch.setattr(shm.SlotRing, "acquire", lambda ring: acquired.append(acquire(ring)) or acquired[-1])
+    names = [f"{name}{i}" for i, name in enumerate(NAMES * 3)]
+    source = write_csv(tmp_path / "pokemon.csv", names)
+    batches = loader.load(
+        [source], backend="process", transport="shm", ordered=ordered, downloader=fake_download,
+        max_workers=2, prefetch=2, num_slots=4, batch_size=4,
+    )
+    loaded = [name for batch in batches for name in batch.names]
+    # Every row went through a slot, freed once copied into its batch.
+    assert len(acquired) == len(names) and None not in acquired
+    assert sorted(loaded) == sorted(names)
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        next(loader.batched([], 0))
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from src import loader
+from src.loader import cache, http2, retry, sessions
+from src.loader.cache import SpriteCache
+
+from .test_loader import NAMES, fake_download, fake_image, sources, sprite_url  # noqa: F401
+
+h2 = pytest.importorskip("h2")
+import h2.config  # noqa: E402
+import h2.connection  # noqa: E402
+import h2.events  # noqa: E402
+
+
+class SpriteHost:
+    """HTTP/2 server for `fake_download`, with ETags, 404 for MissingNo and 503 for Ditto."""
+
+    def __init__(self):
+        self.requests: list[str] = []
+        self.connections = 0
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.serve, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def respond(self, headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        url = f"{headers[':scheme']}://{headers[':authority']}{headers[':path']}"
+        self.requests.append(url)
+        if url.endswith("ditto.png"):
+            return 503, {}, b""
+        try:
+            content = fake_download(url)
+        except ConnectionError:
+            return 404, {}, b""
+        etag = f'"{hash(content)}"'
+        if headers.get("if-none-match") == etag:
+            return 304, {"etag": etag}, b""
+        return 200, {"etag": etag}, content
+
+    async def serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        connection = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        connection.initiate_connection()
+        writer.write(connection.data_to_send())
+        while data := await reader.read(65536):
+            for event in connection.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    status, headers, body = self.respond(dict(event.headers))
+                    connection.send_headers(event.stream_id, [(":status", str(status)), *headers.items()], end_stream=not body)
+                    if body:
+                        connection.send_data(event.stream_id, body, end_stream=True)
+            writer.write(connection.data_to_send())
+        writer.close()
+
+    async def connect(self, scheme: str, host: str, port: int) -> "http2._Connection":
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        return http2._Connection(reader, writer)
+
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.server.close)
+
+
+@pytest.fixture
+def sprite_host(monkeypatch):
+    """Every HTTP/2 connection, whatever the URL's host, goes to a local `SpriteHost`."""
+    host = SpriteHost()
+    monkeypatch.setattr(http2._Connection, "open", host.connect)
+    yield host
+    host.close()
+
+
+def test_session_works_with_the_sprite_cache(sprite_host, tmp_path):
+    sprite_cache = SpriteCache(tmp_path, max_age=0)
+    url = sprite_url("Bulbasaur")
+    with http2.Session() as session:
+        content = sprite_cache.fetch(session, url, timeout=5)
+        assert sprite_cache.fetch(session, url) == content == fake_download(url)
+        with pytest.raises(http2.HTTPError) as missing:
+            sprite_cache.fetch(session, sprite_url("MissingNo"))
+        with pytest.raises(http2.HTTPError) as unavailable:
+            sprite_cache.fetch(session, sprite_url("Ditto"))
+    assert retry.status_of(missing.value) == 404 and not retry.is_retryable(missing.value)
+    assert retry.status_of(unavailable.value) == 503 and retry.is_retryable(unavailable.value)
+
+
+def test_async_session_multiplexes_over_one_connection(sprite_host, tmp_path):
+    sprite_cache = SpriteCache(tmp_path)
+    urls = [sprite_url(name) for name in NAMES]
+
+    async def fetch_all() -> list[bytes]:
+        async with http2.AsyncSession() as session:
+            return await asyncio.gather(*(sprite_cache.fetch_async(session, url) for url in urls))
+
+    assert asyncio.run(fetch_all()) == [fake_download(url) for url in urls]
+    assert sprite_host.connections == 1
+
+
+def test_broken_connection_is_retryable(tmp_path):
+    async def fetch() -> None:
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server, http2.AsyncSession() as session:
+            await session.request(f"http://127.0.0.1:{port}/bulbasaur.png")
+
+    with pytest.raises(ConnectionResetError) as broken:
+        asyncio.run(fetch())
+    assert retry.is_retryable(broken.value)
+
+
+@pytest.mark.parametrize("backend", ["sequential", "thread", "asyncio"])
+def test_load_over_http2(backend, sources, sprite_host, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "default_cache", lambda: SpriteCache(tmp_path / "cache"))
+    monkeypatch.setattr(sessions, "_http2_sessions", {})
+
+    rows = list(loader.load(sources, backend=backend, http2=True, max_workers=3))
+    for session in sessions._http2_sessions.values():
+        session.close()
+
+    assert [row.name for row in rows] == NAMES
+    for row in rows:
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+    assert sorted(sprite_host.requests) == sorted(sprite_url(name) for name in NAMES)
+    assert sprite_host.connections == 1
+
+
+def test_http2_does_not_apply_to_a_custom_downloader(sources):
+    with pytest.raises(ValueError, match="http2"):
+        loader.load(sources, downloader=fake_download, http2=True)
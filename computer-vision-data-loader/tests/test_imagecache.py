@@ -0,0 +1,194 @@
+import time
+
+import numpy as np
+import pytest
+
+from src import loader
+from src.loader import imagecache, metrics
+from src.loader.engine import BACKENDS
+
+from .test_loader import NAMES, fake_download, fake_image, sources, sprite_url, write_csv  # noqa: F401
+
+
+def slow_download(url):
+    time.sleep(0.05)
+    return fake_download(url)
+
+
+def bulbasaur_last(url):
+    """Bulbasaur's sprite comes after every other one."""
+    time.sleep(0.2 if url == sprite_url("Bulbasaur") else 0.01)
+    return fake_download(url)
+
+
+class CountingDownloader:
+    def __init__(self):
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        return fake_download(url)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("backend", ["sequential", "thread", "asyncio"])
+def test_later_epochs_are_served_from_memory(backend, ordered, sources):
+    cache = loader.ImageCache()
+    download = CountingDownloader()
+    epochs = [
+        list(loader.load(sources, backend=backend, ordered=ordered, downloader=download, image_cache=cache))
+        for _ in range(3)
+    ]
+    assert len(download.urls) == len(NAMES)
+    for rows in epochs:
+        names = [row.name for row in rows]
+        assert names == NAMES if ordered else sorted(names) == sorted(NAMES)
+        for row in rows:
+            assert not row.image.flags.writeable
+            np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+    assert epochs[1][0].image is epochs[2][0].image
+    assert cache.stats()["hits"] == 2 * len(NAMES)
+
+
+def test_partially_cached_epoch_keeps_record_order(sources):
+    cache = loader.ImageCache()
+    list(loader.load(sources[1:], downloader=fake_download, image_cache=cache))
+    download = CountingDownloader()
+    rows = list(loader.load(sources, backend="thread", downloader=download, image_cache=cache, max_workers=2))
+    assert [row.name for row in rows] == NAMES
+    assert sorted(download.urls) == sorted(sprite_url(name) for name in NAMES[:4])
+
+
+def test_eviction_respects_the_byte_budget():
+    image = np.zeros((4, 5, 3), dtype=np.uint8)
+    cache = loader.ImageCache(max_bytes=2 * image.nbytes)
+    for url in "abc":
+        cache.put(url, image.copy())
+    assert cache.get("a") is None and cache.get("b") is not None
+    cache.put("d", image.copy())
+    assert "b" in cache and "c" not in cache
+    assert cache.stats()["evictions"] == 2 and cache.nbytes == 2 * image.nbytes
+
+
+def test_views_are_copied_and_failures_not_cached(tmp_path):
+    cache = loader.ImageCache()
+    shared = np.zeros((2, 4, 5, 3), dtype=np.uint8)
+    assert not np.shares_memory(cache.put("a", shared[0]), shared)
+
+    source = write_csv(tmp_path / "gen.csv", ["Bulbasaur", "MissingNo"])
+    list(loader.load([source], downloader=fake_download, image_cache=cache))
+    assert sprite_url("Bulbasaur") in cache and sprite_url("MissingNo") not in cache
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("backend", ["thread", "asyncio", "process"])
+def test_duplicate_urls_are_loaded_once(backend, ordered, tmp_path):
+    recorder = metrics.enable()
+    try:
+        sources = [write_csv(tmp_path / "gen-a.csv", NAMES[:4]), write_csv(tmp_path / "gen-b.csv", NAMES[2:])]
+        rows = list(loader.load(
+            sources, backend=backend, ordered=ordered, downloader=slow_download, max_workers=4, prefetch=16
+        ))
+    finally:
+        metrics.disable()
+    names = [row.name for row in rows]
+    expected = NAMES[:4] + NAMES[2:]
+    assert names == expected if ordered else sorted(names) == sorted(expected)
+    assert recorder.counters["coalesced"] == 2
+    for row in rows:
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+    venusaurs = [row.image for row in rows if row.name == "Venusaur"]
+    assert not np.shares_memory(*venusaurs)
+
+
+@pytest.mark.parametrize("backend", ["thread", "asyncio", "process"])
+def test_unordered_rows_sharing_a_name_keep_their_own_sprites(backend, tmp_path):
+    urls = [sprite_url("Bulbasaur"), sprite_url("Charmander"), sprite_url("Bulbasaur")]
+    source = tmp_path / "gen.csv"
+    source.write_text("Pokemon,Number,Type1,Sprite\n" + "".join(f"Pikachu,25,ELECTRIC,{url}\n" for url in urls))
+    rows = list(loader.load([source], backend=backend, ordered=False, downloader=bulbasaur_last, max_workers=4))
+    assert [row.name for row in rows] == ["Pikachu"] * 3
+    assert type(rows[0].name) is str
+    sprites = [next(url for url in set(urls) if np.array_equal(row.image, fake_image(url))) for row in rows]
+    assert sorted(sprites) == sorted(urls)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_cached_rows_hand_shared_memory_slots_back(monkeypatch, tmp_path, ordered):
+    from src.loader import shm
+
+    acquired = []
+    acquire = shm.SlotRing.acquire
+    monkeypatch.setattr(shm.SlotRing, "acquire", lambda ring: acquired.append(acquire(ring)) or acquired[-1])
+    names = [f"{name}{i}" for i, name in enumerate(NAMES * 3)]
+    source = write_csv(tmp_path / "pokemon.csv", names)
+    rows = list(loader.load(
+        [source], backend="process", transport="shm", ordered=ordered, downloader=fake_download,
+        max_workers=2, prefetch=2, num_slots=4, image_cache=loader.ImageCache(),
+    ))
+    # Rows are held, not released: their images are the cache's copies, and the slots are free.
+    assert len(acquired) == len(names) and None not in acquired
+    assert len(rows) == len(names)
+    for row in rows:
+        assert not isinstance(row, shm.SharedRow)
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+
+
+class CountingRecords:
+    """Records of `names`, counting how many the loader has read."""
+
+    def __init__(self, names):
+        self.names = names
+        self.read = 0
+
+    def __iter__(self):
+        for name in self.names:
+            self.read += 1
+            yield name, sprite_url(name)
+
+
+def warm_cache(names):
+    cache = loader.ImageCache()
+    for name in names:
+        cache.put(sprite_url(name), fake_image(sprite_url(name)))
+    return cache
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_warm_epoch_streams_without_the_backend(ordered):
+    names = [f"{name}{i}" for i, name in enumerate(NAMES * 60)]
+    records = CountingRecords(names)
+
+    def backend(records, **options):
+        raise AssertionError("every record is cached")
+
+    rows = imagecache.load_through(warm_cache(names), backend, records, ordered=ordered, prefetch=4)
+    assert next(rows).name == names[0]
+    assert records.read == 1
+    assert [row.name for row in rows] == names[1:]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("backend", ["thread", "asyncio"])
+def test_cached_rows_behind_a_miss_are_bounded(backend, ordered):
+    names = [f"{name}{i}" for i, name in enumerate(NAMES * 60)]
+    records = CountingRecords(names)
+    # Every tenth record misses, the rest are already cached.
+    cache = warm_cache(name for i, name in enumerate(names) if i % 10)
+    download = CountingDownloader()
+    rows = imagecache.load_through(
+        cache, BACKENDS[backend], records, ordered=ordered, downloader=download, max_workers=2, prefetch=4
+    )
+    next(rows)
+    assert records.read <= 4 + 2
+    loaded = [next(rows).name for _ in range(100)]
+    assert records.read <= 101 + 4 + 2
+    loaded += [row.name for row in rows]
+    assert len(loaded) == len(names) - 1
+    assert len(download.urls) == len(names) // 10
+
+
+def test_records_waiting_on_a_failed_url_get_placeholders(tmp_path):
+    source = write_csv(tmp_path / "gen.csv", ["MissingNo", "Bulbasaur", "MissingNo"])
+    rows = list(loader.load([source], backend="thread", downloader=slow_download, max_workers=2))
+    assert [row.name for row in rows] == ["MissingNo (Error)", "Bulbasaur", "MissingNo (Error)"]
@@ -0,0 +1,51 @@
+import json
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from src import loader
+
+PROJECT = pathlib.Path(__file__).parent.parent
+# Seconds `import src.loader` may take in a fresh interpreter (numpy is most of it).
+IMPORT_BUDGET = 0.5
+# Imported by the first download, decode, plot or catalog query, never at import time.
+HEAVY_MODULES = ["aiohttp", "h2", "imageio", "matplotlib", "pandas", "requests"]
+
+
+def fresh_import(modules: list[str], cwd: pathlib.Path = PROJECT) -> dict:
+    """Import `modules` in a new interpreter; return the seconds it took and the heavy modules it loaded."""
+    code = f"""
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)}}))
+"""
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_loader_imports_within_budget():
+    runs = [fresh_import(["src.loader"]) for _ in range(3)]
+    assert runs[0]["heavy"] == []
+    assert min(run["seconds"] for run in runs) < IMPORT_BUDGET
+
+
+def test_scripts_import_without_plotting():
+    scripts = sorted(path.stem for path in (PROJECT / "src").glob("loader_*.py"))
+    assert fresh_import(scripts, cwd=PROJECT / "src")["heavy"] == []
+
+
+def test_records_are_read_without_pandas(tmp_path):
+    source = tmp_path / "gen.csv"
+    source.write_text('Pokemon,Number,Sprite\nBulbasaur,1,https://a/bulbasaur.png\n\n"Mr. Mime, Jr",122,https://a/mr-mime.png\n')
+    assert list(loader.read_records([source])) == [
+        ("Bulbasaur", "https://a/bulbasaur.png"),
+        ("Mr. Mime, Jr", "https://a/mr-mime.png"),
+    ]
+    (tmp_path / "bad.csv").write_text("Pokemon,Number\nBulbasaur,1\n")
+    with pytest.raises(ValueError, match="Sprite"):
+        list(loader.read_records([tmp_path / "bad.csv"]))
@@ -0,0 +1,183 @@
+import functools
+import os
+import pathlib
+import sys
+import time
+
+import imageio.v2 as imageio
+import numpy as np
+import pytest
+
+from src import loader
+from src.loader import http2
+
+NAMES = ["Bulbasaur", "Ivysaur", "Venusaur", "Charmander", "Charmeleon", "Charizard", "Squirtle"]
+
+
+def sprite_url(name: str) -> str:
+    return f"https://play.pokemonshowdown.com/sprites/bw/{name.lower()}.png"
+
+
+def fake_image(url: str) -> np.ndarray:
+    """Small deterministic image whose pixels encode the sprite URL."""
+    value = sum(url.encode()) % 256
+    return np.full((4, 5, 3), value, dtype=np.uint8)
+
+
+def fake_download(url: str) -> bytes:
+    if url.endswith("missingno.png"):
+        raise ConnectionError("404")
+    return imageio.imwrite("<bytes>", fake_image(url), format="png")
+
+
+# Seconds the first download of Ivysaur takes in the straggler tests.
+STRAGGLER_SECONDS = 1.5
+
+
+def slow_the_first_time(url: str, marker_dir: pathlib.Path) -> bytes:
+    """`fake_download`, but the first Ivysaur download of any process straggles."""
+    if url.endswith("ivysaur.png"):
+        try:
+            (marker_dir / "ivysaur").touch(exist_ok=False)
+        except FileExistsError:
+            pass
+        else:
+            time.sleep(STRAGGLER_SECONDS)
+    return fake_download(url)
+
+
+def write_csv(path: pathlib.Path, names: list[str]) -> pathlib.Path:
+    lines = ["Pokemon,Number,Type1,Sprite"]
+    lines += [f"{name},{i + 1},GRASS,{sprite_url(name)}" for i, name in enumerate(names)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+@pytest.fixture
+def sources(tmp_path):
+    return [write_csv(tmp_path / "gen-a.csv", NAMES[:4]), write_csv(tmp_path / "gen-b.csv", NAMES[4:])]
+
+
+@pytest.mark.parametrize("backend", sorted(loader.BACKENDS))
+def test_ordered_rows_match_csv(backend, sources):
+    rows = list(loader.load(sources, backend=backend, downloader=fake_download, max_workers=3))
+    assert [row.name for row in rows] == NAMES
+    for row in rows:
+        assert isinstance(row, loader.Row)
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+
+
+@pytest.mark.parametrize("backend", sorted(loader.BACKENDS))
+def test_unordered_rows_cover_csv(backend, sources):
+    rows = list(loader.load(sources, backend=backend, ordered=False, downloader=fake_download, max_workers=3))
+    assert sorted(row.name for row in rows) == sorted(NAMES)
+
+
+@pytest.mark.parametrize("backend", sorted(loader.BACKENDS))
+def test_failed_download_yields_placeholder(backend, tmp_path):
+    source = write_csv(tmp_path / "gen.csv", ["Bulbasaur", "MissingNo"])
+    rows = list(loader.load([source], backend=backend, downloader=fake_download))
+    assert [row.name for row in rows] == ["Bulbasaur", "MissingNo (Error)"]
+    assert rows[1].image.shape == (96, 96, 3)
+
+
+def test_unknown_backend(sources):
+    with pytest.raises(ValueError, match="Unknown backend"):
+        loader.load(sources, backend="gpu")
+
+
+@pytest.mark.parametrize("ordering", ["skip", "reschedule"])
+@pytest.mark.parametrize("backend", ["thread", "process", "asyncio", "hybrid"])
+def test_stragglers_do_not_hold_up_ordered_rows(backend, ordering, tmp_path):
+    source = write_csv(tmp_path / "gen.csv", NAMES * 2)
+    downloader = functools.partial(slow_the_first_time, marker_dir=tmp_path)
+    rows = loader.load([source], backend=backend, ordering=ordering, downloader=downloader, max_workers=3, prefetch=4)
+    start = time.perf_counter()
+    names = []
+    for row in rows:
+        names.append(row.name)
+        if len(names) == len(NAMES) * 2:
+            elapsed = time.perf_counter() - start
+    expected = NAMES * 2
+    if ordering == "skip":
+        expected[1] = "Ivysaur (Error)"
+    assert names == expected
+    assert elapsed < STRAGGLER_SECONDS
+
+
+def test_unknown_ordering(sources):
+    with pytest.raises(ValueError, match="Unknown ordering"):
+        loader.load(sources, ordering="shuffle")
+
+
+def test_http2_without_h2_fails_before_loading(sources, monkeypatch):
+    monkeypatch.setattr(http2, "h2", None)
+    with pytest.raises(ImportError, match="h2"):
+        loader.load(sources, backend="thread", http2=True)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("backend", sorted(loader.BACKENDS))
+def test_prefetch_bounds_records_read_ahead(backend, ordered):
+    pulled = []
+
+    def records():
+        for i in range(100):
+            pulled.append(i)
+            yield (f"Pokemon{i}", sprite_url(f"pokemon{i}"))
+
+    rows = loader.BACKENDS[backend](
+        records(), downloader=fake_download, ordered=ordered, max_workers=2, prefetch=3
+    )
+    elapsed, row = loader.time_to_first_row(rows)
+    assert elapsed >= 0 and row.name.startswith("Pokemon")
+    assert len(pulled) <= 3 + 1
+    assert len(list(rows)) == 99
+    assert len(pulled) == 100
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_shared_memory_transport(sources, ordered):
+    rows = loader.load(
+        sources, backend="process", transport="shm", ordered=ordered, downloader=fake_download,
+        max_workers=2, prefetch=2, num_slots=3,
+    )
+    names = []
+    for row in rows:
+        assert row.slot is not None
+        assert not row.image.flags.writeable
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+        names.append(row.name)
+        row.release()
+    assert sorted(names) == sorted(NAMES)
+
+
+def test_shared_memory_falls_back_to_pickle_when_slots_are_held(sources):
+    rows = list(loader.load(
+        sources, backend="process", transport="shm", downloader=fake_download,
+        max_workers=2, prefetch=2, num_slots=2,
+    ))
+    assert [row.name for row in rows] == NAMES
+    assert any(row.slot is None for row in rows)
+    for row in rows:
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+
+
+@pytest.mark.parametrize("gil_enabled", [True, False])
+def test_freethreaded_sizes_the_pool_for_the_cores(monkeypatch, sources, gil_enabled):
+    from src.loader import freethreaded, thread
+
+    monkeypatch.setattr(sys, "_is_gil_enabled", lambda: gil_enabled, raising=False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    used = []
+    load = thread.load
+
+    def spy(records, **options):
+        used.append(options["max_workers"])
+        return load(records, **options)
+
+    monkeypatch.setattr(thread, "load", spy)
+    rows = list(loader.load(sources, backend="freethreaded", downloader=fake_download))
+    assert [row.name for row in rows] == NAMES
+    assert freethreaded.available() is not gil_enabled
+    assert used == [None if gil_enabled else thread.DEFAULT_MAX_WORKERS + 4]
@@ -0,0 +1,68 @@
+import json
+import urllib.request
+
+import pytest
+
+from src import loader
+from src.loader import metrics, transforms
+
+from .test_loader import NAMES, fake_download, sources  # noqa: F401
+
+
+@pytest.fixture
+def recorder():
+    recorder = metrics.enable()
+    yield recorder
+    metrics.disable()
+
+
+def test_disabled_instrumentation_is_a_shared_noop():
+    assert metrics.recorder() is None
+    assert metrics.span("decode") is metrics.span("transfer")
+    fn = len
+    assert metrics.queued(fn) is fn
+    assert metrics.trace_configs() == []
+
+
+def test_stages_are_recorded_per_item(recorder, sources):
+    rows = list(loader.load(
+        sources, backend="thread", downloader=fake_download, max_workers=2, transform=transforms.ToRGB()
+    ))
+    assert len(rows) == len(NAMES)
+    histograms = recorder.histograms()
+    for stage in ("queue", "decode", "transform"):
+        assert histograms[stage]["count"] >= len(NAMES)
+        assert histograms[stage]["buckets"][float("inf")] == histograms[stage]["count"]
+    assert recorder.peak_in_flight["decode"] >= 1
+    assert all(n == 0 for n in recorder.in_flight.values())
+    assert "decode" in recorder.summary()
+
+    trace = recorder.chrome_trace()
+    decode_events = [event for event in trace["traceEvents"] if event["cat"] == "decode"]
+    assert sorted(event["name"] for event in decode_events) == sorted(f"decode {name}" for name in NAMES)
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in decode_events)
+
+
+def test_prometheus_endpoint(recorder):
+    with recorder.span("transfer"):
+        pass
+    recorder.count("bytes_downloaded", 42)
+    server = recorder.serve(port=0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        server.shutdown()
+    assert 'pokemon_stage_seconds_bucket{stage="transfer",le="+Inf"} 1' in text
+    assert 'pokemon_stage_seconds_count{stage="transfer"} 1' in text
+    assert "pokemon_bytes_downloaded_total 42" in text
+
+
+def test_recording_writes_a_trace(tmp_path, capsys):
+    with metrics.recording(tmp_path / "trace.json"):
+        with metrics.span("write", "a.png"):
+            pass
+    assert metrics.recorder() is None
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["write a.png"]
+    assert "write" in capsys.readouterr().out
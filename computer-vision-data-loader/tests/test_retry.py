@@ -0,0 +1,206 @@
+import asyncio
+import pickle
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src import loader
+from src.loader import metrics, retry
+
+from .test_loader import NAMES, fake_download, fake_image, sources, sprite_url  # noqa: F401
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class Flaky:
+    """Fails the first `failures` calls for every URL, then downloads."""
+
+    def __init__(self, failures=1, error=ConnectionError("reset")):
+        self.failures = failures
+        self.error = error
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        with self.lock:
+            self.calls[url] = self.calls.get(url, 0) + 1
+            calls = self.calls[url]
+        if calls <= self.failures:
+            raise self.error
+        return fake_download(url)
+
+
+@pytest.fixture
+def recorder():
+    recorder = metrics.enable()
+    yield recorder
+    metrics.disable()
+
+
+def test_transient_errors_are_retried(recorder):
+    flaky = Flaky(failures=2)
+    url = sprite_url("Bulbasaur")
+    assert retry.RetryPolicy(backoff=0).call(flaky, url) == fake_download(url)
+    assert flaky.calls[url] == 3
+    assert recorder.counters["retries"] == 2
+
+
+def test_permanent_errors_fail_once_with_a_structured_report(recorder):
+    flaky = Flaky(failures=10, error=StatusError(404))
+    with pytest.raises(loader.FetchError) as info:
+        retry.RetryPolicy(backoff=0).call(flaky, "http://x/a.png")
+    error = info.value
+    assert error.status == 404 and len(error.attempts) == 1
+    assert isinstance(error.__cause__, StatusError)
+    report = error.to_dict()
+    assert report["url"] == "http://x/a.png"
+    assert report["attempts"][0]["kind"] == "StatusError"
+    assert pickle.loads(pickle.dumps(error)).to_dict() == report
+    assert recorder.counters["failures"] == 1
+
+
+@pytest.mark.parametrize("status, retryable", [(404, False), (429, True), (503, True), (None, True)])
+def test_is_retryable(status, retryable):
+    error = ConnectionError("reset") if status is None else StatusError(status)
+    assert retry.is_retryable(error) is retryable
+    assert not retry.is_retryable(ValueError("bad png"))
+
+
+def test_budget_caps_retries_across_calls():
+    policy = retry.RetryPolicy(attempts=5, backoff=0, budget_ratio=0)
+    policy.budget = retry.RetryBudget(ratio=0, reserve=3)
+    flaky = Flaky(failures=10)
+    for url in "abc":
+        with pytest.raises(loader.FetchError):
+            policy.call(flaky, url)
+    assert sum(flaky.calls.values()) == 3 + 3
+
+
+def test_deadline_stops_retrying():
+    policy = retry.RetryPolicy(attempts=100, backoff=0.05, max_backoff=0.05, deadline=0.2)
+    start = time.perf_counter()
+    with pytest.raises(loader.FetchError):
+        policy.call(Flaky(failures=1000), "http://x/a.png")
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.parametrize("timed", [True, False])
+def test_deadline_bounds_the_last_attempt(timed):
+    timeouts = []
+
+    def slow_failure(url, timeout=None):
+        timeouts.append(timeout)
+        time.sleep(1 if timeout is None else min(timeout, 1))
+        raise ConnectionError("reset")
+
+    policy = retry.RetryPolicy(attempt_timeout=1, deadline=1.5, backoff=0)
+    start = time.perf_counter()
+    with pytest.raises(loader.FetchError) as info:
+        policy.call(slow_failure, "http://x/a.png", timed=timed)
+    assert time.perf_counter() - start < 1.7
+    assert len(info.value.attempts) == 2
+    if timed:
+        assert timeouts[0] == 1 and 0.4 < timeouts[1] < 0.55
+
+
+def test_download_is_given_the_time_left(monkeypatch):
+    timeouts = []
+
+    def fetch(source, limiter, timeout, http2=False):
+        timeouts.append(timeout)
+        time.sleep(0.2)
+        raise ConnectionError("reset")
+
+    monkeypatch.setattr(loader.core, "_fetch", fetch)
+    with pytest.raises(loader.FetchError):
+        loader.core.download("http://x/a.png", retry=retry.RetryPolicy(attempts=5, attempt_timeout=0.25, deadline=0.5, backoff=0))
+    assert timeouts[0] == 0.25
+    assert 0 < timeouts[-1] < 0.25
+
+
+def warmed_up(policy, seconds=0.001):
+    for _ in range(retry._HEDGE_MIN_SAMPLES):
+        policy._latencies.append(seconds)
+    return policy
+
+
+def test_slow_attempts_are_hedged(recorder):
+    calls = []
+
+    def download(url):
+        calls.append(url)
+        if len(calls) == 1:
+            time.sleep(1)
+        return b"ok"
+
+    policy = warmed_up(retry.RetryPolicy(hedge=True))
+    start = time.perf_counter()
+    assert policy.call(download, "http://x/a.png") == b"ok"
+    assert time.perf_counter() - start < 0.5
+    assert len(calls) == 2 and recorder.counters["hedges"] == 1
+
+
+def test_async_attempts_time_out_and_hedge(recorder):
+    calls = []
+
+    async def slow_once():
+        calls.append(None)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return b"ok"
+
+    policy = retry.RetryPolicy(attempt_timeout=0.05, backoff=0)
+    assert asyncio.run(policy.call_async(slow_once, "http://x/a.png")) == b"ok"
+    assert len(calls) == 2 and recorder.counters["retries"] == 1
+
+    calls.clear()
+    policy = warmed_up(retry.RetryPolicy(hedge=True))
+    assert asyncio.run(policy.call_async(slow_once, "http://x/a.png")) == b"ok"
+    assert len(calls) == 2 and recorder.counters["hedges"] == 1
+
+
+def test_policy_survives_pickling():
+    policy = warmed_up(retry.RetryPolicy(hedge=True, budget_ratio=0.5))
+    policy.call(lambda url: b"", "http://x/a.png")
+    clone = pickle.loads(pickle.dumps(policy))
+    assert clone.budget.ratio == 0.5 and clone.hedge_delay() is None
+
+
+class FailsFirst:
+    """Fails the first download of the process it is in, so shows whether its state is kept."""
+
+    def __init__(self):
+        self.failed = False
+
+    def __call__(self, url):
+        if not self.failed:
+            self.failed = True
+            raise StatusError(404)
+        return fake_download(url)
+
+
+@pytest.mark.parametrize("transport", ["pickle", "shm"])
+def test_process_workers_keep_their_policy(transport, sources):
+    rows = list(loader.load(
+        sources, backend="process", transport=transport, max_workers=2, downloader=FailsFirst(),
+        retry=loader.RetryPolicy(attempts=1),
+    ))
+    # Downloader and policy are installed once per worker, not unpickled afresh for every record.
+    failed = [row.name for row in rows if row.name.endswith(loader.core.ERROR_SUFFIX)]
+    assert 1 <= len(failed) <= 2 < len(NAMES)
+
+
+@pytest.mark.parametrize("backend", ["sequential", "thread", "asyncio"])
+def test_load_retries_failed_downloads(backend, sources):
+    flaky = Flaky(failures=1)
+    rows = list(loader.load(sources, backend=backend, downloader=flaky, retry=loader.RetryPolicy(backoff=0)))
+    assert [row.name for row in rows] == NAMES
+    for row in rows:
+        np.testing.assert_array_equal(row.image, fake_image(sprite_url(row.name)))
+    assert all(calls == 2 for calls in flaky.calls.values())
@@ -0,0 +1,74 @@
+import pytest
+
+from src import loader
+
+from .test_loader import NAMES, fake_download, sources  # noqa: F401
+
+
+def shards(total, world_size, **options):
+    samplers = [loader.Sampler(rank=rank, world_size=world_size, **options) for rank in range(world_size)]
+    return [list(sampler.sample(range(total))) for sampler in samplers]
+
+
+@pytest.mark.parametrize("buffer_size", [None, 4])
+def test_ranks_split_every_epoch_disjointly(buffer_size):
+    for epoch in range(3):
+        samplers = [loader.Sampler(rank=rank, world_size=4, seed=7, buffer_size=buffer_size) for rank in range(4)]
+        for sampler in samplers:
+            sampler.set_epoch(epoch)
+        parts = [list(sampler.sample(range(20))) for sampler in samplers]
+        assert sorted(sum(parts, [])) == list(range(20))
+        assert [len(part) for part in parts] == [5] * 4
+
+
+@pytest.mark.parametrize("buffer_size", [None, 4])
+def test_rank_gets_different_records_every_epoch(buffer_size):
+    sampler = loader.Sampler(rank=1, world_size=4, seed=7, buffer_size=buffer_size)
+    members = []
+    for epoch in range(3):
+        sampler.set_epoch(epoch)
+        members.append(frozenset(sampler.sample(range(40))))
+    assert len(set(members)) == 3
+
+
+def test_order_is_seeded_per_epoch():
+    sampler = loader.Sampler(seed=3)
+    first = list(sampler.sample(range(50)))
+    assert first == list(loader.Sampler(seed=3).sample(range(50)))
+    assert first != list(range(50))
+    sampler.set_epoch(1)
+    assert sorted(sampler.sample(range(50))) == list(range(50))
+    assert list(sampler.sample(range(50))) != first
+
+
+def test_uneven_split_is_padded_or_dropped():
+    padded = shards(10, 4, shuffle=False)
+    assert padded == [[0, 4, 8], [1, 5, 9], [2, 6, 8], [3, 7, 9]]
+    assert shards(10, 4, shuffle=False, drop_last=True) == [[0, 4], [1, 5], [2, 6], [3, 7]]
+    assert loader.Sampler(world_size=4).num_samples(10) == 3
+    assert loader.Sampler(world_size=4, drop_last=True).num_samples(10) == 2
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("RANK", "2")
+    monkeypatch.setenv("WORLD_SIZE", "3")
+    sampler = loader.Sampler.from_env(seed=1)
+    assert (sampler.rank, sampler.world_size, sampler.seed) == (2, 3, 1)
+    with pytest.raises(ValueError, match="rank"):
+        loader.Sampler(rank=3, world_size=3)
+
+
+def test_load_only_downloads_this_ranks_shard(sources):
+    downloaded = []
+
+    def download(url):
+        downloaded.append(url)
+        return fake_download(url)
+
+    names = []
+    for rank in range(2):
+        sampler = loader.Sampler(rank=rank, world_size=2, seed=5, drop_last=True)
+        rows = list(loader.load(sources, backend="thread", downloader=download, sampler=sampler))
+        assert len(rows) == len(NAMES) // 2
+        names += [row.name for row in rows]
+    assert len(set(names)) == len(names) == len(downloaded)
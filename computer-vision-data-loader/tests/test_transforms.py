@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from src import loader
+from src.loader import transforms
+
+from .test_loader import NAMES, fake_download, fake_image, sources, sprite_url  # noqa: F401
+
+
+def test_transforms_are_vectorised_over_batches():
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (5, 4, 6, 4), dtype=np.uint8)
+    pipeline = transforms.Compose([transforms.ToRGB(), transforms.Normalize(mean=[1, 2, 3], std=2)])
+    batch = pipeline(images)
+    assert batch.shape == (5, 4, 6, 3) and batch.dtype == np.float32
+    for image, expected in zip(images, batch):
+        np.testing.assert_array_equal(pipeline(image), expected)
+
+
+def test_random_flip_mirrors_a_seeded_subset():
+    images = np.arange(4 * 2 * 3 * 1, dtype=np.uint8).reshape(4, 2, 3, 1)
+    flipped = transforms.RandomFlip(p=0.5, seed=1)(images)
+    mirrored = [np.array_equal(out, image[:, ::-1]) for out, image in zip(flipped, images)]
+    kept = [np.array_equal(out, image) for out, image in zip(flipped, images)]
+    assert all(m != k for m, k in zip(mirrored, kept)) and any(mirrored) and any(kept)
+    np.testing.assert_array_equal(transforms.RandomFlip(p=1.0)(images[0]), images[0][:, ::-1])
+
+
+@pytest.mark.parametrize("backend", sorted(loader.BACKENDS))
+def test_decoding_moves_to_the_transform_stage(backend, sources):
+    rows = list(loader.load(
+        sources, backend=backend, downloader=fake_download, max_workers=2,
+        transform=transforms.Fit((6, 6), background=0), transform_workers=2,
+    ))
+    assert [row.name for row in rows] == NAMES
+    for row in rows:
+        expected = np.zeros((6, 6, 3), dtype=np.uint8)
+        expected[1:5, :5] = fake_image(sprite_url(row.name))
+        np.testing.assert_array_equal(row.image, expected)
+
+
+def test_shared_memory_slots_are_released_after_decoding(sources):
+    rows = loader.load(
+        sources, backend="process", transport="shm", downloader=fake_download, max_workers=2,
+        prefetch=2, num_slots=2, slot_bytes=4096, transform=transforms.ToRGB(),
+    )
+    assert [row.name for row in rows] == NAMES
+
+
+def test_batch_transform(sources):
+    batches = list(loader.load(
+        sources, downloader=fake_download, batch_size=4, image_shape=(4, 5),
+        transform=transforms.ToRGB(), batch_transform=transforms.Normalize(),
+    ))
+    assert [batch.images.shape for batch in batches] == [(4, 4, 5, 3), (3, 4, 5, 3)]
+    np.testing.assert_allclose(batches[0].images[0], fake_image(sprite_url(NAMES[0])) / 255)
+
+
+def test_batch_transform_requires_batches(sources):
+    with pytest.raises(ValueError, match="batch_size"):
+        loader.load(sources, batch_transform=transforms.Normalize())
@@ -1,70 +1,178 @@
 # async_version.py
 
-import os, typing as t, asyncio, aiohttp, argparse, time
+import typing as t, asyncio, aiohttp, argparse, time
 
+import singleflight
 import utils
+from shared import adaptive, cache, metrics, retry
+from shared import http2 as http2_
+import manifest as manifest_
+from writer import Writer
 
 
-async def _get(session: aiohttp.ClientSession, url: str) -> bytes | None:
+DEFAULT_CONCURRENCY = 32
+
+INITIAL_CONCURRENCY = 8
+
+DNS_CACHE_TTL = 300
+
+REQUEST_TIMEOUT = 25
+
+
+async def _get(session: aiohttp.ClientSession | http2_.AsyncSession, url: str, limiter: adaptive.AdaptiveLimiter | None = None, policy: retry.RetryPolicy | None = None) -> bytes | None:
+
+    """Return the content of `url`, retried according to `policy`, or None once it gives up (reported on stderr).
+
+    Tasks asking for the same URL at the same time share one fetch.
+    """
+
+    policy = policy or utils.default_retry_policy()
 
     try:
 
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=25)) as r:
+        return await singleflight.default().do_async(url, lambda: policy.call_async(lambda: cache.default_cache().fetch_async(session, url, limiter), url))
 
-            return await r.read() if r.status == 200 else None
+    except retry.FetchError as e:
 
-    except Exception:
+        utils.report_failure(e)
 
         return None
 
 
-async def download_and_save_pokemon(session, pokemon, output_dir):
-
-    content = await _get(session, pokemon["Sprite"])
+async def save_pokemon(pokemon, content, writer):
 
     if content:
 
-        target = os.path.join(output_dir, pokemon["Type1"])
+        await writer.put_async(pokemon, content)
+
+
+async def dowload_and_save_all_pokemons(pokemons, writer, concurrency=DEFAULT_CONCURRENCY, jobs=None, limit_per_host=0, limiter=None, policy=None, http2=False):
+
+    """Download and save all pokemons with `jobs` worker tasks and at most `concurrency` requests in flight.
+
+    Pokemons are pulled lazily through a bounded queue, so thousands of URLs never
+    turn into thousands of pending coroutines. With an `adaptive.AdaptiveLimiter`,
+    `concurrency` is only the upper bound and the limiter finds the actual value.
+    Every request is retried, timed out and hedged according to `policy` (a `retry.RetryPolicy`).
+    Sprites are saved by `writer` (a `writer.Writer`) on its own threads.
+    With `http2`, requests are streams multiplexed over a couple of HTTP/2
+    connections (see `loader/http2.py`) instead of `aiohttp`'s HTTP/1.1 connections.
+    Returns the number of pokemons processed.
+    """
+
+    jobs = jobs or concurrency
+
+    sem = asyncio.Semaphore(concurrency)
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * jobs)
+
+    headers = {"User-Agent": "async-poke/1.0"}
+
+    if http2:
+
+        session = http2_.AsyncSession(timeout=REQUEST_TIMEOUT, headers=headers)
+
+    else:
+
+        connector = aiohttp.TCPConnector(
+            limit=concurrency,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=utils.KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+
+        session = aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT), connector=connector, trace_configs=metrics.trace_configs())
+
+    processed = 0
+
+    async with session as s:
+
+        async def worker():
+
+            nonlocal processed
+
+            while (p := await queue.get()) is not None:
+
+                with metrics.span("queue"):
+
+                    await sem.acquire()
 
-        utils.maybe_create_dir(target)
+                try:
 
-        path = os.path.join(target, pokemon["Pokemon"] + ".png")
+                    content = await _get(s, p["Sprite"], limiter, policy)
 
-        await asyncio.to_thread(utils.write_binary, path, content)
+                finally:
 
+                    sem.release()
 
-async def dowload_and_save_all_pokemons(pokemons, output_dir):
+                await save_pokemon(p, content, writer)
 
-    sem = asyncio.Semaphore()
+                processed += 1
 
-    async with aiohttp.ClientSession(headers={"User-Agent": "async-poke/1.0"}) as s:
+        workers = [asyncio.create_task(worker()) for _ in range(jobs)]
 
-        async def one(p):
+        try:
 
-            async with sem:
+            for p in pokemons:
 
-                await download_and_save_pokemon(s, p, output_dir)
+                await queue.put(p)
 
-        await asyncio.gather(*(one(p) for p in pokemons))
+            for _ in workers:
 
+                await queue.put(None)
 
-async def main(output_dir: str, inputs: t.List[str]):
+            await asyncio.gather(*workers)
+
+        finally:
+
+            for w in workers:
+
+                w.cancel()
+
+    return processed
+
+
+async def main(output_dir: str, inputs: t.List[str], concurrency: int = DEFAULT_CONCURRENCY, jobs: int | None = None, limit_per_host: int = 0, adaptive_concurrency: bool = True, where: str | None = None, incremental: bool = False, policy: retry.RetryPolicy | None = None, http2: bool = False):
+
+    """Download for all inputs and place them in output_dir."""
 
     utils.maybe_create_dir(output_dir)
 
-    pokemons = list(utils.read_pokemons(inputs))  # materialize generator
+    limiter = adaptive.AdaptiveLimiter(initial=min(INITIAL_CONCURRENCY, concurrency), maximum=concurrency) if adaptive_concurrency else None
 
     start = time.perf_counter()
 
+    processed = 0
+
     try:
-# AQUI IBA CONCURRENCY
-        await dowload_and_save_all_pokemons(pokemons, output_dir)
+
+        with manifest_.for_run(output_dir, incremental) as manifest:
+
+            pokemons = utils.read_pokemons(inputs, where)
+
+            if manifest is not None:
+
+                pokemons = manifest.pending(pokemons)
+
+            writer = Writer(output_dir, manifest)
+
+            try:
+
+                processed = await dowload_and_save_all_pokemons(pokemons, writer, concurrency, jobs, limit_per_host, limiter, policy, http2)
+
+            finally:
+
+                await asyncio.to_thread(writer.close)
 
     finally:
 
         elapsed = time.perf_counter() - start
 
-        print(f"Finished {len(pokemons)} downloads in {elapsed:.2f} seconds", flush=True)
+        print(f"Finished {processed} downloads in {elapsed:.2f} seconds", flush=True)
+
+        if limiter is not None:
+
+            print(f"Adaptive concurrency settled at {limiter.limit} (peak {limiter.stats()['max_in_flight']} in flight)", flush=True)
 
 
 if __name__ == "__main__":
@@ -77,6 +185,20 @@ if __name__ == "__main__":
 
     ap.add_argument("--clean", action="store_true")
 
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="maximum requests in flight")
+
+    ap.add_argument("--adaptive", action=argparse.BooleanOptionalAction, default=True, help="tune requests in flight up to --concurrency (AIMD)")
+
+    ap.add_argument("--jobs", type=int, default=None, help="worker tasks downloading and saving (default: --concurrency)")
+
+    ap.add_argument("--limit-per-host", type=int, default=0, help="maximum connections per host (0: no limit)")
+
+    ap.add_argument("--retries", type=int, default=3, help="retries of a failed request, with exponential backoff")
+
+    ap.add_argument("--hedge", action="store_true", help="send a duplicate request once one runs past the p95 latency")
+
+    utils.add_common_arguments(ap)
+
     args = ap.parse_args()
 
     (utils.maybe_remove_dir if args.clean else utils.maybe_create_dir)(args.output_dir)
@@ -85,7 +207,8 @@ if __name__ == "__main__":
 
     t0 = time.perf_counter()
 
-    
-    print(f"Total wall time: {time.perf_counter() - t0:.2f} seconds", flush=True)
+    with metrics.recording(args.trace, args.metrics_port):
+
+        asyncio.run(main(args.output_dir, args.inputs, args.concurrency, args.jobs, args.limit_per_host, args.adaptive, args.where, args.incremental, retry.RetryPolicy(attempts=args.retries + 1, hedge=args.hedge), args.http2))
 
- 
\ No newline at end of file
+    print(f"Total wall time: {time.perf_counter() - t0:.2f} seconds", flush=True)
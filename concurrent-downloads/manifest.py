@@ -0,0 +1,133 @@
+"""Manifest of the sprites saved in an output directory, for incremental runs.
+
+Only `--incremental` runs keep one (see `for_run`); the others leave nothing
+but the sprites under the output directory.
+
+`<output_dir>/manifest.jsonl` gets one JSON line per saved sprite: its path
+relative to the output directory, URL, a hash of its CSV row, size, SHA-256
+and the time it was fetched. Lines are appended as soon as a sprite is on disk,
+so a run that crashes halfway leaves a manifest of everything it finished; the
+last line for a path wins. Closing the manifest compacts it to one line per
+path with an atomic rewrite.
+
+An incremental run skips every Pokémon whose file is present with the recorded
+size and checksum, whose CSV row (including the sprite URL) is unchanged and
+whose entry is younger than `max_age`. Older entries are fetched again through
+the sprite cache, which revalidates them upstream with a conditional request.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from typing import Any, Iterable, Iterator
+
+from shared import cache
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def relative_path(pokemon: dict[str, Any]) -> str:
+    """Where the downloaders save a Pokémon's sprite, relative to the output directory."""
+    return f"{pokemon['Type1']}/{pokemon['Pokemon']}.png"
+
+
+def row_hash(pokemon: dict[str, Any]) -> str:
+    """Fingerprint of a CSV row, so edited rows are fetched again."""
+    return hashlib.sha256(json.dumps(pokemon, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def entry(pokemon: dict[str, Any], content: bytes) -> dict[str, Any]:
+    """Manifest line for `content` saved as `pokemon`'s sprite; cheap enough to build in a worker."""
+    return {
+        "path": relative_path(pokemon),
+        "url": pokemon["Sprite"],
+        "row": row_hash(pokemon),
+        "size": len(content),
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "fetched_at": time.time(),
+    }
+
+
+class Manifest:
+    """Entries of `<output_dir>/manifest.jsonl`, safe to update from several threads."""
+
+    def __init__(self, output_dir: str | os.PathLike, max_age: float = cache.DEFAULT_MAX_AGE):
+        self.root = pathlib.Path(output_dir)
+        self.path = self.root / MANIFEST_NAME
+        self.max_age = max_age
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted run
+                    self.entries[e["path"]] = e
+        except FileNotFoundError:
+            pass
+        self._log = None
+
+    def is_current(self, pokemon: dict[str, Any]) -> bool:
+        """Whether `pokemon`'s sprite is on disk, intact and recent enough to skip."""
+        e = self.entries.get(relative_path(pokemon))
+        if e is None or e["url"] != pokemon["Sprite"] or e["row"] != row_hash(pokemon):
+            return False
+        if time.time() - e["fetched_at"] > self.max_age:
+            return False
+        try:
+            content = (self.root / e["path"]).read_bytes()
+        except FileNotFoundError:
+            return False
+        return len(content) == e["size"] and hashlib.sha256(content).hexdigest() == e["sha256"]
+
+    def pending(self, pokemons: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """The Pokémon that an incremental run still has to download."""
+        return (p for p in pokemons if not self.is_current(p))
+
+    def add(self, e: dict[str, Any]) -> None:
+        """Record a saved sprite, appending it to the manifest immediately."""
+        line = json.dumps(e) + "\n"
+        with self._lock:
+            self.entries[e["path"]] = e
+            if self._log is None:
+                self.root.mkdir(parents=True, exist_ok=True)
+                self._log = open(self.path, "a")
+            self._log.write(line)
+            self._log.flush()
+
+    def record(self, pokemon: dict[str, Any], content: bytes) -> None:
+        self.add(entry(pokemon, content))
+
+    def close(self) -> None:
+        """Rewrite the manifest with one line per sprite."""
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if not self.entries:
+                return
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.writelines(json.dumps(e) + "\n" for e in self.entries.values())
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def for_run(output_dir: str | os.PathLike, incremental: bool) -> "Manifest | contextlib.nullcontext[None]":
+    """The `Manifest` of an incremental run, or a context yielding None for a plain one."""
+    return Manifest(output_dir) if incremental else contextlib.nullcontext()
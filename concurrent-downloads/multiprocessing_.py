@@ -3,39 +3,52 @@ import multiprocessing
 from concurrent.futures import ProcessPoolExecutor
 import requests
 import utils
+from shared import metrics
+import manifest
 import typing as t
-import os
+from writer import Writer
 
 session: requests.Session
 
-def download_site(url, output_dir):
+def download_site(url):
     content = utils.maybe_download_sprite(session, url["Sprite"])
     if content is not None:
-            target_dir = os.path.join(output_dir, url["Type1"])
-            utils.maybe_create_dir(target_dir)
-            filepath = os.path.join(target_dir, url["Pokemon"] + ".png")
-            utils.write_binary(filepath, content)
             name = multiprocessing.current_process().name
             print(f"{name}: Read {len(content)} bytes from {url['Sprite']}")
+    return content
     
-def download_all_sites(sites, output_dir): 
-    with ProcessPoolExecutor(initializer=init_process) as executor:
-        futures = [executor.submit(download_site, site, output_dir) for site in sites]
-        # Wait for all tasks to complete
-        for future in futures:
-            future.result()
+def download_all_sites(sites, output_dir, done=None, http2=False): 
+    # Workers only download; the parent's writer threads save the sprites and record them in the manifest.
+    with Writer(output_dir, done) as writer, ProcessPoolExecutor(initializer=init_process, initargs=(http2,)) as executor:
+        # One download per sprite URL, saved for every row that uses it.
+        downloads = {}
+        for site in sites:
+            if site["Sprite"] in downloads:
+                downloads[site["Sprite"]][1].append(site)
+                metrics.count("coalesced")
+            else:
+                downloads[site["Sprite"]] = (executor.submit(download_site, site), [site])
+        for future, group in downloads.values():
+            content = future.result()
+            if content is not None:
+                for site in group:
+                    writer.put(site, content)
 
-def init_process():
+def init_process(http2=False):
     global session
-    session = requests.Session()
+    # One single-threaded pool per process: sessions must not be shared across a fork.
+    session = utils.make_session(pool_size=1, http2=http2)
     atexit.register(session.close)
 
 @utils.timeit
-def main(output_dir: str, inputs: t.List[str]):
+def main(output_dir: str, inputs: t.List[str], where: t.Optional[str] = None, incremental: bool = False, http2: bool = False):
     """Download for all inputs and place them in output_dir."""
     utils.maybe_create_dir(output_dir)
-    sites = utils.read_pokemons(inputs)
-    download_all_sites(sites, output_dir)
+    with manifest.for_run(output_dir, incremental) as done:
+        sites = utils.read_pokemons(inputs, where)
+        if done is not None:
+            sites = done.pending(sites)
+        download_all_sites(sites, output_dir, done, http2)
     
 
 if __name__ == "__main__":
@@ -43,6 +56,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("output_dir", help="directory to store the data")
     parser.add_argument("inputs", nargs="+", help="list of files with metadata")
+    utils.add_common_arguments(parser)
     args = parser.parse_args()
-    utils.maybe_remove_dir(args.output_dir)
-    main(args.output_dir, args.inputs)
\ No newline at end of file
+    if not args.incremental:
+        utils.maybe_remove_dir(args.output_dir)
+    with metrics.recording(args.trace, args.metrics_port):
+        main(args.output_dir, args.inputs, args.where, args.incremental, args.http2)
\ No newline at end of file
@@ -1,36 +1,41 @@
-import os
 import typing as t
-import requests
 import utils
+from shared import metrics
+import manifest as manifest_
+from writer import Writer
 
 
-def download_and_save_pokemon(session, pokemon, output_dir):
-    """Download and save a single pokemon."""
+def download_and_save_pokemon(session, pokemon, writer):
+    """Download a single pokemon and hand it to the writer."""
     content = utils.maybe_download_sprite(session, pokemon["Sprite"])
     if content is not None:
-        target_dir = os.path.join(output_dir, pokemon["Type1"])
-        utils.maybe_create_dir(target_dir)
-        filepath = os.path.join(target_dir, pokemon["Pokemon"] + ".png")
-        utils.write_binary(filepath, content)
+        writer.put(pokemon, content)
 
 
-def dowload_and_save_all_pokemons(pokemons, output_dir):
-    """Download and save all pokemons using a sequentially."""
-    with requests.Session() as session:
+def dowload_and_save_all_pokemons(pokemons, output_dir, manifest=None, http2=False):
+    """Download all pokemons sequentially, saving each one on a writer thread while the next downloads."""
+    with utils.make_session(pool_size=1, http2=http2) as session, Writer(output_dir, manifest, threads=1) as writer:
         for p in pokemons:
-            download_and_save_pokemon(session, p, output_dir)
+            download_and_save_pokemon(session, p, writer)
 
 @utils.timeit
-def main(output_dir: str, inputs: t.List[str]):
+def main(output_dir: str, inputs: t.List[str], where: t.Optional[str] = None, incremental: bool = False, http2: bool = False):
     """Download for all intpus and place them in output_dir."""
     utils.maybe_create_dir(output_dir)
-    dowload_and_save_all_pokemons(utils.read_pokemons(inputs), output_dir)
+    with manifest_.for_run(output_dir, incremental) as manifest:
+        pokemons = utils.read_pokemons(inputs, where)
+        if manifest is not None:
+            pokemons = manifest.pending(pokemons)
+        dowload_and_save_all_pokemons(pokemons, output_dir, manifest, http2)
     
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("output_dir", help="directory to store the data")
     parser.add_argument("inputs", nargs="+", help="list of files with metadata")
+    utils.add_common_arguments(parser)
     args = parser.parse_args()
-    utils.maybe_remove_dir(args.output_dir)
-    main(args.output_dir, args.inputs)
\ No newline at end of file
+    if not args.incremental:
+        utils.maybe_remove_dir(args.output_dir)
+    with metrics.recording(args.trace, args.metrics_port):
+        main(args.output_dir, args.inputs, args.where, args.incremental, args.http2)
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""The modules the downloaders share with the data loader.
+
+`adaptive`, `cache`, `catalog`, `http2`, `metrics` and `retry` live in the
+`loader` package of `computer-vision-data-loader/src`, which is put on the
+import path here. The downloaders import them from this module, e.g.
+`from shared import cache`, so both projects run a single implementation and
+the sprites they cache land in the same directory.
+"""
+import pathlib
+import sys
+
+LOADER_SRC = pathlib.Path(__file__).resolve().parent.parent / "computer-vision-data-loader" / "src"
+
+if str(LOADER_SRC) not in sys.path:
+    sys.path.append(str(LOADER_SRC))
+
+from loader import adaptive, cache, catalog, http2, metrics, retry  # noqa: E402
+
+__all__ = ["adaptive", "cache", "catalog", "http2", "metrics", "retry"]
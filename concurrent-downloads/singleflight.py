@@ -0,0 +1,106 @@
+"""Coalesce concurrent fetches of the same URL (single-flight).
+
+Several CSV rows can point at the same sprite (overlapping inputs, alternate
+forms). When they are downloaded at the same time, the first call for a URL
+does the work and the others wait for its result instead of racing to fetch
+the same bytes. Threads and asyncio tasks are covered; the multiprocessing
+downloader groups rows by URL before handing them to its workers.
+
+`stats()` reports how many calls were made and how many were coalesced; the
+latter is also counted as `coalesced` in `metrics`.
+"""
+import asyncio
+import functools
+import os
+import threading
+import typing as t
+from concurrent.futures import Future
+
+from shared import metrics
+
+T = t.TypeVar("T")
+
+
+class SingleFlight:
+    """At most one call in flight per key; concurrent callers share its outcome."""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict[t.Hashable, Future] = {}
+        self._async_flights: dict[tuple[asyncio.AbstractEventLoop, t.Hashable], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def _joined(self):
+        self.coalesced += 1
+        metrics.count("coalesced")
+
+    def do(self, key: t.Hashable, fn: t.Callable[[], T]) -> T:
+        """Return `fn()`, or the result of the call for `key` already in flight."""
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            else:
+                self._joined()
+        if not leader:
+            return flight.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    async def do_async(self, key: t.Hashable, fn: t.Callable[[], t.Awaitable[T]]) -> T:
+        """Same as `do` for coroutines; calls are only shared between tasks of the same loop."""
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            self.calls += 1
+        while (flight := self._async_flights.get(flight_key)) is not None:
+            try:
+                # Shielded: a waiter being cancelled must not cancel the shared call.
+                result = await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if flight.cancelled() and not asyncio.current_task().cancelling():
+                    continue  # the caller doing the work was cancelled: take over
+                raise
+            with self._lock:
+                self._joined()
+            return result
+        flight = self._async_flights[flight_key] = loop.create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # retrieved: no warning when nobody was waiting
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._async_flights[flight_key]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced}
+
+
+@functools.cache
+def default() -> SingleFlight:
+    """Process-wide instance, reset in forked children."""
+    return SingleFlight()
+
+
+os.register_at_fork(after_in_child=default.cache_clear)
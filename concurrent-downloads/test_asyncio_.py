@@ -0,0 +1,124 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import asyncio_
+from shared import cache
+
+POKEMONS = 40
+
+
+class SpriteServer:
+    """Local sprite host that keeps track of the most requests it served at once."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections are reused
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.peak = max(server.peak, server.in_flight)
+                try:
+                    time.sleep(server.delay)
+                    body = f"png {self.path}".encode()
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def write_csv(self, path: str, count: int = POKEMONS) -> str:
+        with open(path, "w") as f:
+            f.write("Pokemon,Number,Type1,Sprite\n")
+            for i in range(count):
+                f.write(f"Pokemon{i},{i + 1},{['GRASS', 'FIRE', 'WATER'][i % 3]},{self.url}/pokemon{i}.png\n")
+        return path
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class DownloaderTestCase(unittest.TestCase):
+    """Runs the downloaders against a `SpriteServer`, with a sprite cache of their own."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.server = SpriteServer()
+        self.inputs = [self.server.write_csv(os.path.join(self._tmp.name, "pokemon-gen1-data.csv"))]
+        self.output_dir = os.path.join(self._tmp.name, "out")
+        os.mkdir(self.output_dir)
+        sprite_cache = cache.SpriteCache(os.path.join(self._tmp.name, "cache"))
+        patcher = mock.patch.object(cache, "default_cache", lambda: sprite_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.close()
+        self._tmp.cleanup()
+
+    def saved(self) -> int:
+        return sum(len(files) for _, _, files in os.walk(self.output_dir))
+
+
+class TestAsyncioConcurrency(DownloaderTestCase):
+    def test_concurrency_caps_requests_in_flight(self):
+        for adaptive in (False, True):
+            with self.subTest(adaptive=adaptive):
+                # A cold cache, so every sprite is requested again.
+                sprite_cache = cache.SpriteCache(os.path.join(self._tmp.name, f"cache-{adaptive}"))
+                with mock.patch.object(cache, "default_cache", lambda: sprite_cache):
+                    self.server.peak = 0
+                    asyncio.run(asyncio_.main(self.output_dir, self.inputs, concurrency=4, adaptive_concurrency=adaptive))
+                self.assertLessEqual(self.server.peak, 4)
+                self.assertGreater(self.server.requests, 0)
+                self.assertEqual(self.saved(), POKEMONS)
+
+    def test_concurrency_is_used(self):
+        asyncio.run(asyncio_.main(self.output_dir, self.inputs, concurrency=4, adaptive_concurrency=False))
+        self.assertGreater(self.server.peak, 1)
+
+    def test_jobs_bound_requests_in_flight(self):
+        asyncio.run(asyncio_.main(self.output_dir, self.inputs, concurrency=16, jobs=2, adaptive_concurrency=False))
+        self.assertLessEqual(self.server.peak, 2)
+        self.assertEqual(self.saved(), POKEMONS)
+
+    def test_command_line_options(self):
+        command = [sys.executable, "asyncio_.py", self.output_dir, *self.inputs, "--concurrency", "3", "--jobs", "2", "--no-adaptive"]
+        env = dict(os.environ, SPRITE_CACHE_DIR=os.path.join(self._tmp.name, "cli-cache"))
+        result = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn(f"Finished {POKEMONS} downloads", result.stdout)
+        self.assertNotIn("Adaptive concurrency", result.stdout)
+        self.assertLessEqual(self.server.peak, 2)
+        self.assertEqual(self.saved(), POKEMONS)
+
+
+if __name__ == "__main__":
+    unittest.main()
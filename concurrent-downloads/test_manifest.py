@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import manifest
+
+
+def _pokemon(name, type1="grass", number=1):
+    return {"Pokemon": name, "Number": number, "Type1": type1, "Sprite": f"https://sprites.test/{name}.png"}
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self._tmp.name
+        self.pokemons = [_pokemon("bulbasaur"), _pokemon("charmander", "fire", 4), _pokemon("squirtle", "water", 7)]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _save(self, done, pokemon, content):
+        path = os.path.join(self.output_dir, manifest.relative_path(pokemon))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        done.record(pokemon, content)
+
+    def test_round_trip(self):
+        with manifest.Manifest(self.output_dir) as done:
+            for pokemon in self.pokemons:
+                self._save(done, pokemon, pokemon["Pokemon"].encode())
+            self._save(done, self.pokemons[0], b"bulbasaur again")
+        with open(os.path.join(self.output_dir, manifest.MANIFEST_NAME)) as f:
+            lines = [json.loads(line) for line in f]
+        # Compacted on close: one line per path, the last one recorded.
+        self.assertEqual(len(lines), len(self.pokemons))
+        reopened = manifest.Manifest(self.output_dir)
+        self.assertEqual(reopened.entries, done.entries)
+        self.assertEqual(reopened.entries["grass/bulbasaur.png"]["size"], len(b"bulbasaur again"))
+
+    def test_resume_skips_what_is_done(self):
+        with manifest.Manifest(self.output_dir) as done:
+            for pokemon in self.pokemons:
+                self._save(done, pokemon, pokemon["Pokemon"].encode())
+        changed_row = dict(self.pokemons[0], Number=2)
+        moved_sprite = dict(self.pokemons[1], Sprite="https://sprites.test/charmander-v2.png")
+        with open(os.path.join(self.output_dir, "water", "squirtle.png"), "wb") as f:
+            f.write(b"corrupt")
+        new = _pokemon("pikachu", "electric", 25)
+        resumed = manifest.Manifest(self.output_dir)
+        pending = list(resumed.pending([changed_row, moved_sprite, self.pokemons[2], new]))
+        self.assertEqual(pending, [changed_row, moved_sprite, self.pokemons[2], new])
+        self.assertEqual(list(resumed.pending(self.pokemons[:2])), [])
+
+    def test_resume_after_an_interrupted_run(self):
+        done = manifest.Manifest(self.output_dir)
+        for pokemon in self.pokemons[:2]:
+            self._save(done, pokemon, pokemon["Pokemon"].encode())
+        # Killed mid-write: never closed, and the last line is torn.
+        with open(done.path, "a") as f:
+            f.write('{"path": "water/squ')
+        resumed = manifest.Manifest(self.output_dir)
+        self.assertEqual(list(resumed.pending(self.pokemons)), [self.pokemons[2]])
+
+    def test_old_entries_are_fetched_again(self):
+        with manifest.Manifest(self.output_dir) as done:
+            self._save(done, self.pokemons[0], b"bulbasaur")
+            done.entries["grass/bulbasaur.png"]["fetched_at"] = time.time() - 2 * done.max_age
+        self.assertEqual(list(manifest.Manifest(self.output_dir).pending(self.pokemons[:1])), self.pokemons[:1])
+
+    def test_only_incremental_runs_keep_a_manifest(self):
+        with manifest.for_run(self.output_dir, incremental=False) as done:
+            self.assertIsNone(done)
+        with manifest.for_run(self.output_dir, incremental=True) as done:
+            self._save(done, self.pokemons[0], b"bulbasaur")
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ["grass", manifest.MANIFEST_NAME])
+
+
+if __name__ == "__main__":
+    unittest.main()
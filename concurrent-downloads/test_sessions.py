@@ -0,0 +1,56 @@
+import os
+import unittest
+from collections import Counter
+from unittest import mock
+
+import requests
+
+import multiprocessing_
+import threading_
+from test_asyncio_ import POKEMONS, DownloaderTestCase
+
+
+class TestSessionReuse(DownloaderTestCase):
+    def setUp(self):
+        super().setUp()
+        # Forked workers inherit the patch, so each construction is logged by pid to a file.
+        self.log = os.path.join(self._tmp.name, "sessions.log")
+        log = self.log
+
+        class CountingSession(requests.Session):
+            def __init__(self):
+                super().__init__()
+                with open(log, "a") as f:
+                    f.write(f"{os.getpid()}\n")
+
+        patcher = mock.patch.object(requests, "Session", CountingSession)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sessions(self) -> Counter:
+        """Sessions created, by pid."""
+        if not os.path.exists(self.log):
+            return Counter()
+        with open(self.log) as f:
+            return Counter(int(line) for line in f)
+
+    def test_threads_share_one_session(self):
+        for adaptive in (False, True):
+            with self.subTest(adaptive=adaptive):
+                open(self.log, "w").close()
+                threading_.main(self.output_dir, self.inputs, adaptive_concurrency=adaptive)
+                self.assertEqual(self.sessions(), Counter({os.getpid(): 1}))
+                self.assertEqual(self.saved(), POKEMONS)
+
+    def test_one_session_per_process(self):
+        multiprocessing_.main(self.output_dir, self.inputs)
+        sessions = self.sessions()
+        self.assertNotIn(os.getpid(), sessions)
+        self.assertEqual(set(sessions.values()), {1})
+        self.assertLess(sum(sessions.values()), POKEMONS)
+        self.assertEqual(self.server.requests, POKEMONS)
+        self.assertEqual(self.saved(), POKEMONS)
+
+
+if __name__ == "__main__":
+    unittest.main()
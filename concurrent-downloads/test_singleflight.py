@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import singleflight
+
+CALLERS = 8
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        time.sleep(0.001)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = singleflight.SingleFlight()
+        self.fetches = 0
+
+    def _fetch(self, result=b"sprite", error=None):
+        """A fetch that only finishes once every caller has asked for it."""
+        self.fetches += 1
+        _wait_for(lambda: self.flight.stats()["calls"] == CALLERS)
+        if error is not None:
+            raise error
+        return result
+
+    def test_concurrent_callers_share_one_fetch(self):
+        with ThreadPoolExecutor(CALLERS) as executor:
+            results = list(executor.map(lambda _: self.flight.do("url", self._fetch), range(CALLERS)))
+        self.assertEqual(results, [b"sprite"] * CALLERS)
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(self.flight.stats(), {"calls": CALLERS, "coalesced": CALLERS - 1})
+
+    def test_error_reaches_every_caller(self):
+        error = ConnectionError("503")
+
+        def call(_):
+            try:
+                self.flight.do("url", lambda: self._fetch(error=error))
+            except ConnectionError as e:
+                return e
+
+        with ThreadPoolExecutor(CALLERS) as executor:
+            errors = list(executor.map(call, range(CALLERS)))
+        self.assertEqual(errors, [error] * CALLERS)
+        self.assertEqual(self.fetches, 1)
+
+    def test_key_is_cleared_after_completion(self):
+        def fail():
+            raise ValueError("bad")
+
+        self.assertEqual(self.flight.do("url", lambda: b"first"), b"first")
+        with self.assertRaises(ValueError):
+            self.flight.do("url", fail)
+        self.assertEqual(self.flight.do("url", lambda: b"again"), b"again")
+        self.assertEqual(self.flight._flights, {})
+        self.assertEqual(self.flight.stats(), {"calls": 3, "coalesced": 0})
+
+    def test_different_keys_are_not_shared(self):
+        started = threading.Barrier(2, timeout=5)
+
+        def fetch(key):
+            started.wait()  # both in flight at once
+            return key
+
+        with ThreadPoolExecutor(2) as executor:
+            results = list(executor.map(lambda key: self.flight.do(key, lambda: fetch(key)), ["a", "b"]))
+        self.assertEqual(results, ["a", "b"])
+        self.assertEqual(self.flight.stats()["coalesced"], 0)
+
+
+class TestSingleFlightAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.flight = singleflight.SingleFlight()
+        self.fetches = 0
+
+    async def _fetch(self, error=None):
+        self.fetches += 1
+        while self.flight.stats()["calls"] < CALLERS:
+            await asyncio.sleep(0)
+        if error is not None:
+            raise error
+        return b"sprite"
+
+    async def test_concurrent_tasks_share_one_fetch(self):
+        results = await asyncio.gather(*(self.flight.do_async("url", self._fetch) for _ in range(CALLERS)))
+        self.assertEqual(results, [b"sprite"] * CALLERS)
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(self.flight.stats()["coalesced"], CALLERS - 1)
+
+    async def test_error_reaches_every_task(self):
+        error = ConnectionError("503")
+        results = await asyncio.gather(
+            *(self.flight.do_async("url", lambda: self._fetch(error)) for _ in range(CALLERS)), return_exceptions=True
+        )
+        self.assertEqual(results, [error] * CALLERS)
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(self.flight._async_flights, {})
+
+    async def test_key_is_cleared_after_completion(self):
+        async def fetch():
+            self.fetches += 1
+            return b"sprite"
+
+        await self.flight.do_async("url", fetch)
+        await self.flight.do_async("url", fetch)
+        self.assertEqual(self.fetches, 2)
+        self.assertEqual(self.flight._async_flights, {})
+
+    async def test_cancelled_leader_hands_over(self):
+        release = asyncio.Event()
+
+        async def fetch():
+            self.fetches += 1
+            await release.wait()
+            return b"sprite"
+
+        leader = asyncio.create_task(self.flight.do_async("url", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(self.flight.do_async("url", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await follower, b"sprite")
+        self.assertEqual(self.fetches, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
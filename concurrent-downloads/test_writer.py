@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import manifest
+import utils
+import writer
+
+
+def _pokemon(name, type1="grass"):
+    return {"Pokemon": name, "Number": 1, "Type1": type1, "Sprite": f"https://sprites.test/{name}.png"}
+
+
+def _tree(root):
+    """Every file under `root` with its content, by relative path."""
+    files = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+class TestWriter(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self._tmp.name
+        self.sprites = [(_pokemon(f"pokemon{i}", ["grass", "fire", "water"][i % 3]), f"png {i}".encode()) for i in range(50)]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_close_drains_the_queue(self):
+        release = threading.Event()
+        write_binary = utils.write_binary
+
+        def slow_write(path, content):
+            release.wait(5)
+            write_binary(path, content)
+
+        with mock.patch.object(utils, "write_binary", slow_write):
+            w = writer.Writer(self.output_dir, threads=2, max_pending=len(self.sprites))
+            for pokemon, content in self.sprites:
+                w.put(pokemon, content)
+            # Everything is still queued or blocked in a write when close() is called.
+            threading.Timer(0.05, release.set).start()
+            w.close()
+        self.assertEqual(w.written, len(self.sprites))
+        self.assertEqual(len(_tree(self.output_dir)), len(self.sprites))
+
+    def test_write_errors_reach_the_caller(self):
+        failure = OSError("disk full")
+        write_binary = utils.write_binary
+
+        def failing_write(path, content):
+            if path.endswith("pokemon7.png"):
+                raise failure
+            write_binary(path, content)
+
+        with mock.patch.object(utils, "write_binary", failing_write):
+            w = writer.Writer(self.output_dir)
+            for pokemon, content in self.sprites:
+                w.put(pokemon, content)
+            with self.assertRaises(OSError) as raised:
+                w.close()
+        self.assertIs(raised.exception, failure)
+        # The other sprites are still saved.
+        self.assertEqual(w.written, len(self.sprites) - 1)
+
+    def test_same_files_as_inline_writes(self):
+        inline_dir = os.path.join(self.output_dir, "inline")
+        threaded_dir = os.path.join(self.output_dir, "threaded")
+        for pokemon, content in self.sprites:
+            path = writer.sprite_path(inline_dir, pokemon)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            utils.write_binary(path, content)
+
+        done = manifest.Manifest(threaded_dir)
+        with writer.Writer(threaded_dir, done, threads=3, batch_size=4) as w:
+            for pokemon, content in self.sprites:
+                w.put(pokemon, content)
+        done.close()
+
+        threaded = _tree(threaded_dir)
+        del threaded[manifest.MANIFEST_NAME]
+        self.assertEqual(threaded, _tree(inline_dir))
+        self.assertEqual(set(done.entries), set(threaded))
+        self.assertEqual(list(manifest.Manifest(threaded_dir).pending(p for p, _ in self.sprites)), [])
+
+    def test_put_async_matches_put(self):
+        async def save_all(w):
+            for pokemon, content in self.sprites:
+                await w.put_async(pokemon, content)
+
+        with writer.Writer(self.output_dir, max_pending=4) as w:
+            asyncio.run(save_all(w))
+        self.assertEqual(_tree(self.output_dir), {manifest.relative_path(p): c for p, c in self.sprites})
+
+
+if __name__ == "__main__":
+    unittest.main()
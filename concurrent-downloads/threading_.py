@@ -1,42 +1,55 @@
-import os
 #Typing sirve para definir tipos de datos
 import typing as t
-#Request sirve para hacer peticiones HTTP
-import requests
 #utils sirve para importar las funciones del otro archivo
 import utils
-import threading
+from shared import adaptive, metrics
 from concurrent.futures import ThreadPoolExecutor
+import manifest as manifest_
+from writer import Writer
 
-# Sincronización para la escritura de archivos
-lock = threading.Lock()
+# Upper bound for the adaptive limiter, which starts at the old fixed value of 8.
+MAX_WORKERS = 32
+INITIAL_CONCURRENCY = 8
 
-def download_and_save_sprite(pokemon, output_dir):
-    """Download and save a single pokemon."""
-    with requests.Session() as session:
-        content = utils.maybe_download_sprite(session, pokemon["Sprite"])
-        if content is not None:
-            target_dir = os.path.join(output_dir, pokemon["Type1"])
-            with lock:
-                utils.maybe_create_dir(target_dir)
-                filepath = os.path.join(target_dir, pokemon["Pokemon"] + ".png")
-                utils.write_binary(filepath, content)
+def download_and_save_sprite(session, pokemon, writer, limiter=None):
+    """Download a single pokemon and hand it to the writer."""
+    content = utils.maybe_download_sprite(session, pokemon["Sprite"], limiter)
+    if content is not None:
+        writer.put(pokemon, content)
 
 @utils.timeit
-def main(output_dir: str, inputs: t.List[str]):
-    """Download for all intpus and place them in output_dir."""
+def main(output_dir: str, inputs: t.List[str], where: t.Optional[str] = None, incremental: bool = False, http2: bool = False, adaptive_concurrency: bool = True):
+    """Download for all intpus and place them in output_dir.
+
+    With `adaptive_concurrency` an AIMD limiter tunes the requests in flight up to
+    `MAX_WORKERS`; without it `INITIAL_CONCURRENCY` threads download at once.
+    """
     utils.maybe_create_dir(output_dir)
-    all_pokemons = list(utils.read_pokemons(inputs))
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = [executor.submit(download_and_save_sprite, pokemon, output_dir) for pokemon in all_pokemons]
-        for future in futures:
-            future.result()
+    with manifest_.for_run(output_dir, incremental) as manifest:
+        all_pokemons = utils.read_pokemons(inputs, where)
+        if manifest is not None:
+            all_pokemons = manifest.pending(all_pokemons)
+        all_pokemons = list(all_pokemons)
+        limiter = adaptive.AdaptiveLimiter(initial=INITIAL_CONCURRENCY, maximum=MAX_WORKERS) if adaptive_concurrency else None
+        workers = MAX_WORKERS if adaptive_concurrency else INITIAL_CONCURRENCY
+        # One pooled session shared by every thread, so connections are reused; files are saved by the writer's threads.
+        with Writer(output_dir, manifest) as writer, utils.make_session(pool_size=workers, http2=http2) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+            writer.precreate(pokemon["Type1"] for pokemon in all_pokemons)
+            futures = [executor.submit(metrics.queued(download_and_save_sprite), session, pokemon, writer, limiter) for pokemon in all_pokemons]
+            for future in futures:
+                future.result()
+    if limiter is not None:
+        print(f"Adaptive concurrency settled at {limiter.limit} (peak {limiter.stats()['max_in_flight']} in flight)")
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("output_dir", help="directory to store the data")
     parser.add_argument("inputs", nargs="+", help="list of files with metadata")
+    utils.add_common_arguments(parser)
+    parser.add_argument("--adaptive", action=argparse.BooleanOptionalAction, default=True, help=f"tune requests in flight up to {MAX_WORKERS} (AIMD) instead of a fixed {INITIAL_CONCURRENCY} threads")
     args = parser.parse_args()
-    utils.maybe_remove_dir(args.output_dir)
-    main(args.output_dir, args.inputs)
\ No newline at end of file
+    if not args.incremental:
+        utils.maybe_remove_dir(args.output_dir)
+    with metrics.recording(args.trace, args.metrics_port):
+        main(args.output_dir, args.inputs, args.where, args.incremental, args.http2, args.adaptive)
\ No newline at end of file
@@ -1,10 +1,25 @@
-import csv
+import argparse
 import functools
+import json
 import os
 import shutil
+import sys
+import threading
 import time
 import typing as t
 
+import requests
+from requests.adapters import HTTPAdapter
+
+import singleflight
+from shared import cache, catalog, metrics, retry
+from shared import http2 as http2_
+
+# Kept-alive connections per host in a session; at least the threads sharing it.
+POOL_SIZE = 32
+# Seconds an idle aiohttp connection is kept open for reuse.
+KEEPALIVE_TIMEOUT = 30
+
 def maybe_remove_dir(dirpath: str):
     """Remove a directory if it exists."""
     if os.path.isdir(dirpath):
@@ -22,49 +37,86 @@ def timeit(f: t.Callable):
     """Measure the execution time of a function."""
     @functools.wraps(f)
     def timed(*args, **kwargs):
-        ts = time.time()
+        ts = time.perf_counter()
         result = f(*args, **kwargs)
-        elapsed_time = time.time() - ts
+        elapsed_time = time.perf_counter() - ts
         print(f"Elapsed is {elapsed_time:2.4f}")
         return result
     return timed
 
 
-def read_csv_rows_as_dict(filepath: str):
-    """Iterate over the rows of a single csv."""
-    with open(filepath, mode="r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            yield row
-
-def read_all_csv_rows_as_dict(inputs: t.List[str]):
-    """Iterate over all rows from all csvs."""
-    for fpath in inputs:
-        for row in read_csv_rows_as_dict(fpath):
-            yield row
+def add_common_arguments(parser: argparse.ArgumentParser):
+    """Add the options every downloader takes: incremental runs, tracing, metrics, HTTP/2 and row filters."""
+    parser.add_argument("--incremental", action="store_true", help="resume in output_dir: only download sprites missing from its manifest or changed")
+    parser.add_argument("--trace", help="record per-stage timings and write a Chrome trace (JSON) to this file")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while running")
+    parser.add_argument("--http2", action="store_true", help="fetch over HTTP/2, multiplexed on a couple of connections (needs h2)")
+    parser.add_argument("--where", help="only download the pokemons matching this query, e.g. \"Type1 == 'FIRE' and Speed > 100\"")
 
 
-def read_pokemons(inputs: t.List[str]):
-    """Read all csv inputs and make lowercase."""
-    for row in read_all_csv_rows_as_dict(inputs):
-        row["Type1"] = row["Type1"].lower()
-        row["Pokemon"] = row["Pokemon"].lower()
-        yield row
+def read_pokemons(inputs: t.List[str], where: t.Optional[str] = None):
+    """Read the rows of all csv inputs matching `where` (see `loader/catalog.py`) and make lowercase."""
+    pokemons = catalog.select(catalog.read_catalog(inputs), where)
+    pokemons = pokemons.assign(Type1=pokemons["Type1"].str.lower(), Pokemon=pokemons["Pokemon"].str.lower())
+    yield from pokemons.to_dict("records")
 
 def write_binary(filepath: str, content: bytes):
-    """Write binary contents to a file."""
-    with open(filepath, mode="wb") as f:
-        f.write(content)
+    """Write binary contents to a file, through a temporary file renamed into place."""
+    tmp = f"{filepath}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with metrics.span("write", filepath):
+        try:
+            with open(tmp, mode="wb") as f:
+                f.write(content)
+            os.replace(tmp, filepath)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+
+def make_session(pool_size: int = POOL_SIZE, http2: bool = False) -> t.Union[requests.Session, http2_.Session]:
+    """Create a session keeping up to `pool_size` connections alive per host.
+
+    With `http2`, an HTTP/2 session instead (see `loader/http2.py`): every request is a
+    stream multiplexed over a couple of connections, whatever `pool_size`.
+    Sessions can be shared by threads, but not across processes: create one per process.
+    """
+    if http2:
+        return http2_.Session()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@functools.cache
+def default_retry_policy() -> retry.RetryPolicy:
+    """Retry policy shared by the downloads of this process (see `loader/retry.py`)."""
+    return retry.RetryPolicy()
 
 
-def maybe_download_sprite(session, sprite_url: str):
+def report_failure(error: retry.FetchError):
+    """Print a fetch that gave up as one JSON line on stderr, with all its attempts."""
+    print(json.dumps({"event": "fetch_failed", **error.to_dict()}), file=sys.stderr, flush=True)
+
+
+def maybe_download_sprite(session, sprite_url: str, limiter=None, policy: t.Optional[retry.RetryPolicy] = None):
     """Return the content of a sprite if the get request is successfull.
 
+    Sprites are served from the on-disk cache (see `loader/cache.py`) when possible, so
+    only cache misses and stale entries reach the network, through `limiter` (an
+    `adaptive.AdaptiveLimiter`) if given. Failed requests are retried according to
+    `policy` (`default_retry_policy()` by default), and reported on stderr when it
+    gives up. Threads asking for the same URL at the same time share one fetch.
+
     Note that this function is noy asynchronous, so it may be inneficient to called it
     withing an async function.
     """
-    content = None
-    with session.get(sprite_url) as response:
-        if response.status_code == 200:
-            content = response.content
-    return content
\ No newline at end of file
+    policy = policy or default_retry_policy()
+    fetch = lambda url, timeout: cache.default_cache().fetch(session, url, limiter, timeout)
+    try:
+        return singleflight.default().do(sprite_url, lambda: policy.call(fetch, sprite_url, timed=True))
+    except retry.FetchError as e:
+        report_failure(e)
+        return None
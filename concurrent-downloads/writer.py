@@ -0,0 +1,122 @@
+"""Background writer stage of the downloaders.
+
+The downloaders hand every sprite to a `Writer` instead of saving it themselves.
+The writer's own threads take `(path, content)` pairs off a bounded queue, so
+disk I/O overlaps the next requests instead of holding up a download thread or
+the event loop:
+
+* type directories are created once, the first time they are seen (or upfront
+  with `precreate`), instead of checking and creating them for every Pokémon;
+* pairs are drained in batches and a path queued twice in a batch is written once;
+* every file is written to a temporary name and renamed into place, so readers
+  and crashed runs never see half a sprite;
+* the manifest entry of a sprite is recorded once its file is in place.
+
+The queue holds at most `max_pending` sprites; producers block (or wait on a
+thread with `put_async`) when the disk falls behind.
+"""
+import asyncio
+import os
+import queue
+import threading
+import typing as t
+
+import manifest as manifest_
+import utils
+
+DEFAULT_THREADS = 2
+BATCH_SIZE = 64
+MAX_PENDING = 256
+
+_STOP = object()
+
+
+def sprite_path(output_dir: str, pokemon: dict[str, t.Any]) -> str:
+    """Where a Pokémon's sprite is saved."""
+    return os.path.join(output_dir, manifest_.relative_path(pokemon))
+
+
+class Writer:
+    """Save sprites on background threads; use as a context manager to wait for the last ones."""
+
+    def __init__(self, output_dir: str, manifest: t.Optional[manifest_.Manifest] = None, threads: int = DEFAULT_THREADS, batch_size: int = BATCH_SIZE, max_pending: int = MAX_PENDING):
+        self.output_dir = output_dir
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.written = 0
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._dirs: set[str] = set()
+        self._lock = threading.Lock()
+        self._errors: list[Exception] = []
+        self._threads = [threading.Thread(target=self._run, name=f"writer-{i}", daemon=True) for i in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self) -> "Writer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def precreate(self, types: t.Iterable[str]):
+        """Create the directories of these types now rather than on their first sprite."""
+        for type_ in set(types):
+            self._makedirs(os.path.join(self.output_dir, type_))
+
+    def _makedirs(self, dirpath: str):
+        if dirpath in self._dirs:
+            return
+        with self._lock:
+            if dirpath not in self._dirs:
+                os.makedirs(dirpath, exist_ok=True)
+                self._dirs.add(dirpath)
+
+    def put(self, pokemon: dict[str, t.Any], content: bytes):
+        """Queue `content` as the sprite of `pokemon`; blocks while the queue is full."""
+        self._queue.put((sprite_path(self.output_dir, pokemon), content, pokemon))
+
+    async def put_async(self, pokemon: dict[str, t.Any], content: bytes):
+        """Same as `put` without blocking the event loop."""
+        item = (sprite_path(self.output_dir, pokemon), content, pokemon)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, item)
+
+    def _run(self):
+        while (item := self._queue.get()) is not _STOP:
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._write(batch)
+                    return
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch: list[tuple[str, bytes, dict[str, t.Any]]]):
+        # Later pairs for the same path replace the earlier ones.
+        latest = {path: (content, pokemon) for path, content, pokemon in batch}
+        for path, (content, pokemon) in latest.items():
+            try:
+                self._makedirs(os.path.dirname(path))
+                utils.write_binary(path, content)
+                if self.manifest is not None:
+                    self.manifest.record(pokemon, content)
+            except Exception as e:
+                self._errors.append(e)
+                continue
+            with self._lock:
+                self.written += 1
+
+    def close(self):
+        """Wait until every queued sprite is written; raises the first error, if any."""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]